@@ -0,0 +1,309 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class StageLatency:
+    """
+    Collects wall-clock durations for the named stages of a run.
+    """
+
+    def __init__(self):
+        self.samples = {}
+
+    def record(self, stage: str, seconds: float):
+        self.samples.setdefault(stage, []).append(seconds)
+        get_metrics().observe("stage_seconds", seconds, stage=stage)
+
+    def summary(self) -> dict:
+        """
+        Returns count, total, mean, p50 and max seconds per stage.
+        """
+        out = {}
+        for stage, values in self.samples.items():
+            ordered = sorted(values)
+            out[stage] = {
+                "count": len(ordered),
+                "total": sum(ordered),
+                "mean": sum(ordered) / len(ordered),
+                "p50": ordered[len(ordered) // 2],
+                "max": ordered[-1],
+            }
+        return out
+
+    def report_lines(self) -> list:
+        lines = []
+        for stage, s in self.summary().items():
+            lines.append(
+                f"{stage}: n={s['count']} total={s['total']:.2f}s mean={s['mean']:.2f}s "
+                f"p50={s['p50']:.2f}s max={s['max']:.2f}s"
+            )
+        return lines
+
+
+class BackgroundStage:
+    """
+    A pipeline stage fed through a bounded asyncio queue.
+
+    submit() waits while the queue is full, which applies backpressure to the
+    producer instead of letting background work pile up. Each item is handled
+    by calling 'func' in a worker thread so blocking model calls do not stall
+    the event loop. If 'func' raises, the exception is counted in 'errors' and
+    passed to 'on_result' in place of a result.
+    """
+
+    def __init__(self, name: str, func, latency: StageLatency, maxsize=2, on_result=None):
+        self.name = name
+        self.func = func
+        self.latency = latency
+        self.on_result = on_result
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self._worker = None
+        self.backpressure_wait = 0.0
+        self.errors = 0
+        self.last_error = None
+
+    def start(self):
+        self._worker = asyncio.create_task(self._run(), name=f"stage-{self.name}")
+
+    async def submit(self, item):
+        start_time = time.perf_counter()
+        await self.queue.put(item)
+        self.backpressure_wait += time.perf_counter() - start_time
+        get_metrics().set_gauge("queue_depth", self.queue.qsize(), queue=self.name)
+
+    async def _run(self):
+        while True:
+            item = await self.queue.get()
+            try:
+                start_time = time.perf_counter()
+                result = await asyncio.to_thread(self.func, item)
+                self.latency.record(self.name, time.perf_counter() - start_time)
+                if self.on_result is not None:
+                    self.on_result(item, result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                self.last_error = e
+                get_metrics().inc("stage_errors_total", stage=self.name)
+                if self.on_result is not None:
+                    self.on_result(item, e)
+            finally:
+                self.queue.task_done()
+
+    async def drain(self):
+        """
+        Waits until every submitted item has been handled.
+        """
+        await self.queue.join()
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+
+class SpeculativeWork:
+    """
+    Tracks critical-path work that was started before the pending goal checks
+    finished, so it can be cancelled once the objective is known to be met.
+
+    A worker thread that is already inside a model call cannot be interrupted;
+    cancelling only stops the orchestrator from waiting for and using its result.
+    The thread keeps its model context until the call returns, so the time it
+    runs on after being cancelled is recorded as the 'speculative_abandoned'
+    stage in 'latency'.
+    """
+
+    def __init__(self, latency=None):
+        self.latency = latency
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self.cancelled = 0
+
+    def start(self, func, *func_args, name=None):
+        """
+        Runs func(*func_args) in a worker thread and returns its asyncio task.
+        """
+        state = {"cancelled_at": None}
+
+        def run():
+            try:
+                return func(*func_args)
+            finally:
+                with self._lock:
+                    cancelled_at = state["cancelled_at"]
+                if cancelled_at is not None and self.latency is not None:
+                    self.latency.record("speculative_abandoned", time.perf_counter() - cancelled_at)
+
+        task = asyncio.create_task(asyncio.to_thread(run), name=name)
+        self._tasks[task] = state
+        task.add_done_callback(lambda done: self._tasks.pop(done, None))
+        return task
+
+    def cancel_all(self):
+        now = time.perf_counter()
+        for task, state in list(self._tasks.items()):
+            if not task.done():
+                with self._lock:
+                    state["cancelled_at"] = now
+                task.cancel()
+                self.cancelled += 1
+
+
+class AsyncOrchestrator:
+    """
+    Runs long-term-memory summarization and goal evaluation as background
+    stages on an asyncio event loop, so the main loop can start the next task
+    while they are still in flight.
+
+    The event loop lives in its own thread; main_loop stays synchronous and hands
+    work over through the submit_* methods, which block while a stage queue is
+    full. Once a goal check reports the objective as met, 'objective_met' is set
+    and any speculative task execution still running is cancelled. A goal check
+    that raises counts as not met; it is logged and counted in
+    'goal_check_failures'.
+    """
+
+    def __init__(self, summarize, evaluate_goal, on_summary=None, latency=None, queue_size=2, debug_mode=False):
+        self.summarize = summarize
+        self.evaluate_goal = evaluate_goal
+        self.on_summary = on_summary
+        self.latency = latency or StageLatency()
+        self.queue_size = queue_size
+        self.debug_mode = debug_mode
+        self.objective_met = threading.Event()
+        self.goal_checks = 0
+        self.goal_checks_skipped = 0
+        self.goal_check_failures = 0
+        self._loop = None
+        self._thread = None
+        self._ltm_stage = None
+        self._goal_stage = None
+        self._speculative = None
+
+    def start(self):
+        ready = threading.Event()
+
+        def run_loop():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._setup())
+            ready.set()
+            self._loop.run_forever()
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run_loop, name="async-orchestrator", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    async def _setup(self):
+        self._ltm_stage = BackgroundStage(
+            "ltm_summarize", self._summarize_item, self.latency, maxsize=self.queue_size,
+            on_result=self._handle_summary
+        )
+        self._goal_stage = BackgroundStage(
+            "goal_evaluate", self.evaluate_goal, self.latency, maxsize=self.queue_size,
+            on_result=self._handle_goal
+        )
+        self._speculative = SpeculativeWork(self.latency)
+        self._ltm_stage.start()
+        self._goal_stage.start()
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def _summarize_item(self, item):
+        task, result = item
+        return self.summarize(task, result)
+
+    def _handle_summary(self, item, summary):
+        if self.on_summary is not None:
+            self.on_summary(item[0], item[1], summary)
+
+    def _handle_goal(self, objective, met):
+        if isinstance(met, Exception):
+            self.goal_check_failures += 1
+            logger.warning("Goal check for '%s' failed: %s", objective, met)
+            if self.debug_mode:
+                print(f"[DEBUG] Goal check failed: {met}")
+            return
+        if met is True and not self.objective_met.is_set():
+            self.objective_met.set()
+            self._speculative.cancel_all()
+            if self.debug_mode:
+                print("[DEBUG] Goal check reported objective met; cancelled speculative work.")
+
+    def submit_summary(self, task: str, result: str):
+        """
+        Queues (task, result) for LongTermMemoryAgent, blocking while the stage is full.
+        """
+        self._call(self._ltm_stage.submit((task, result)))
+
+    def submit_goal_check(self, objective: str):
+        """
+        Queues a goal check unless one is already waiting; the goal prompt only
+        depends on the objective, so a second queued check would be redundant.
+        """
+        if self._goal_stage.queue.qsize() > 0:
+            self.goal_checks_skipped += 1
+            return
+        self.goal_checks += 1
+        self._call(self._goal_stage.submit(objective))
+
+    def run_speculative(self, func, *func_args):
+        """
+        Runs func(*func_args) in a worker thread as cancellable speculative work.
+        Returns its result, or None if it was cancelled because the objective was met.
+        """
+        if self.objective_met.is_set():
+            return None
+
+        async def run():
+            return await self._speculative.start(func, *func_args, name="speculative")
+
+        try:
+            return self._call(run())
+        except concurrent.futures.CancelledError:
+            return None
+
+    def shutdown(self):
+        """
+        Waits for queued summaries and goal checks to finish, then stops the loop.
+        """
+        if self._loop is None:
+            return
+
+        async def finish():
+            await self._ltm_stage.drain()
+            await self._goal_stage.drain()
+            await self._ltm_stage.stop()
+            await self._goal_stage.stop()
+
+        self._call(finish())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+
+    def speculative_cancelled(self) -> int:
+        """
+        Returns how many speculative task batches were cancelled.
+        """
+        return self._speculative.cancelled if self._speculative is not None else 0
+
+    def backpressure_wait(self) -> float:
+        """
+        Returns the total seconds main_loop spent blocked on full stage queues.
+        """
+        return self._ltm_stage.backpressure_wait + self._goal_stage.backpressure_wait
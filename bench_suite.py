@@ -0,0 +1,274 @@
+import argparse
+import contextlib
+import datetime
+import importlib.util
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from fake_llm import FakeLlama, configure_fake_backend, fake_backend_stats, DEFAULT_TOKEN_LATENCY, DEFAULT_PROMPT_LATENCY
+from metrics import get_metrics
+from model_engine import get_engine
+from run_model_inference import generation_stats
+
+SCENARIOS = ("main_loop", "task_queue", "stm", "log", "ltm")
+# main_loop drives the real agents, imported from the project's 'agents' and
+# 'tools' packages, and prints through colorama; without them it is skipped.
+REQUIRED_MODULES = {
+    "main_loop": ("agents", "tools.web_tools", "colorama"),
+}
+BENCH_OBJECTIVE = "write hello world! to a file and save it."
+
+
+def _missing_modules(names) -> list:
+    missing = []
+    for name in names:
+        try:
+            found = importlib.util.find_spec(name) is not None
+        except ModuleNotFoundError:
+            found = False
+        if not found:
+            missing.append(name)
+    return missing
+
+
+def _model_calls() -> int:
+    return sum(stats["calls"] for stats in generation_stats().values())
+
+
+def bench_main_loop(args, workdir: str) -> list:
+    """
+    Runs main_loop end to end 'args.runs' times. With the fake backend the
+    wall time during which some simulated model call was running is subtracted
+    from the run's wall time, which leaves the orchestration overhead per task.
+    That busy time counts overlapping calls once, so the overhead stays
+    meaningful with --concurrency above 1 and the async orchestrator;
+    'model_time_s' is the summed time of all calls.
+    """
+    import main
+
+    main_args = main.build_arg_parser().parse_args([
+        "--model_path", args.model_path,
+        "--concurrency", str(args.concurrency),
+        "--orchestrator", args.orchestrator,
+        "--cache_agents", "",
+        "--run_log", "",
+    ] + (["--no_stream"] if args.no_stream else []))
+    main.args = main_args
+    main.configure_components(main_args)
+
+    results = []
+    cwd = os.getcwd()
+    for run in range(args.runs):
+        run_dir = os.path.join(workdir, f"main_loop_{run}")
+        os.makedirs(run_dir)
+        if args.backend == "fake":
+            configure_fake_backend(
+                token_latency=args.token_latency, prompt_latency=args.prompt_latency, goal_met_after=args.goal_after
+            )
+        calls_before = _model_calls()
+        os.chdir(run_dir)
+        try:
+            start_time = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                completed = main.main_loop(BENCH_OBJECTIVE, False)
+            wall_time = time.perf_counter() - start_time
+        finally:
+            os.chdir(cwd)
+
+        result = {
+            "run": run,
+            "wall_s": wall_time,
+            "tasks_completed": completed,
+            "model_calls": _model_calls() - calls_before,
+        }
+        if args.backend == "fake":
+            backend_stats = fake_backend_stats()
+            overhead = wall_time - backend_stats["busy_time"]
+            result["model_time_s"] = backend_stats["model_time"]
+            result["model_busy_s"] = backend_stats["busy_time"]
+            result["overhead_s"] = overhead
+            result["overhead_ms_per_task"] = overhead / completed * 1e3 if completed else None
+        results.append(result)
+    return results
+
+
+def bench_task_queue(args, workdir: str) -> list:
+    from bench_task_queue import bench_queue
+    from task_queue import TaskQueue
+
+    return [bench_queue(TaskQueue, workdir, size, args.ops) for size in args.queue_sizes]
+
+
+def bench_stm(args, workdir: str) -> dict:
+    """
+    Short-term memory churn as main_loop produces it: tasks added and popped,
+    user input appended and one flush per iteration.
+    """
+    from short_term_memory import ShortTermMemory
+
+    stm = ShortTermMemory(os.path.join(workdir, "short_term_memory.txt"))
+    flush_time = 0.0
+    start_time = time.perf_counter()
+    for i in range(args.ops):
+        stm.add_tasks([f"- Task {i}: churn task {i}", f"- Task {i}: second churn task {i}"])
+        stm.append_user_input(f"USERINPUT#2026-01-01 00:00:00#=input {i}")
+        stm.pop_next_task()
+        flush_start = time.perf_counter()
+        stm.flush()
+        flush_time += time.perf_counter() - flush_start
+    total_time = time.perf_counter() - start_time
+    return {
+        "iterations": args.ops,
+        "iteration_us": total_time / args.ops * 1e6,
+        "flush_us": flush_time / args.ops * 1e6,
+        "file_bytes": os.path.getsize(stm.filename),
+    }
+
+
+def bench_log(args, workdir: str) -> dict:
+    from log_writer import BackgroundLogWriter
+
+    writer = BackgroundLogWriter(os.path.join(workdir, "logs.txt"))
+    line = "[2026-01-01 00:00:00] Task Result: " + "x" * 80
+    start_time = time.perf_counter()
+    for _ in range(args.log_lines):
+        writer.write(line)
+    enqueue_time = time.perf_counter() - start_time
+    writer.flush()
+    total_time = time.perf_counter() - start_time
+    writer.close()
+    return {
+        "lines": args.log_lines,
+        "enqueue_us": enqueue_time / args.log_lines * 1e6,
+        "lines_per_s": args.log_lines / total_time,
+        "batches": writer.batches_written,
+        "rotations": writer.rotations,
+    }
+
+
+def bench_ltm(args, workdir: str) -> list:
+    """
+    Grows the long-term memory retrieval and dedup indexes, timing adds,
+    retrieval and duplicate checks at each size in 'args.ltm_sizes'.
+    """
+    from ltm_dedup import NearDuplicateIndex
+    from ltm_index import LongTermMemoryIndex
+
+    index = LongTermMemoryIndex()
+    dedup = NearDuplicateIndex()
+    results = []
+    added = 0
+    for size in sorted(args.ltm_sizes):
+        start_time = time.perf_counter()
+        for i in range(added, size):
+            entry = f"- Insight {i}: step {i % 97} of task {i} wrote file bench_{i % 13}.txt with result {i * 7 % 1000}"
+            index.add(entry)
+            dedup.add(entry)
+        add_time = time.perf_counter() - start_time
+        new_entries = size - added
+        added = size
+
+        queries = [f"task {q} wrote file bench_{q % 13}.txt" for q in range(20)]
+        start_time = time.perf_counter()
+        for query in queries:
+            index.context(query)
+        search_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        for query in queries:
+            dedup.find_duplicate(query)
+        dedup_time = time.perf_counter() - start_time
+
+        results.append({
+            "entries": size,
+            "add_us": add_time / new_entries * 1e6 if new_entries else None,
+            "context_ms": search_time / len(queries) * 1e3,
+            "dedup_check_ms": dedup_time / len(queries) * 1e3,
+        })
+    return results
+
+
+BENCHMARKS = {
+    "main_loop": bench_main_loop,
+    "task_queue": bench_task_queue,
+    "stm": bench_stm,
+    "log": bench_log,
+    "ltm": bench_ltm,
+}
+
+
+def _int_list(value: str) -> list:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the orchestration layers with a fake or real model backend.")
+    parser.add_argument("--backend", choices=["fake", "real"], default="fake",
+                        help="'fake' answers with fake_llm.FakeLlama; 'real' loads --model_path with llama_cpp.")
+    parser.add_argument("--model_path", default="fake.gguf", help="GGUF model for the real backend.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--token_latency", type=float, default=DEFAULT_TOKEN_LATENCY, help="Fake seconds per generated token.")
+    parser.add_argument("--prompt_latency", type=float, default=DEFAULT_PROMPT_LATENCY, help="Fake seconds per prompt token evaluated.")
+    parser.add_argument("--goal_after", type=int, default=10, help="Fake GoalEvaluationAgent answers YES from this check on.")
+    parser.add_argument("--runs", type=int, default=3, help="main_loop runs.")
+    parser.add_argument("--concurrency", type=int, default=1, help="main_loop --concurrency.")
+    parser.add_argument("--orchestrator", choices=["serial", "async"], default="serial", help="main_loop --orchestrator.")
+    parser.add_argument("--no_stream", action="store_true", help="main_loop --no_stream.")
+    parser.add_argument("--queue_sizes", type=_int_list, default=[10000, 100000], help="TaskQueue sizes.")
+    parser.add_argument("--ops", type=int, default=1000, help="Operations per TaskQueue size and STM iterations.")
+    parser.add_argument("--log_lines", type=int, default=100000, help="Lines written in the log benchmark.")
+    parser.add_argument("--ltm_sizes", type=_int_list, default=[1000, 10000, 50000], help="LTM sizes to measure at.")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file for the results.")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown scenario(s): {', '.join(unknown)}")
+    if args.backend == "fake":
+        get_engine().set_loader(FakeLlama)
+    elif not os.path.exists(args.model_path):
+        parser.error(f"Model file not found at {args.model_path}")
+    else:
+        args.model_path = os.path.abspath(args.model_path)
+
+    workdir = tempfile.mkdtemp(prefix="bench_suite_")
+    results = {}
+    try:
+        for scenario in scenarios:
+            missing = _missing_modules(REQUIRED_MODULES.get(scenario, ()))
+            if missing:
+                reason = f"needs {', '.join(missing)}, which cannot be imported here"
+                results[scenario] = {"skipped": reason}
+                print(f"{scenario:>10}: skipped, {reason}")
+                continue
+            start_time = time.perf_counter()
+            results[scenario] = BENCHMARKS[scenario](args, workdir)
+            print(f"{scenario:>10}: {time.perf_counter() - start_time:.2f} s  {json.dumps(results[scenario])}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+        get_engine().release_all()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "backend": args.backend,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "args": {k: v for k, v in vars(args).items()},
+        },
+        "results": results,
+        "metrics": get_metrics().to_dict(),
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from task_queue import TaskQueue
+
+
+class LegacyTaskQueue:
+    """
+    The previous file-rewriting TaskQueue, kept here only as a baseline.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        if not os.path.exists(self.filename):
+            with open(self.filename, "w", encoding="utf-8"):
+                pass
+
+    def load_tasks(self) -> list:
+        with open(self.filename, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+
+    def save_tasks(self, tasks: list):
+        with open(self.filename, "w", encoding="utf-8") as f:
+            f.writelines(task + "\n" for task in tasks)
+
+    def add_task(self, task: str):
+        tasks = self.load_tasks()
+        if task not in tasks:
+            tasks.append(task)
+            self.save_tasks(tasks)
+
+    def pop_next_task(self) -> str:
+        tasks = self.load_tasks()
+        if not tasks:
+            return None
+        next_task = tasks.pop(0)
+        self.save_tasks(tasks)
+        return next_task
+
+
+def bench_queue(queue_cls, workdir: str, size: int, ops: int) -> dict:
+    """
+    Fills a queue with 'size' tasks, then times 'ops' add_task and 'ops'
+    pop_next_task calls. Returns per-op cost in microseconds.
+    """
+    filename = os.path.join(workdir, f"{queue_cls.__name__}_{size}.txt")
+    queue = queue_cls(filename)
+    queue.save_tasks([f"Task {i}: benchmark task number {i}" for i in range(size)])
+
+    start_time = time.perf_counter()
+    for i in range(ops):
+        queue.add_task(f"New task {i}: added during the benchmark")
+    add_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for _ in range(ops):
+        queue.pop_next_task()
+    pop_time = time.perf_counter() - start_time
+
+    result = {
+        "queue": queue_cls.__name__,
+        "size": size,
+        "ops": ops,
+        "add_us": add_time / ops * 1e6,
+        "pop_us": pop_time / ops * 1e6,
+    }
+
+    if isinstance(queue, TaskQueue):
+        # Recovery cost: reopening replays the journal written above
+        start_time = time.perf_counter()
+        reopened = TaskQueue(filename)
+        result["recover_ms"] = (time.perf_counter() - start_time) * 1e3
+        reopened.close()
+        queue.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-operation cost of TaskQueue against the legacy file-rewriting queue.")
+    parser.add_argument("--sizes", default="10000,100000", help="Comma-separated queue sizes.")
+    parser.add_argument("--ops", type=int, default=200, help="add_task and pop_next_task calls timed per size.")
+    parser.add_argument("--output", default="", help="Optional JSON file for the results.")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="task_queue_bench_")
+    results = []
+    try:
+        for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+            for queue_cls in (LegacyTaskQueue, TaskQueue):
+                result = bench_queue(queue_cls, workdir, size, args.ops)
+                results.append(result)
+                line = (
+                    f"{result['queue']:>16} size={size:>7}  add={result['add_us']:>10.1f} us/op  "
+                    f"pop={result['pop_us']:>10.1f} us/op"
+                )
+                if "recover_ms" in result:
+                    line += f"  recover={result['recover_ms']:.1f} ms"
+                print(line)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
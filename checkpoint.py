@@ -0,0 +1,219 @@
+import json
+import logging
+import os
+import struct
+import time
+
+from prefix_cache import get_prefix_cache, SavedState
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_FILE = "checkpoint.json"
+CHECKPOINT_VERSION = 1
+DEFAULT_MAX_RESULTS = 50
+DEFAULT_MAX_RESULT_CHARS = 1000
+
+RUNNING = "running"
+FINISHED = "finished"
+
+# KV checkpoint record: header and state lengths, a JSON header, then the raw llama_state bytes
+_KV_RECORD = struct.Struct("<II")
+
+
+def _atomic_write(path: str, data: bytes):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(filename=DEFAULT_CHECKPOINT_FILE):
+    """
+    Returns the checkpoint in 'filename' as a dict, or None if it is missing,
+    unreadable or from another checkpoint version.
+    """
+    try:
+        with open(filename, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable checkpoint %s: %s", filename, e)
+        return None
+    if state.get("version") != CHECKPOINT_VERSION:
+        logger.warning("Ignoring checkpoint %s with version %s.", filename, state.get("version"))
+        return None
+    return state
+
+
+def _as_key(value):
+    # JSON turns the tuples of a prefix cache key into lists
+    return tuple(_as_key(v) for v in value) if isinstance(value, list) else value
+
+
+def encode_kv_record(key, state) -> bytes:
+    """
+    Serializes one prefix cache entry: the KV state and the token ids it holds,
+    without logits. 'input_ids' keeps its length (llama_cpp sizes it to n_ctx)
+    but only the first n_tokens ids are stored.
+    """
+    header = json.dumps({
+        "key": key,
+        "input_ids": [int(token) for token in state.input_ids[:state.n_tokens]],
+        "input_ids_len": len(state.input_ids),
+        "n_tokens": int(state.n_tokens),
+        "seed": state.seed,
+        "n_vocab": state.n_vocab,
+    }, separators=(",", ":")).encode("utf-8")
+    llama_state = bytes(state.llama_state[:state.llama_state_size])
+    return _KV_RECORD.pack(len(header), len(llama_state)) + header + llama_state
+
+
+def read_kv_records(filename: str) -> list:
+    """
+    Returns the (key, SavedState) pairs in a KV checkpoint, later records for a
+    key replacing earlier ones. A record cut off by a crash mid-write is dropped
+    and truncated away so the next record is not appended onto it.
+    """
+    import numpy as np
+
+    with open(filename, "rb") as f:
+        data = f.read()
+    states = {}
+    offset = 0
+    while offset + _KV_RECORD.size <= len(data):
+        header_len, state_len = _KV_RECORD.unpack_from(data, offset)
+        start = offset + _KV_RECORD.size
+        end = start + header_len + state_len
+        if end > len(data):
+            break
+        header = json.loads(data[start:start + header_len].decode("utf-8"))
+        input_ids = np.zeros(header["input_ids_len"], dtype=np.intc)
+        input_ids[:header["n_tokens"]] = header["input_ids"]
+        states[_as_key(header["key"])] = SavedState(
+            input_ids, header["n_tokens"], data[start + header_len:end], state_len, header["seed"], header["n_vocab"],
+        )
+        offset = end
+    if offset < len(data):
+        logger.warning("Dropping a partial record at the end of %s.", filename)
+        os.truncate(filename, offset)
+    return list(states.items())
+
+
+class RunCheckpointer:
+    """
+    Saves the progress of a main_loop run so a killed run can continue where it
+    stopped.
+
+    The checkpoint is one compact JSON file: objective, iteration, the task
+    queue and user inputs, the number of completed tasks, the last
+    'max_results' task results (truncated to 'max_result_chars') and the files
+    GoalVerifier expects. save() is
+    called every iteration; it skips the write when nothing changed and
+    otherwise replaces the file atomically through a temp file and rename, so a
+    kill mid-write leaves the previous checkpoint intact.
+
+    With 'save_kv' the KV states of the prompt prefix cache (the evaluated
+    agent preambles) are appended to '<filename>.kv', each prefix once and
+    without its logits, and load_kv() puts them back so a resumed run does not
+    evaluate the preambles again. A new run starts the file over.
+    """
+
+    def __init__(self, filename=DEFAULT_CHECKPOINT_FILE, save_kv=False, max_results=DEFAULT_MAX_RESULTS,
+                 max_result_chars=DEFAULT_MAX_RESULT_CHARS):
+        self.filename = filename
+        self.kv_filename = filename + ".kv"
+        self.save_kv = save_kv
+        self.max_results = max_results
+        self.max_result_chars = max_result_chars
+        self.results = []
+        self._last_state = None
+        self._kv_keys = set()
+        self._kv_append = False
+        self.writes = 0
+        self.skipped = 0
+        self.write_time = 0.0
+
+    def restore(self, state: dict):
+        """
+        Continues recording after the results of a loaded checkpoint, and
+        appending to its KV states.
+        """
+        self.results = list(state.get("results", []))
+        self._kv_append = True
+
+    def record_result(self, task: str, result):
+        result = str(result)
+        if len(result) > self.max_result_chars:
+            result = result[:self.max_result_chars] + "..."
+        self.results.append({"task": task, "result": result})
+        del self.results[:-self.max_results]
+
+    def save(self, objective: str, iteration: int, tasks: list, user_inputs: list, completed_tasks: int,
+             run_id=None, status=RUNNING, files=None) -> bool:
+        """
+        Writes the checkpoint if it changed since the last save. Returns True if
+        a write happened.
+        """
+        start_time = time.perf_counter()
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "status": status,
+            "objective": objective,
+            "run_id": run_id,
+            "iteration": iteration,
+            "tasks": list(tasks),
+            "user_inputs": list(user_inputs),
+            "completed_tasks": completed_tasks,
+            "results": list(self.results),
+            "files": dict(files or {}),
+        }
+        if state == self._last_state:
+            self.skipped += 1
+            return False
+        content = json.dumps(dict(state, saved=round(time.time(), 3)), separators=(",", ":"), ensure_ascii=False)
+        try:
+            _atomic_write(self.filename, content.encode("utf-8"))
+            if self.save_kv:
+                self._save_kv()
+        except OSError as e:
+            logger.warning("Checkpoint write to %s failed: %s", self.filename, e)
+            return False
+        self._last_state = state
+        self.writes += 1
+        self.write_time += time.perf_counter() - start_time
+        return True
+
+    def _save_kv(self):
+        new_states = [(key, state) for key, state in get_prefix_cache().export_states() if key not in self._kv_keys]
+        if not new_states and self._kv_append:
+            return
+        # The first save of a new run replaces a KV file left by an earlier run
+        with open(self.kv_filename, "ab" if self._kv_append else "wb") as f:
+            for key, state in new_states:
+                f.write(encode_kv_record(key, state))
+        self._kv_keys.update(key for key, _ in new_states)
+        self._kv_append = True
+
+    def load_kv(self) -> int:
+        """
+        Loads saved prompt prefix states into the prefix cache. Returns how many
+        were restored.
+        """
+        try:
+            states = read_kv_records(self.kv_filename)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Ignoring unreadable KV checkpoint %s: %s", self.kv_filename, e)
+            return 0
+        get_prefix_cache().import_states(states)
+        self._kv_keys.update(key for key, _ in states)
+        return len(states)
+
+    def stats(self) -> dict:
+        return {
+            "writes": self.writes,
+            "skipped": self.skipped,
+            "avg_write_ms": self.write_time / self.writes * 1e3 if self.writes else 0.0,
+        }
@@ -1,26 +1,35 @@
+from prompt_builder import get_prompt_builder, PromptSection, TRIM_LINES
 from run_model_inference import run_model_inference
 
 class ExecutionAgent:
+    PROMPT_PREFIX = "You are ExecutionAgent. Complete the following task or provide a short reason if impossible:\n"
+
     def __init__(self, model_path: str, debug_mode=False):
         self.model_path = model_path
         self.debug_mode = debug_mode
+        self.prompt_builder = get_prompt_builder(model_path, debug_mode=debug_mode)
 
-    def execute_task(self, task: str) -> str:
+    def execute_task(self, task: str, memory: str = "") -> str:
         """
         Attempts to complete 'task' or provide a short reason if not feasible.
+        'memory' holds relevant long-term memory entries, if any.
         """
-        prompt = (
-            "You are ExecutionAgent. Complete the following task or provide a short reason if impossible:\n"
-            f"Task: {task}\n\n"
-            "Give a direct, actionable result or brief explanation if not possible."
-        )
+        max_tokens = 128
+        memory_section = f"Relevant memory:\n{memory}\n\n" if memory else ""
+        prompt = self.prompt_builder.build([
+            PromptSection(self.PROMPT_PREFIX, fixed=True),
+            PromptSection(memory_section, priority=1, trim=TRIM_LINES),
+            PromptSection(f"Task: {task}\n\n"),
+            PromptSection("Give a direct, actionable result or brief explanation if not possible.", fixed=True),
+        ], max_tokens, agent_type="ExecutionAgent")
 
         response = run_model_inference(
             model_path=self.model_path,
             prompt=prompt,
-            max_tokens=128,
+            max_tokens=max_tokens,
             agent_type="ExecutionAgent",
-            verbose=self.debug_mode
+            verbose=self.debug_mode,
+            prompt_prefix=self.PROMPT_PREFIX
         )
 
         result = response.strip() or "No result."
@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+DEFAULT_SLOTS = 2
+
+
+class FairScheduler:
+    """
+    Admits model calls from concurrent sessions into 'slots' parallel model
+    contexts (ModelEngine replicas, or the parallel slots of a completion
+    server), round-robin between sessions.
+
+    When every slot is busy, callers wait in a FIFO per session, and a freed
+    slot goes to the next session in turn rather than to whichever caller
+    asked first. A session with many concurrent workers therefore cannot
+    starve one that submits a single prompt at a time.
+    """
+
+    def __init__(self, slots=DEFAULT_SLOTS):
+        self.slots = max(1, slots)
+        self._free = self.slots
+        self._cond = threading.Condition()
+        self._waiting = {}
+        self._turns = deque()
+        self._granted = set()
+        self._stats = {}
+
+    def _session_stats(self, session_id):
+        return self._stats.setdefault(session_id, {"calls": 0, "wait_seconds": 0.0, "max_wait": 0.0, "busy_seconds": 0.0})
+
+    def acquire(self, session_id):
+        start_time = time.perf_counter()
+        with self._cond:
+            if self._free > 0 and not self._turns:
+                self._free -= 1
+            else:
+                ticket = object()
+                tickets = self._waiting.get(session_id)
+                if tickets is None:
+                    tickets = self._waiting[session_id] = deque()
+                    self._turns.append(session_id)
+                tickets.append(ticket)
+                while ticket not in self._granted:
+                    self._cond.wait()
+                self._granted.discard(ticket)
+            waited = time.perf_counter() - start_time
+            stats = self._session_stats(session_id)
+            stats["calls"] += 1
+            stats["wait_seconds"] += waited
+            stats["max_wait"] = max(stats["max_wait"], waited)
+
+    def release(self, session_id, busy_seconds=0.0):
+        with self._cond:
+            self._session_stats(session_id)["busy_seconds"] += busy_seconds
+            if not self._turns:
+                self._free += 1
+                return
+            # Hand the slot straight to the next session in turn; it goes to the
+            # back of the rotation if it has more callers waiting
+            next_session = self._turns.popleft()
+            tickets = self._waiting[next_session]
+            self._granted.add(tickets.popleft())
+            if tickets:
+                self._turns.append(next_session)
+            else:
+                del self._waiting[next_session]
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, session_id):
+        """
+        Holds one model slot for 'session_id' while the block runs.
+        """
+        self.acquire(session_id)
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(session_id, time.perf_counter() - start_time)
+
+    def stats(self) -> dict:
+        """
+        Returns per-session model calls, mean and max seconds waited for a
+        slot, and seconds spent holding one.
+        """
+        with self._cond:
+            return {
+                session_id: {
+                    "calls": s["calls"],
+                    "avg_wait": s["wait_seconds"] / s["calls"] if s["calls"] else 0.0,
+                    "max_wait": s["max_wait"],
+                    "busy_seconds": s["busy_seconds"],
+                }
+                for session_id, s in self._stats.items()
+            }
+
+
+_scheduler = None
+
+
+def configure_scheduler(slots):
+    """
+    Routes model calls through a FairScheduler with 'slots' slots; None turns
+    scheduling off.
+    """
+    global _scheduler
+    _scheduler = FairScheduler(slots) if slots else None
+    return _scheduler
+
+
+def get_scheduler():
+    """
+    Returns the configured FairScheduler, or None if model calls are not scheduled.
+    """
+    return _scheduler
@@ -0,0 +1,255 @@
+import ctypes
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+AGENT_PATTERN = re.compile(r"You are (\w+Agent)")
+
+DEFAULT_TOKEN_LATENCY = 0.002
+DEFAULT_PROMPT_LATENCY = 0.0001
+DEFAULT_GOAL_MET_AFTER = 10
+DEFAULT_EMBEDDING_DIM = 64
+# tokenize() maps words to ids 3 .. 32002
+N_VOCAB = 32003
+
+
+class FakeBackendConfig:
+    """
+    Behaviour of FakeLlama: seconds per generated token and per evaluated
+    prompt token, the GoalEvaluationAgent call that first answers YES (0 means
+    never), and optional per-agent response functions taking the prompt.
+    """
+
+    def __init__(self, token_latency=DEFAULT_TOKEN_LATENCY, prompt_latency=DEFAULT_PROMPT_LATENCY,
+                 goal_met_after=DEFAULT_GOAL_MET_AFTER, responses=None):
+        self.token_latency = token_latency
+        self.prompt_latency = prompt_latency
+        self.goal_met_after = goal_met_after
+        self.responses = responses or {}
+
+
+_config = FakeBackendConfig()
+_state_lock = threading.Lock()
+_counters = {"goal_checks": 0, "tasks": 0, "calls": 0, "model_time": 0.0, "busy_time": 0.0}
+# Simulated calls in flight and when the current stretch of model work began
+_busy = {"active": 0, "since": 0.0}
+_vocab = {}
+
+
+def configure_fake_backend(**kwargs) -> FakeBackendConfig:
+    """
+    Sets the FakeBackendConfig and resets the counters, so every benchmark run
+    sees the same sequence of outputs.
+    """
+    global _config
+    _config = FakeBackendConfig(**kwargs)
+    with _state_lock:
+        _counters.update(goal_checks=0, tasks=0, calls=0, model_time=0.0, busy_time=0.0)
+    return _config
+
+
+def fake_backend_stats() -> dict:
+    """
+    Returns the number of completions, the seconds of simulated model work summed
+    over all calls ('model_time') and the wall seconds during which at least one
+    call was working ('busy_time'), which is less when calls overlap.
+    """
+    with _state_lock:
+        return {"calls": _counters["calls"], "model_time": _counters["model_time"], "busy_time": _counters["busy_time"]}
+
+
+def _next(counter: str) -> int:
+    with _state_lock:
+        _counters[counter] += 1
+        return _counters[counter]
+
+
+def _section(prompt: str, start: str, end: str) -> str:
+    _, _, rest = prompt.partition(start)
+    return rest.split(end, 1)[0].strip()
+
+
+def _default_response(agent_type: str, prompt: str) -> str:
+    if agent_type == "GoalEvaluationAgent":
+        met_after = _config.goal_met_after
+        return "YES" if met_after and _next("goal_checks") >= met_after else "NO"
+    if agent_type == "TaskCreationAgent":
+        first, second, third = _next("tasks"), _next("tasks"), _next("tasks")
+        return (
+            f"- Task {first}: collect the details needed for step {first}\n"
+            f"FILE#create#bench_{second}.txt#hello world!\n"
+            f"- Task {third}: check the result of step {third}"
+        )
+    if agent_type == "TaskPrioritizationAgent":
+        return _section(prompt, "Given these tasks:\n", "\n\n1)")
+    if agent_type == "ExecutionAgent":
+        return "Done: " + _section(prompt, "Task: ", "\n")
+    if agent_type == "LongTermMemoryAgent":
+        return "- Learned from " + _section(prompt, "Task: ", "\n")
+    return "OK"
+
+
+class FakeLlamaState:
+    """
+    Shaped like llama_cpp.LlamaState. The simulated KV state is just the token
+    ids, and 'scores' is a zero view rather than a full logits copy.
+    """
+
+    def __init__(self, input_ids: list):
+        self.input_ids = np.asarray(input_ids, dtype=np.intc)
+        self.n_tokens = len(input_ids)
+        self.llama_state = self.input_ids.tobytes()
+        self.llama_state_size = len(self.llama_state)
+        self.seed = 0
+        self.scores = np.broadcast_to(np.zeros(N_VOCAB, dtype=np.float32), (self.n_tokens, N_VOCAB))
+
+
+def next_token(token: int) -> int:
+    """
+    The token FakeLlama's logits favour after 'token', so greedy decoding is deterministic.
+    """
+    return (token * 7 + 11) % (N_VOCAB - 3) + 3
+
+
+class FakeContext:
+    """
+    Stands in for llama_cpp's internal context: get_logits() points at the
+    logits row of the last evaluated token.
+    """
+
+    def __init__(self):
+        self._logits = (ctypes.c_float * N_VOCAB)()
+
+    def set_last_token(self, token: int):
+        ctypes.memset(self._logits, 0, ctypes.sizeof(self._logits))
+        self._logits[next_token(token)] = 1.0
+
+    def get_logits(self):
+        return ctypes.cast(self._logits, ctypes.POINTER(ctypes.c_float))
+
+
+class FakeLlama:
+    """
+    Deterministic stand-in for llama_cpp.Llama.
+
+    It implements the parts of the Llama API this package uses: tokenize,
+    detokenize, eval, reset, save_state/load_state, embed and completions,
+    streamed or not. Completions answer in the shape each agent expects,
+    without needing a GGUF model. Prompt tokens already in the context are
+    not charged again, so prefix reuse shows up in timings as it does with
+    llama_cpp.
+    """
+
+    def __init__(self, model_path="", n_ctx=512, verbose=False, embedding=False, logits_all=False, draft_model=None,
+                 **kwargs):
+        self.model_path = model_path
+        self._n_ctx = n_ctx
+        self.verbose = verbose
+        self.embedding = embedding
+        # As in llama_cpp, a draft model implies logits for every token
+        self.logits_all = logits_all or draft_model is not None
+        self.draft_model = draft_model
+        self._input_ids = []
+        self._ctx = FakeContext()
+
+    @property
+    def input_ids(self):
+        return np.asarray(self._input_ids, dtype=np.intc)
+
+    @property
+    def n_tokens(self):
+        return len(self._input_ids)
+
+    @n_tokens.setter
+    def n_tokens(self, value):
+        # Llama.eval continues after n_tokens, so lowering it discards the rest of the context
+        del self._input_ids[value:]
+
+    def n_ctx(self):
+        return self._n_ctx
+
+    def n_vocab(self):
+        return N_VOCAB
+
+    def tokenize(self, text: bytes, add_bos=True, special=False) -> list:
+        tokens = [1] if add_bos else []
+        for word in re.findall(r"\S+\s*", text.decode("utf-8", errors="ignore")):
+            token = zlib.crc32(word.encode("utf-8")) % (N_VOCAB - 3) + 3
+            _vocab[token] = word
+            tokens.append(token)
+        return tokens
+
+    def detokenize(self, tokens) -> bytes:
+        return "".join(_vocab.get(int(token), "") for token in tokens).encode("utf-8")
+
+    def reset(self):
+        self._input_ids = []
+
+    def eval(self, tokens):
+        self._simulate(len(tokens) * _config.prompt_latency)
+        self._input_ids.extend(int(token) for token in tokens)
+        if self._input_ids:
+            self._ctx.set_last_token(self._input_ids[-1])
+
+    def save_state(self):
+        return FakeLlamaState(self._input_ids)
+
+    def load_state(self, state):
+        self._input_ids = [int(token) for token in state.input_ids[:state.n_tokens]]
+
+    def embed(self, text: str) -> list:
+        rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+        return rng.standard_normal(DEFAULT_EMBEDDING_DIM).astype(np.float32).tolist()
+
+    def close(self):
+        pass
+
+    def _simulate(self, seconds: float):
+        with _state_lock:
+            if _busy["active"] == 0:
+                _busy["since"] = time.perf_counter()
+            _busy["active"] += 1
+        try:
+            if seconds > 0:
+                time.sleep(seconds)
+        finally:
+            with _state_lock:
+                _counters["model_time"] += seconds
+                _busy["active"] -= 1
+                if _busy["active"] == 0:
+                    _counters["busy_time"] += time.perf_counter() - _busy["since"]
+
+    def __call__(self, prompt: str, max_tokens=16, stream=False, stop=None, **kwargs):
+        _next("calls")
+        tokens = self.tokenize(prompt.encode("utf-8"))
+        common = 0
+        for a, b in zip(self._input_ids, tokens):
+            if a != b:
+                break
+            common += 1
+        self._simulate((len(tokens) - common) * _config.prompt_latency)
+        self._input_ids = tokens
+
+        match = AGENT_PATTERN.search(prompt)
+        agent_type = match.group(1) if match else None
+        respond = _config.responses.get(agent_type)
+        text = respond(prompt) if respond is not None else _default_response(agent_type, prompt)
+        for stop_seq in stop or []:
+            text = text.split(stop_seq, 1)[0]
+        pieces = re.findall(r"\s*\S+", text)[:max_tokens]
+
+        if stream:
+            return self._stream(pieces)
+        self._simulate(len(pieces) * _config.token_latency)
+        return {
+            "choices": [{"text": "".join(pieces), "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(tokens), "completion_tokens": len(pieces)},
+        }
+
+    def _stream(self, pieces):
+        for piece in pieces:
+            self._simulate(_config.token_latency)
+            yield {"choices": [{"text": piece, "finish_reason": None}]}
@@ -1,30 +1,44 @@
+from grammars import GOAL_EVALUATION_GRAMMAR
+from prompt_builder import get_prompt_builder, PromptSection, TRIM_LINES
 from run_model_inference import run_model_inference
+from stream_parsers import YesNoParser
 
 class GoalEvaluationAgent:
+    PROMPT_PREFIX = "You are GoalEvaluationAgent. Determine if this objective is met:\n"
+
     def __init__(self, model_path: str, debug_mode=False):
         self.model_path = model_path
         self.debug_mode = debug_mode
+        self.prompt_builder = get_prompt_builder(model_path, debug_mode=debug_mode)
 
-    def evaluate_progress(self, objective: str) -> bool:
+    def evaluate_progress(self, objective: str, evidence: str = "") -> bool:
         """
         Returns True if the given objective is deemed completed, else False.
+        'evidence' lists what the run has verifiably done so far.
+        Generation stops as soon as the answer starts with YES or anything else.
         """
-        prompt = (
-            "You are GoalEvaluationAgent. Determine if this objective is met:\n"
-            f"Objective: {objective}\n\n"
-            "Reply 'YES' if fully met, otherwise 'NO'."
-        )
+        max_tokens = 16
+        evidence_section = f"Evidence:\n{evidence}\n\n" if evidence else ""
+        prompt = self.prompt_builder.build([
+            PromptSection(self.PROMPT_PREFIX, fixed=True),
+            PromptSection(f"Objective: {objective}\n\n"),
+            PromptSection(evidence_section, priority=1, trim=TRIM_LINES),
+            PromptSection("Reply 'YES' if fully met, otherwise 'NO'.", fixed=True),
+        ], max_tokens, agent_type="GoalEvaluationAgent")
 
+        parser = YesNoParser()
         response = run_model_inference(
             model_path=self.model_path,
             prompt=prompt,
-            max_tokens=16,
+            max_tokens=max_tokens,
             agent_type="GoalEvaluationAgent",
-            verbose=self.debug_mode
+            verbose=self.debug_mode,
+            prompt_prefix=self.PROMPT_PREFIX,
+            stream_parser=parser,
+            grammar=GOAL_EVALUATION_GRAMMAR
         )
 
-        answer = response.strip().upper()
         if self.debug_mode:
-            print(f"[DEBUG] GoalEvaluationAgent answer: {answer}")
+            print(f"[DEBUG] GoalEvaluationAgent answer: {response.strip().upper()}")
 
-        return answer.startswith("YES")
+        return parser.answer
@@ -0,0 +1,183 @@
+import logging
+import os
+import threading
+import time
+
+from run_log import log_event
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_INTERVAL = 8
+DEFAULT_MAX_EVIDENCE_TASKS = 10
+
+# Why a goal check was answered
+DECIDED_FILES = "file_check"
+DECIDED_UNCHANGED = "unchanged"
+DECIDED_SCHEDULE = "schedule"
+DECIDED_MODEL = "model"
+
+
+class GoalVerifier:
+    """
+    Answers goal checks with cheap deterministic checks and only asks the
+    model when they cannot decide.
+
+    The checks run on the recorded task outcomes: every FILE#create target must
+    exist with the content the task wrote, the long-term memory file is compared
+    with its state at the last model check, and the task queue is checked for
+    being drained. A failed file check answers NO outright. So does a check
+    where nothing observable changed since the model last said NO (no task
+    completed, no file or LTM change, the queue still in the same drained or
+    non-drained state), because the model would see the same evidence again. Otherwise the model is asked on an
+    adaptive schedule: after every NO the number of checks to skip before the
+    next one doubles, up to 'max_interval', and it resets once the queue drains
+    or the model is asked. When the model runs, the evidence is passed to
+    'evaluate' with the objective.
+    """
+
+    def __init__(self, evaluate, pending_tasks, base_dir=None, ltm_file=None, max_interval=DEFAULT_MAX_INTERVAL,
+                 max_evidence_tasks=DEFAULT_MAX_EVIDENCE_TASKS):
+        self.evaluate = evaluate
+        self.pending_tasks = pending_tasks
+        self.base_dir = base_dir
+        self.ltm_file = ltm_file
+        self.max_interval = max(1, max_interval)
+        self.max_evidence_tasks = max_evidence_tasks
+        self._lock = threading.Lock()
+        self._files = {}
+        self._completed = []
+        self._outcomes = 0
+        self._last_fingerprint = None
+        self._last_ltm = self._ltm_state()
+        self._interval = 1
+        self._since_model = 0
+        self.checks = 0
+        self.model_calls = 0
+        self.decided = {DECIDED_FILES: 0, DECIDED_UNCHANGED: 0, DECIDED_SCHEDULE: 0}
+        self.check_time = 0.0
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.base_dir, filename) if self.base_dir else filename
+
+    def _ltm_state(self):
+        if not self.ltm_file:
+            return None
+        try:
+            st = os.stat(self.ltm_file)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def record_outcome(self, task: str, result):
+        """
+        Records a completed task. For FILE#create the written content is kept so
+        the file can be verified later; a later create of the same file replaces it.
+        """
+        with self._lock:
+            if task.startswith("FILE#"):
+                _, action, filename, *content = task.split("#")
+                if action == "create":
+                    self._files[filename] = "#".join(content)
+            self._completed.append(task)
+            self._outcomes += 1
+
+    def expected_files(self) -> dict:
+        """
+        Returns {filename: content} for every FILE#create outcome recorded, e.g.
+        for a run checkpoint.
+        """
+        with self._lock:
+            return dict(self._files)
+
+    def restore_files(self, files: dict):
+        """
+        Adds expected files saved with expected_files(), e.g. on resume.
+        """
+        with self._lock:
+            self._files.update(files)
+
+    def _check_files(self) -> list:
+        failures = []
+        for filename, expected in self._files.items():
+            try:
+                with open(self._path(filename), "r", encoding="utf-8") as f:
+                    actual = f.read()
+            except FileNotFoundError:
+                failures.append(f"File '{filename}' is missing.")
+                continue
+            except (OSError, UnicodeDecodeError) as e:
+                failures.append(f"File '{filename}' cannot be read: {e}")
+                continue
+            if actual != expected:
+                failures.append(f"File '{filename}' does not contain the content written to it.")
+        return failures
+
+    def check(self, objective: str) -> bool:
+        """
+        Returns True if the objective is met. The model is only called when the
+        deterministic checks and the schedule leave the answer open.
+        """
+        start_time = time.perf_counter()
+        with self._lock:
+            self.checks += 1
+            self._since_model += 1
+            files = dict(self._files)
+            completed = list(self._completed)
+            failures = self._check_files()
+            pending = len(self.pending_tasks())
+            ltm = self._ltm_state()
+            ltm_changed = ltm != self._last_ltm
+            fingerprint = (tuple(sorted(files.items())), ltm, pending == 0, self._outcomes)
+
+            decided = None
+            if failures:
+                decided = DECIDED_FILES
+            elif fingerprint == self._last_fingerprint:
+                decided = DECIDED_UNCHANGED
+            elif pending and self._since_model < self._interval:
+                decided = DECIDED_SCHEDULE
+            if decided is not None:
+                self.decided[decided] += 1
+                self.check_time += time.perf_counter() - start_time
+            else:
+                self._completed.clear()
+                self._last_ltm = ltm
+                self._since_model = 0
+
+        if decided is not None:
+            log_event("goal_verify", decided_by=decided, met=False, pending=pending, file_failures=len(failures))
+            if failures:
+                logger.info("Goal check answered NO by file checks: %s", " ".join(failures))
+            return False
+
+        evidence = self._evidence(files, completed, ltm_changed, pending)
+        met = bool(self.evaluate(objective, evidence))
+        with self._lock:
+            self.model_calls += 1
+            self._last_fingerprint = fingerprint
+            # Back off after a NO; a drained queue always gets the next check
+            self._interval = 1 if met or not pending else min(self._interval * 2, self.max_interval)
+            self.check_time += time.perf_counter() - start_time
+        log_event("goal_verify", decided_by=DECIDED_MODEL, met=met, pending=pending, file_failures=0)
+        return met
+
+    def _evidence(self, files: dict, completed: list, ltm_changed: bool, pending: int) -> str:
+        lines = [f"- File '{filename}' exists with the expected content." for filename in sorted(files)]
+        if ltm_changed:
+            lines.append("- Long-term memory gained new insights since the last check.")
+        lines.append("- The task queue is empty." if not pending else f"- {pending} task(s) are still queued.")
+        if completed:
+            recent = completed[-self.max_evidence_tasks:]
+            lines.append(f"- Completed since the last check: {'; '.join(recent)}")
+        return "\n".join(lines)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "checks": self.checks,
+                "model_calls": self.model_calls,
+                "decided_by_files": self.decided[DECIDED_FILES],
+                "decided_unchanged": self.decided[DECIDED_UNCHANGED],
+                "decided_by_schedule": self.decided[DECIDED_SCHEDULE],
+                "avg_check_ms": self.check_time / self.checks * 1e3 if self.checks else 0.0,
+            }
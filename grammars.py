@@ -0,0 +1,113 @@
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_GRAMMARS = 32
+
+# Task lines as main_loop dispatches them: FILE#create#name#content,
+# FILE#read#name, WEB#query, or a bulleted task for ExecutionAgent.
+_TASK_RULES = r'''
+task ::= file | web | text
+file ::= "FILE#" ("create#" name "#" content | "read#" name)
+web ::= "WEB#" [^\n]+
+text ::= "- " [^\n#]+
+name ::= [a-zA-Z0-9_./-]+
+content ::= [^\n]*
+'''
+
+TASK_CREATION_GRAMMAR = r'''
+root ::= "NO TASKS REQUIRED" | task ("\n" task)? ("\n" task)?
+''' + _TASK_RULES
+
+GOAL_EVALUATION_GRAMMAR = r'''
+root ::= "YES" | "NO"
+'''
+
+LONG_TERM_MEMORY_GRAMMAR = r'''
+root ::= "NO NEW INSIGHTS" | bullet ("\n" bullet)?
+bullet ::= "- " [^\n]+
+'''
+
+
+def _literal(text: str) -> str:
+    escaped = text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r")
+    return f'"{escaped}"'
+
+
+def task_list_grammar(tasks) -> str:
+    """
+    Returns a grammar that only allows lines repeating one of 'tasks', so
+    TaskPrioritizationAgent cannot add tasks or commentary of its own.
+    """
+    alternatives = " | ".join(_literal(task) for task in dict.fromkeys(tasks))
+    return f'root ::= line ("\\n" line)*\nline ::= {alternatives}\n'
+
+
+class GrammarCache:
+    """
+    Compiled LlamaGrammar objects keyed by (agent_type, GBNF text).
+
+    Compiling parses the GBNF every time, so each grammar is built once and
+    reused. Per-call grammars such as the task list of TaskPrioritizationAgent
+    are evicted least-recently-used once more than 'max_grammars' are held.
+    """
+
+    def __init__(self, max_grammars=DEFAULT_MAX_GRAMMARS):
+        self.max_grammars = max_grammars
+        self.enabled = False
+        self._grammars = OrderedDict()
+        self._lock = threading.Lock()
+        self.compiled = 0
+        self.hits = 0
+
+    def get(self, agent_type, gbnf: str):
+        """
+        Returns the compiled grammar for 'gbnf', or None if grammars are disabled.
+        """
+        if not self.enabled or not gbnf:
+            return None
+        key = (agent_type, gbnf)
+        with self._lock:
+            grammar = self._grammars.get(key)
+            if grammar is not None:
+                self._grammars.move_to_end(key)
+                self.hits += 1
+                return grammar
+
+        from llama_cpp import LlamaGrammar
+        grammar = LlamaGrammar.from_string(gbnf, verbose=False)
+        with self._lock:
+            self.compiled += 1
+            self._grammars[key] = grammar
+            while len(self._grammars) > self.max_grammars:
+                self._grammars.popitem(last=False)
+        logger.info("Compiled output grammar for %s.", agent_type)
+        return grammar
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"enabled": self.enabled, "cached": len(self._grammars), "compiled": self.compiled, "hits": self.hits}
+
+
+_grammar_cache = None
+_grammar_cache_lock = threading.Lock()
+
+
+def get_grammar_cache() -> GrammarCache:
+    """
+    Returns the process-wide GrammarCache, creating it on first use.
+    """
+    global _grammar_cache
+    with _grammar_cache_lock:
+        if _grammar_cache is None:
+            _grammar_cache = GrammarCache()
+        return _grammar_cache
+
+
+def configure_grammars(enabled: bool):
+    """
+    Turns grammar-constrained decoding on or off for every agent.
+    """
+    get_grammar_cache().enabled = enabled
@@ -0,0 +1,414 @@
+import http.client
+import json
+import logging
+import os
+import threading
+import time
+import urllib.parse
+
+from grammars import get_grammar_cache
+from metrics import get_metrics
+from model_engine import get_engine, DEFAULT_N_CTX
+from prefix_cache import get_prefix_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SERVER_URL = "http://127.0.0.1:8080"
+DEFAULT_SERVER_TIMEOUT = 120.0
+DEFAULT_SERVER_RETRIES = 2
+DEFAULT_POOL_SIZE = 4
+RETRY_BACKOFF_SECONDS = 0.5
+
+# Overloaded, restarting or still-loading servers answer with these; the
+# request is retried. Other errors (bad grammar, bad parameters) are not.
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+class InferenceBackendError(RuntimeError):
+    pass
+
+
+class Completion:
+    """
+    Result of one backend completion. Token counts are None when the backend
+    does not report them; 'first_output' is the perf_counter() time at which a
+    stream parser first had output (None when not streamed).
+    """
+
+    __slots__ = ("text", "prompt_tokens", "completion_tokens", "first_output", "stopped_early")
+
+    def __init__(self, text, prompt_tokens=None, completion_tokens=None, first_output=None, stopped_early=False):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.first_output = first_output
+        self.stopped_early = stopped_early
+
+
+def stream_into_parser(chunks, stream_parser) -> Completion:
+    """
+    Feeds OpenAI-style completion chunks into 'stream_parser' and stops as soon
+    as it has decided. Closing 'chunks' ends generation on the backend.
+    """
+    first_output = None
+    pieces = []
+    try:
+        for chunk in chunks:
+            piece = chunk["choices"][0]["text"] if chunk.get("choices") else ""
+            pieces.append(piece)
+            stop = stream_parser.feed(piece)
+            if first_output is None and stream_parser.has_output:
+                first_output = time.perf_counter()
+            if stop:
+                break
+    finally:
+        chunks.close()
+    return Completion("".join(pieces), completion_tokens=len(pieces), first_output=first_output,
+                      stopped_early=stream_parser.stopped)
+
+
+def _response_text(response: dict) -> str:
+    return response["choices"][0]["text"] if response.get("choices") else ""
+
+
+class InferenceBackend:
+    """
+    Where run_model_inference sends completions and run_embedding embeddings.
+
+    'params' holds max_tokens, temperature, top_p, top_k and stop. With a
+    'stream_parser' the completion is streamed into it and stopped once the
+    parser has decided; otherwise the full text is returned and the caller
+    feeds the parser. 'grammar' is GBNF text or None.
+    """
+
+    name = None
+    supports_speculative = False
+
+    def complete(self, model_path: str, prompt: str, params: dict, agent_type=None, stream_parser=None,
+                 prompt_prefix=None, grammar=None, drafter=None, verbose=False) -> Completion:
+        raise NotImplementedError
+
+    def embed(self, model_path: str, text: str, verbose=False) -> list:
+        raise NotImplementedError
+
+    def check(self, model_path: str):
+        """
+        Raises InferenceBackendError if the backend cannot serve 'model_path'.
+        """
+
+    def stats(self) -> dict:
+        return {}
+
+    def close(self):
+        pass
+
+
+class LlamaCppBackend(InferenceBackend):
+    """
+    In-process llama_cpp models from the process-wide ModelEngine, with the
+    prompt-prefix KV cache, compiled grammars and speculative decoding.
+    """
+
+    name = "llama_cpp"
+    supports_speculative = True
+
+    def complete(self, model_path, prompt, params, agent_type=None, stream_parser=None,
+                 prompt_prefix=None, grammar=None, drafter=None, verbose=False):
+        params = dict(params)
+        compiled_grammar = get_grammar_cache().get(agent_type, grammar)
+        if compiled_grammar is not None:
+            params["grammar"] = compiled_grammar
+
+        # llama_cpp only enables the logits speculative decoding verifies against
+        # when a Llama is constructed with its draft model, so speculative calls
+        # use their own instance built with the (shared) base drafter.
+        base_drafter = getattr(drafter, "drafter", drafter)
+        with get_engine().acquire(model_path, n_ctx=DEFAULT_N_CTX, verbose=verbose, draft_model=base_drafter) as llm:
+            if prompt_prefix:
+                # States of logits_all instances are laid out differently, so they are cached apart
+                skipped = get_prefix_cache().prepare(
+                    llm, (model_path, DEFAULT_N_CTX, base_drafter is not None), agent_type, prompt, prompt_prefix,
+                    verbose=verbose
+                )
+                get_metrics().inc("inference_cache_total", agent=agent_type, cache="prefix",
+                                  result="hit" if skipped else "miss")
+            if drafter is None:
+                return self._complete(llm, prompt, params, stream_parser)
+            # The counting wrapper is per call; the instance keeps its base drafter between calls
+            llm.draft_model = drafter
+            try:
+                return self._complete(llm, prompt, params, stream_parser)
+            finally:
+                llm.draft_model = base_drafter
+
+    def _complete(self, llm, prompt, params, stream_parser):
+        if stream_parser is not None:
+            completion = stream_into_parser(llm(prompt, stream=True, **params), stream_parser)
+            # Streamed chunks carry no usage; the context holds prompt plus generated tokens
+            completion.prompt_tokens = max(0, llm.n_tokens - completion.completion_tokens)
+            return completion
+        response = llm(prompt, **params)
+        usage = response.get("usage") or {}
+        return Completion(_response_text(response), usage.get("prompt_tokens"), usage.get("completion_tokens"))
+
+    def embed(self, model_path, text, verbose=False):
+        with get_engine().acquire(model_path, n_ctx=DEFAULT_N_CTX, verbose=verbose, embedding=True) as llm:
+            return llm.embed(text)
+
+    def check(self, model_path):
+        if not os.path.exists(model_path):
+            raise InferenceBackendError(f"Model file not found at {model_path}.")
+
+
+class _ConnectionPool:
+    """
+    Idle keep-alive connections to one server, reused most-recently-returned
+    first so the connection least likely to have timed out is picked.
+    """
+
+    def __init__(self, scheme: str, host: str, port, timeout: float, max_idle: int):
+        self._connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.max_idle = max(1, max_idle)
+        self._idle = []
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+
+    def get(self):
+        """
+        Returns (connection, reused).
+        """
+        with self._lock:
+            if self._idle:
+                self.reused += 1
+                return self._idle.pop(), True
+            self.opened += 1
+        return self._connection_class(self.host, self.port, timeout=self.timeout), False
+
+    def put(self, connection):
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+class OpenAICompatibleBackend(InferenceBackend):
+    """
+    Client for an OpenAI-compatible completion server, such as llama.cpp's
+    llama-server or llama_cpp.server, so several processes share one loaded
+    model and the server's batching.
+
+    Requests go over pooled keep-alive connections. Connection errors and
+    RETRY_STATUSES are retried up to 'retries' times with exponential backoff;
+    a stale pooled connection the server already closed is replaced without
+    counting as a retry. A stream is not retried once its first chunk arrived.
+    Grammars are sent as GBNF text, and the server is asked to keep the prompt
+    in its KV cache, which takes the place of the in-process prefix cache.
+    Speculative decoding is left to the server's own draft model settings.
+    """
+
+    name = "openai"
+
+    def __init__(self, server_url=DEFAULT_SERVER_URL, timeout=DEFAULT_SERVER_TIMEOUT, retries=DEFAULT_SERVER_RETRIES,
+                 pool_size=DEFAULT_POOL_SIZE, api_key=None):
+        parsed = urllib.parse.urlsplit(server_url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            raise ValueError(f"Invalid server URL: {server_url}")
+        self.server_url = server_url
+        self.base_path = parsed.path.rstrip("/")
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        self._pool = _ConnectionPool(parsed.scheme, parsed.hostname, parsed.port, timeout, pool_size)
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+
+    def _headers(self) -> dict:
+        headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def _count(self, counter: str):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _request(self, method: str, path: str, body=None):
+        """
+        Sends one request and returns (connection, response) with the body unread.
+        """
+        payload = json.dumps(body).encode("utf-8") if body is not None else None
+        url = self.base_path + path
+        self._count("requests")
+        attempt = 0
+        while True:
+            connection, reused = self._pool.get()
+            try:
+                connection.request(method, url, body=payload, headers=self._headers())
+                response = connection.getresponse()
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                if reused:
+                    continue
+                error = f"{type(e).__name__}: {e}"
+            else:
+                if response.status < 400:
+                    return connection, response
+                detail = response.read(512).decode("utf-8", errors="replace")
+                self._release(connection, response)
+                error = f"HTTP {response.status} {response.reason}: {detail}"
+                if response.status not in RETRY_STATUSES:
+                    self._count("failures")
+                    raise InferenceBackendError(f"{method} {self.server_url}{path} failed with {error}")
+
+            if attempt >= self.retries:
+                self._count("failures")
+                raise InferenceBackendError(
+                    f"{method} {self.server_url}{path} failed after {attempt + 1} attempt(s): {error}"
+                )
+            delay = RETRY_BACKOFF_SECONDS * 2 ** attempt
+            logger.warning("%s %s%s failed (%s); retrying in %.1f s.", method, self.server_url, path, error, delay)
+            self._count("retried")
+            time.sleep(delay)
+            attempt += 1
+
+    def _release(self, connection, response):
+        """
+        Returns the connection to the pool if its response was read to the end.
+        """
+        if response.will_close or not response.isclosed():
+            connection.close()
+        else:
+            self._pool.put(connection)
+
+    def _request_json(self, method: str, path: str, body=None) -> dict:
+        connection, response = self._request(method, path, body)
+        try:
+            data = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            connection.close()
+            raise InferenceBackendError(f"Reading {self.server_url}{path} failed: {e}") from e
+        self._release(connection, response)
+        try:
+            return json.loads(data)
+        except ValueError as e:
+            raise InferenceBackendError(f"Invalid JSON from {self.server_url}{path}: {e}") from e
+
+    def _stream_events(self, connection, response):
+        """
+        Yields the JSON chunks of a server-sent event stream. The connection is
+        only pooled again if the stream ran to its end.
+        """
+        finished = False
+        try:
+            for line in response:
+                line = line.strip()
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    response.read()
+                    finished = True
+                    break
+                yield json.loads(data)
+        finally:
+            if finished:
+                self._release(connection, response)
+            else:
+                connection.close()
+
+    def _model_name(self, model_path: str):
+        return os.path.basename(model_path) if model_path else None
+
+    def complete(self, model_path, prompt, params, agent_type=None, stream_parser=None,
+                 prompt_prefix=None, grammar=None, drafter=None, verbose=False):
+        body = {
+            "prompt": prompt,
+            "max_tokens": params["max_tokens"],
+            "temperature": params["temperature"],
+            "top_p": params["top_p"],
+            "top_k": params["top_k"],
+            "cache_prompt": True,
+        }
+        model = self._model_name(model_path)
+        if model:
+            body["model"] = model
+        if params.get("stop"):
+            body["stop"] = params["stop"]
+        if grammar:
+            body["grammar"] = grammar
+
+        if stream_parser is not None:
+            body["stream"] = True
+            connection, response = self._request("POST", "/v1/completions", body)
+            return stream_into_parser(self._stream_events(connection, response), stream_parser)
+
+        response = self._request_json("POST", "/v1/completions", body)
+        usage = response.get("usage") or {}
+        return Completion(_response_text(response), usage.get("prompt_tokens"), usage.get("completion_tokens"))
+
+    def embed(self, model_path, text, verbose=False):
+        body = {"input": text}
+        model = self._model_name(model_path)
+        if model:
+            body["model"] = model
+        response = self._request_json("POST", "/v1/embeddings", body)
+        data = response.get("data") or []
+        if not data:
+            raise InferenceBackendError(f"No embedding returned by {self.server_url}")
+        return data[0]["embedding"]
+
+    def check(self, model_path):
+        self._request_json("GET", "/v1/models")
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retried,
+                "failures": self.failures,
+                "connections_opened": self._pool.opened,
+                "connections_reused": self._pool.reused,
+            }
+
+    def close(self):
+        self._pool.close()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> InferenceBackend:
+    """
+    Returns the process-wide inference backend, in-process llama_cpp unless
+    configure_backend chose another.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = LlamaCppBackend()
+        return _backend
+
+
+def configure_backend(backend: InferenceBackend):
+    """
+    Replaces the process-wide inference backend, closing the previous one.
+    """
+    global _backend
+    with _backend_lock:
+        previous, _backend = _backend, backend
+    if previous is not None and previous is not backend:
+        previous.close()
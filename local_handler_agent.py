@@ -2,19 +2,24 @@ import os
 
 class LocalHandlerAgent:
     """
-    Handles local file operations.
+    Handles local file operations. Relative file names are resolved against
+    'base_dir' (the working directory by default).
     """
 
-    def __init__(self, model_path: str = "", debug_mode=False):
+    def __init__(self, model_path: str = "", debug_mode=False, base_dir=None):
         self.model_path = model_path
         self.debug_mode = debug_mode
+        self.base_dir = base_dir
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.base_dir, filename) if self.base_dir else filename
 
     def create_file(self, filename: str, content: str) -> str:
         """
         Creates or overwrites 'filename' with 'content'. Returns success or error message.
         """
         try:
-            with open(filename, "w", encoding="utf-8") as f:
+            with open(self._path(filename), "w", encoding="utf-8") as f:
                 f.write(content)
             msg = f"File '{filename}' created/updated successfully."
             if self.debug_mode:
@@ -30,10 +35,11 @@ class LocalHandlerAgent:
         """
         Reads and returns the content of 'filename', or error if missing.
         """
-        if not os.path.exists(filename):
+        path = self._path(filename)
+        if not os.path.exists(path):
             return f"File '{filename}' does not exist."
         try:
-            with open(filename, "r", encoding="utf-8") as f:
+            with open(path, "r", encoding="utf-8") as f:
                 data = f.read()
             if self.debug_mode:
                 print(f"[DEBUG] Read file '{filename}', length {len(data)}.")
@@ -0,0 +1,179 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 2
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_BATCH_BYTES = 64 * 1024
+DEFAULT_FLUSH_INTERVAL = 0.5
+
+_STOP = object()
+
+
+class BackgroundLogWriter:
+    """
+    Appends log lines to a file from a background thread.
+
+    write() only enqueues. The writer thread keeps the file open and writes
+    queued lines in batches, flushing once a batch reaches 'batch_size' lines or
+    'batch_bytes' bytes, or 'flush_interval' seconds after its first line. It also
+    owns size-based rotation (logs.txt -> logs.txt.1 -> logs.txt.2). Pending lines
+    are drained at exit, including exits caused by an unhandled exception.
+    """
+
+    def __init__(self, filename, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT,
+                 batch_size=DEFAULT_BATCH_SIZE, batch_bytes=DEFAULT_BATCH_BYTES, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._file = None
+        self._size = 0
+        self.lines_written = 0
+        self.batches_written = 0
+        self.rotations = 0
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def write(self, line: str):
+        """
+        Queues one log line (without trailing newline) for the writer thread.
+        """
+        self._ensure_started()
+        self._queue.put(line)
+
+    def flush(self, timeout=None):
+        """
+        Blocks until every line queued before this call is on disk.
+        """
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        """
+        Drains the queue, closes the file and stops the writer thread.
+        """
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        batch = []
+        batch_bytes = 0
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, str):
+                batch.append(item + "\n")
+                batch_bytes += len(item) + 1
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(batch) < self.batch_size and batch_bytes < self.batch_bytes:
+                    continue
+
+            # Size/time trigger, an explicit flush() or shutdown
+            if batch:
+                self._write_batch(batch)
+                batch = []
+                batch_bytes = 0
+            deadline = None
+
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is _STOP:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                return
+
+    def _open(self):
+        self._file = open(self.filename, "a", encoding="utf-8")
+        self._size = self._file.tell()
+
+    def _write_batch(self, batch):
+        data = "".join(batch)
+        try:
+            if self._file is None:
+                self._open()
+            if self.max_bytes and self._size and self._size + len(data) > self.max_bytes:
+                self._rotate()
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+            self.lines_written += len(batch)
+            self.batches_written += 1
+        except OSError as e:
+            # Never let logging take the run down; report once per failed batch.
+            print(f"[LogWriter] Failed to write {len(batch)} line(s) to {self.filename}: {e}")
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.filename}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.filename}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.filename, f"{self.filename}.1")
+        else:
+            os.remove(self.filename)
+        self.rotations += 1
+        self._open()
+
+
+class LogWriterHandler(logging.Handler):
+    """
+    logging handler that hands formatted records to a BackgroundLogWriter.
+    """
+
+    def __init__(self, writer: BackgroundLogWriter):
+        super().__init__()
+        self.writer = writer
+
+    def emit(self, record):
+        try:
+            self.writer.write(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_log_writer(filename: str) -> BackgroundLogWriter:
+    """
+    Returns the shared BackgroundLogWriter for 'filename', so every producer of
+    a log file goes through the same queue and rotation.
+    """
+    with _writers_lock:
+        writer = _writers.get(filename)
+        if writer is None:
+            writer = BackgroundLogWriter(filename)
+            _writers[filename] = writer
+        return writer
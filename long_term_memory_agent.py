@@ -1,35 +1,54 @@
+from grammars import LONG_TERM_MEMORY_GRAMMAR
+from prompt_builder import get_prompt_builder, PromptSection, TRIM_MIDDLE
 from run_model_inference import run_model_inference
+from stream_parsers import LineParser
 
 class LongTermMemoryAgent:
+    PROMPT_PREFIX = "You are LongTermMemoryAgent. Analyze the task and result:\n"
+
     def __init__(self, model_path: str, debug_mode=False):
         self.model_path = model_path
         self.debug_mode = debug_mode
+        self.prompt_builder = get_prompt_builder(model_path, debug_mode=debug_mode)
 
     def decide_what_to_store(self, task: str, result: str) -> str:
         """
         Analyzes (task, result) for new insights. Returns a short summary or "" if none.
+        A result too long for the context (e.g. a whole file from FILE#read) is cut
+        down to its start and end.
         """
-        prompt = (
-            "You are LongTermMemoryAgent. Analyze the task and result:\n"
-            f"Task: {task}\n"
-            f"Result: {result}\n\n"
-            "Provide 1-2 bullet points of new insights or 'NO NEW INSIGHTS'."
-        )
+        max_tokens = 128
+        prompt = self.prompt_builder.build([
+            PromptSection(self.PROMPT_PREFIX, fixed=True),
+            PromptSection(f"Task: {task}\n"),
+            PromptSection(f"Result: {result}\n\n", priority=1, trim=TRIM_MIDDLE),
+            PromptSection("Provide 1-2 bullet points of new insights or 'NO NEW INSIGHTS'.", fixed=True),
+        ], max_tokens, agent_type="LongTermMemoryAgent")
+
+        insights = []
+        no_insights = False
+
+        def on_line(line):
+            nonlocal no_insights
+            if "NO NEW INSIGHTS" in line.upper():
+                no_insights = True
+                return True
+            insights.append(line)
+            return False
 
-        response = run_model_inference(
+        run_model_inference(
             model_path=self.model_path,
             prompt=prompt,
-            max_tokens=128,
+            max_tokens=max_tokens,
             agent_type="LongTermMemoryAgent",
-            verbose=self.debug_mode
+            verbose=self.debug_mode,
+            prompt_prefix=self.PROMPT_PREFIX,
+            stream_parser=LineParser(on_line),
+            grammar=LONG_TERM_MEMORY_GRAMMAR
         )
 
-        lines = [l.strip() for l in response.split("\n") if l.strip()]
-        insights = []
-        for line in lines:
-            if "NO NEW INSIGHTS" in line.upper():
-                return ""
-            insights.append(line)
+        if no_insights:
+            return ""
 
         summary = "\n".join(insights)
         if self.debug_mode:
@@ -0,0 +1,195 @@
+import argparse
+import os
+import time
+import zlib
+
+from memory_text import split_entries, tokenize
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_NUM_PERM = 64
+DEFAULT_BANDS = 16
+DEFAULT_SHINGLE_SIZE = 3
+
+# Mersenne prime larger than any 32-bit shingle hash, for the universal hash family
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+class NearDuplicateIndex:
+    """
+    MinHash signatures over word shingles, bucketed with banded LSH.
+
+    A check only compares signatures of entries that share at least one band
+    bucket, so its cost does not grow with the number of stored entries the
+    way a pairwise scan would. An entry counts as a near-duplicate when its
+    estimated Jaccard similarity to a stored entry reaches 'threshold'.
+
+    NumPy is imported on first use, so main.py can read DEFAULT_THRESHOLD for
+    its --help without it.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM, bands=DEFAULT_BANDS,
+                 shingle_size=DEFAULT_SHINGLE_SIZE, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        import numpy as np
+        self._prime = np.uint64(_PRIME)
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MAX_HASH, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MAX_HASH, size=num_perm, dtype=np.uint64)
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = []
+        self.checks = 0
+        self.duplicates = 0
+        self.check_time = 0.0
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _shingles(self, text: str):
+        import numpy as np
+        tokens = tokenize(text)
+        size = min(self.shingle_size, len(tokens))
+        if size == 0:
+            return np.zeros(0, dtype=np.uint64)
+        shingles = {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+        return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+    def signature(self, text: str):
+        """
+        Returns the MinHash signature of 'text', or None if it has no words.
+        """
+        shingles = self._shingles(text)
+        if not len(shingles):
+            return None
+        hashes = (shingles[:, None] * self._a + self._b) % self._prime
+        return hashes.min(axis=0)
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def find_duplicate(self, text: str, signature=None):
+        """
+        Returns the id of a stored near-duplicate of 'text', or None.
+        """
+        start_time = time.perf_counter()
+        if signature is None:
+            signature = self.signature(text)
+        match = None
+        if signature is not None:
+            candidates = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                candidates.update(self._buckets[band].get(key, ()))
+            for entry_id in sorted(candidates):
+                similarity = float((self._signatures[entry_id] == signature).mean())
+                if similarity >= self.threshold:
+                    match = entry_id
+                    break
+        self.checks += 1
+        self.check_time += time.perf_counter() - start_time
+        if match is not None:
+            self.duplicates += 1
+        return match
+
+    def add(self, text: str, signature=None) -> int:
+        """
+        Stores 'text' and returns its id.
+        """
+        if signature is None:
+            signature = self.signature(text)
+        entry_id = len(self._signatures)
+        self._signatures.append(signature)
+        if signature is not None:
+            for band, key in enumerate(self._band_keys(signature)):
+                self._buckets[band].setdefault(key, []).append(entry_id)
+        return entry_id
+
+    def check_and_add(self, text: str) -> bool:
+        """
+        Returns True if 'text' is a near-duplicate; otherwise stores it and returns False.
+        """
+        signature = self.signature(text)
+        if self.find_duplicate(text, signature) is not None:
+            return True
+        self.add(text, signature)
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._signatures),
+            "checks": self.checks,
+            "duplicates": self.duplicates,
+            "check_time": self.check_time,
+            "avg_check_ms": self.check_time / self.checks * 1e3 if self.checks else 0.0,
+        }
+
+
+def compact_file(filename: str, threshold=DEFAULT_THRESHOLD, dry_run=False) -> dict:
+    """
+    Rewrites a long-term memory file with near-duplicate entries merged. Each
+    group of duplicates keeps the position of its first entry and the text of
+    its longest one. Returns sizes, bytes reclaimed and check timings.
+    """
+    with open(filename, "r", encoding="utf-8") as f:
+        entries = split_entries(f.read())
+    bytes_before = os.path.getsize(filename)
+
+    index = NearDuplicateIndex(threshold=threshold)
+    kept = []
+    for entry in entries:
+        signature = index.signature(entry)
+        match = index.find_duplicate(entry, signature)
+        if match is None:
+            index.add(entry, signature)
+            kept.append(entry)
+        elif len(entry) > len(kept[match]):
+            kept[match] = entry
+
+    content = "".join(entry + "\n\n" for entry in kept)
+    bytes_after = len(content.encode("utf-8"))
+    if not dry_run:
+        tmp_filename = filename + ".tmp"
+        with open(tmp_filename, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_filename, filename)
+
+    stats = index.stats()
+    return {
+        "entries_before": len(entries),
+        "entries_after": len(kept),
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "bytes_reclaimed": bytes_before - bytes_after,
+        "check_time": stats["check_time"],
+        "avg_check_ms": stats["avg_check_ms"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge near-duplicate entries in the long-term memory file.")
+    parser.add_argument("--file", default="long_term_memory.txt", help="Long-term memory file to compact.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Estimated Jaccard similarity at which two entries count as duplicates.")
+    parser.add_argument("--dry_run", action="store_true", help="Report without rewriting the file.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"File not found: {args.file}")
+        return
+
+    result = compact_file(args.file, args.threshold, args.dry_run)
+    print(
+        f"Entries: {result['entries_before']} -> {result['entries_after']}. "
+        f"Bytes: {result['bytes_before']} -> {result['bytes_after']} "
+        f"({result['bytes_reclaimed']} reclaimed{', dry run' if args.dry_run else ''}). "
+        f"Checks took {result['check_time'] * 1e3:.1f} ms ({result['avg_check_ms']:.3f} ms each)."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import hashlib
+import logging
+import math
+import os
+import struct
+import threading
+from collections import Counter
+
+import numpy as np
+
+from memory_text import tokenize, split_entries, approx_token_count, DEFAULT_MEMORY_TOKENS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOP_K = 5
+VECTOR_FILE_SUFFIX = ".vectors"
+
+# Vector file record: SHA-1 of the entry text, dimension, then float32 values
+_VECTOR_HEADER = struct.Struct("<20sI")
+
+
+def entry_key(text: str) -> bytes:
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+class EntryVectorFile:
+    """
+    Append-only file of entry embeddings keyed by the SHA-1 of the entry text,
+    kept next to long_term_memory.txt so a restart only embeds new entries.
+    A record cut off by a crash mid-write is dropped and truncated away.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.vectors = {}
+        if os.path.exists(filename):
+            self._load()
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def _load(self):
+        with open(self.filename, "rb") as f:
+            data = f.read()
+        offset = 0
+        while offset + _VECTOR_HEADER.size <= len(data):
+            key, dim = _VECTOR_HEADER.unpack_from(data, offset)
+            end = offset + _VECTOR_HEADER.size + 4 * dim
+            if end > len(data):
+                break
+            self.vectors[key] = np.frombuffer(data, dtype=np.float32, count=dim, offset=offset + _VECTOR_HEADER.size)
+            offset = end
+        if offset < len(data):
+            logger.warning("Dropping a partial record at the end of %s.", self.filename)
+            os.truncate(self.filename, offset)
+
+    def get(self, key: bytes):
+        return self.vectors.get(key)
+
+    def put(self, key: bytes, vector):
+        vector = np.ascontiguousarray(vector, dtype=np.float32)
+        self.vectors[key] = vector
+        with open(self.filename, "ab") as f:
+            f.write(_VECTOR_HEADER.pack(key, vector.shape[0]) + vector.tobytes())
+
+
+class LongTermMemoryIndex:
+    """
+    Incrementally maintained retrieval index over long-term memory entries.
+
+    Entries are scored with BM25 over word tokens. The postings of each term
+    are kept as growing lists and turned into NumPy arrays on demand, so a
+    query only touches the postings of its own terms. If an 'embed' function is
+    given, entries also get a unit-normalized dense vector and the final score
+    mixes normalized BM25 with cosine similarity ('dense_weight'). With a
+    'vector_file' the entry vectors are persisted there and reused, so only
+    entries not embedded before call 'embed'.
+    """
+
+    def __init__(self, embed=None, dense_weight=0.5, k1=1.5, b=0.75, count_tokens=approx_token_count,
+                 vector_file=None):
+        self.embed = embed
+        self.vector_file = EntryVectorFile(vector_file) if embed is not None and vector_file else None
+        self.vectors_reused = 0
+        self.vectors_embedded = 0
+        self.dense_weight = dense_weight
+        self.k1 = k1
+        self.b = b
+        self.count_tokens = count_tokens
+        self.entries = []
+        self._postings = {}
+        self._arrays = {}
+        self._doc_lengths = []
+        self._doc_lengths_array = None
+        self._total_length = 0
+        self._matrix = None
+        self._n_vectors = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, text: str) -> int:
+        """
+        Indexes one entry and returns its id.
+        """
+        text = text.strip()
+        tokens = tokenize(text)
+        vector = self._entry_vector(text) if self.embed is not None else None
+        with self._lock:
+            doc_id = len(self.entries)
+            self.entries.append(text)
+            for term, tf in Counter(tokens).items():
+                ids, tfs = self._postings.setdefault(term, ([], []))
+                ids.append(doc_id)
+                tfs.append(tf)
+            self._doc_lengths.append(len(tokens))
+            self._total_length += len(tokens)
+            self._doc_lengths_array = None
+            if vector is not None:
+                self._append_vector(vector)
+        return doc_id
+
+    def add_many(self, texts):
+        for text in texts:
+            self.add(text)
+
+    def _embed(self, text: str):
+        return self._normalize(self.embed(text))
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _entry_vector(self, text: str):
+        if self.vector_file is None:
+            self.vectors_embedded += 1
+            return self._embed(text)
+        key = entry_key(text)
+        vector = self.vector_file.get(key)
+        if vector is not None:
+            self.vectors_reused += 1
+        else:
+            vector = np.asarray(self.embed(text), dtype=np.float32)
+            self.vector_file.put(key, vector)
+            self.vectors_embedded += 1
+        return self._normalize(vector)
+
+    def _append_vector(self, vector):
+        # Row storage grows by doubling so adding an entry stays amortized O(dim).
+        if self._matrix is None:
+            self._matrix = np.zeros((16, vector.shape[0]), dtype=np.float32)
+        elif self._n_vectors == self._matrix.shape[0]:
+            grown = np.zeros((self._matrix.shape[0] * 2, self._matrix.shape[1]), dtype=np.float32)
+            grown[:self._n_vectors] = self._matrix
+            self._matrix = grown
+        self._matrix[self._n_vectors] = vector
+        self._n_vectors += 1
+
+    def _term_arrays(self, term):
+        ids, tfs = self._postings[term]
+        cached = self._arrays.get(term)
+        if cached is None or cached[0] != len(ids):
+            cached = (len(ids), np.asarray(ids, dtype=np.int64), np.asarray(tfs, dtype=np.float32))
+            self._arrays[term] = cached
+        return cached[1], cached[2]
+
+    def _bm25(self, terms) -> np.ndarray:
+        n_docs = len(self.entries)
+        scores = np.zeros(n_docs, dtype=np.float32)
+        if self._doc_lengths_array is None:
+            self._doc_lengths_array = np.asarray(self._doc_lengths, dtype=np.float32)
+        avg_length = self._total_length / n_docs if n_docs else 0.0
+        if not avg_length:
+            return scores
+        for term in terms:
+            if term not in self._postings:
+                continue
+            ids, tfs = self._term_arrays(term)
+            df = len(ids)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self._doc_lengths_array[ids] / avg_length)
+            scores[ids] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+        return scores
+
+    def search(self, query: str, k=DEFAULT_TOP_K) -> list:
+        """
+        Returns up to k (score, entry) pairs, best first. Entries with no
+        relevance at all are left out.
+        """
+        terms = set(tokenize(query))
+        query_vector = self._embed(query) if self.embed is not None and self._n_vectors else None
+        with self._lock:
+            if not self.entries:
+                return []
+            scores = self._bm25(terms)
+            if query_vector is not None and self._n_vectors == len(self.entries):
+                top = scores.max()
+                lexical = scores / top if top > 0 else scores
+                dense = np.clip(self._matrix[:self._n_vectors] @ query_vector, 0.0, None)
+                scores = (1 - self.dense_weight) * lexical + self.dense_weight * dense
+
+            k = min(k, len(scores))
+            candidates = np.argpartition(-scores, k - 1)[:k]
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+            return [(float(scores[i]), self.entries[i]) for i in candidates if scores[i] > 0]
+
+    def context(self, query: str, token_budget=DEFAULT_MEMORY_TOKENS, k=DEFAULT_TOP_K) -> str:
+        """
+        Returns the most relevant entries for 'query', best first, joined with
+        blank lines and limited to 'token_budget' tokens.
+        """
+        selected = []
+        used = 0
+        for _, entry in self.search(query, k):
+            cost = self.count_tokens(entry)
+            if used + cost > token_budget:
+                continue
+            selected.append(entry)
+            used += cost
+        return "\n\n".join(selected)
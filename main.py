@@ -1,115 +1,136 @@
 # main.py
 
+import time
+IMPORT_START = time.perf_counter()
+
 import sys
 import os
-import time
 import datetime
 import threading
 import queue
 import argparse
 import logging
-from colorama import init, Fore
-from logging.handlers import RotatingFileHandler
 
-# Agents
-from agents.task_creation_agent import TaskCreationAgent
-from agents.task_prioritization_agent import TaskPrioritizationAgent
-from agents.execution_agent import ExecutionAgent
-from agents.long_term_memory_agent import LongTermMemoryAgent
-from agents.goal_evaluation_agent import GoalEvaluationAgent
-from agents.local_handler_agent import LocalHandlerAgent
-from agents.external_handler_agent import ExternalHandlerAgent
-
-from llama_cpp import Llama
+# Agents, llama_cpp, colorama and NumPy-backed modules are imported on first
+# use, so --help and argument errors return without loading them
+from model_engine import get_engine, DEFAULT_REPLICA_GPU_LAYERS
+from log_writer import get_log_writer, LogWriterHandler
+from short_term_memory import ShortTermMemory
+from sqlite_task_queue import SQLiteTaskQueue, DEFAULT_TASK_DB
+from memory_text import split_entries, DEFAULT_MEMORY_TOKENS
+from ltm_dedup import NearDuplicateIndex, DEFAULT_THRESHOLD as DEFAULT_DEDUP_THRESHOLD
+from run_model_inference import run_embedding, configure_streaming, generation_stats
+from task_worker_pool import TaskWorkerPool
+from task_scheduler import PriorityTaskScheduler, DEFAULT_RERANK_THRESHOLD, SOURCE_USER
+from task_dedup import TaskDeduplicator, DEFAULT_TASK_DEDUP_THRESHOLD
+from goal_verifier import GoalVerifier, DEFAULT_MAX_INTERVAL as DEFAULT_GOAL_CHECK_MAX_INTERVAL
+from async_orchestrator import AsyncOrchestrator, StageLatency
+from checkpoint import RunCheckpointer, load_checkpoint, DEFAULT_CHECKPOINT_FILE, FINISHED, RUNNING
+from fair_scheduler import configure_scheduler, get_scheduler, DEFAULT_SLOTS
+from grammars import configure_grammars, get_grammar_cache
+from inference_backend import (
+    configure_backend, get_backend, LlamaCppBackend, OpenAICompatibleBackend, InferenceBackendError,
+    DEFAULT_SERVER_URL, DEFAULT_SERVER_TIMEOUT, DEFAULT_SERVER_RETRIES,
+)
+from metrics import get_metrics, MetricsExporter, DEFAULT_EXPORT_INTERVAL
+from prefix_cache import get_prefix_cache
+from speculative import configure_speculative, parse_speculative_spec, speculative_stats
+from prompt_builder import get_prompt_builder
+from response_cache import configure_response_cache, get_response_cache, DEFAULT_CACHED_AGENTS, DEFAULT_CACHE_DIR, DEFAULT_TTL_SECONDS
+from run_log import configure_run_log, get_run_logger, log_event, task_context, DEFAULT_RUN_LOG_FILE
+from sessions import Session, current_session
+from session_server import SessionServer, DEFAULT_HOST, DEFAULT_PORT, DEFAULT_MAX_SESSIONS, DEFAULT_SESSIONS_DIR
 
 LOG_FILE = "logs.txt"
 LONG_TERM_MEMORY_FILE = "long_term_memory.txt"
 SHORT_TERM_MEMORY_FILE = "short_term_memory.txt"
+# User input starting with one of these is queued as a task, not only noted in memory
+USER_TASK_PREFIX = "TASK#"
+USER_TASK_PREFIXES = (USER_TASK_PREFIX, "FILE#", "WEB#")
 
 # A queue for user input lines from the background thread
 user_input_queue = queue.Queue()
 
+class _LazyFore:
+    """
+    Stands in for colorama.Fore and imports colorama on first use.
+    """
+    def __getattr__(self, name):
+        from colorama import Fore as fore
+        return getattr(fore, name)
+
+Fore = _LazyFore()
+
 def setup_logging():
-    handler = RotatingFileHandler(LOG_FILE, maxBytes=5 * 1024 * 1024, backupCount=2)
+    # Library logging goes through the same background writer (and rotation) as log_message
+    handler = LogWriterHandler(get_log_writer(LOG_FILE))
+    handler.setFormatter(logging.Formatter("[%(asctime)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S"))
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)
     logger.addHandler(handler)
 
 def log_message(message: str):
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(f"[{timestamp}] {message}\n")
+    session = current_session()
+    if session is not None and session.session_id:
+        message = f"[session {session.session_id}] {message}"
+    get_log_writer(LOG_FILE).write(f"[{timestamp}] {message}")
 
-def read_long_term_memory():
-    if not os.path.exists(LONG_TERM_MEMORY_FILE):
+def read_long_term_memory(filename=LONG_TERM_MEMORY_FILE):
+    if not os.path.exists(filename):
         return ""
-    with open(LONG_TERM_MEMORY_FILE, "r", encoding="utf-8") as f:
+    with open(filename, "r", encoding="utf-8") as f:
         return f.read().strip()
 
-def append_long_term_memory(summary: str):
+def append_long_term_memory(summary: str, filename=LONG_TERM_MEMORY_FILE):
     summary = summary.strip()
     if summary:
-        with open(LONG_TERM_MEMORY_FILE, "a", encoding="utf-8") as f:
+        with open(filename, "a", encoding="utf-8") as f:
             f.write(summary + "\n\n")
 
-def read_short_term_memory():
-    if not os.path.exists(SHORT_TERM_MEMORY_FILE):
-        with open(SHORT_TERM_MEMORY_FILE, "w", encoding="utf-8"):
-            pass
-        return ""
-    with open(SHORT_TERM_MEMORY_FILE, "r", encoding="utf-8") as f:
-        return f.read()
-
-def append_line_to_short_term_memory(line: str):
-    with open(SHORT_TERM_MEMORY_FILE, "a", encoding="utf-8") as f:
-        f.write(line.rstrip("\n") + "\n")
-
-def clear_short_term_memory():
-    if os.path.exists(SHORT_TERM_MEMORY_FILE):
-        current = read_short_term_memory()
-        if current.strip():
-            log_message("=== Clearing Short-Term Memory ===")
-            log_message("Content before clearing:")
-            for line in current.splitlines():
-                log_message(line)
-            log_message("=================================\n")
-    with open(SHORT_TERM_MEMORY_FILE, "w", encoding="utf-8") as f:
-        f.write("")
-
-def get_tasks():
-    content = read_short_term_memory().strip()
-    if not content:
-        return []
-    lines = content.splitlines()
-    tasks = [line.strip() for line in lines if line.strip() and not line.startswith("USERINPUT#")]
-    return tasks
-
-def set_tasks(tasks_list):
-    # We want to preserve existing user inputs but replace tasks
-    lines = read_short_term_memory().splitlines()
-    user_input_lines = [l for l in lines if l.startswith("USERINPUT#")]
-    new_content = user_input_lines + tasks_list
-    with open(SHORT_TERM_MEMORY_FILE, "w", encoding="utf-8") as f:
-        for line in new_content:
-            f.write(line + "\n")
-
-def add_tasks(new_tasks):
-    tasks = get_tasks()
-    tasks.extend(new_tasks)
-    set_tasks(tasks)
-
-def pop_next_task():
-    tasks = get_tasks()
-    if not tasks:
-        return None
-    next_task = tasks.pop(0)
-    set_tasks(tasks)
-    return next_task
+def clear_short_term_memory(short_term_memory):
+    current = short_term_memory.read()
+    if current.strip():
+        log_message("=== Clearing Short-Term Memory ===")
+        log_message("Content before clearing:")
+        for line in current.splitlines():
+            log_message(line)
+        log_message("=================================\n")
+    short_term_memory.clear()
+    short_term_memory.flush()
+
+def task_agent_name(task):
+    """
+    Returns the name of the agent dispatch_task routes 'task' to.
+    """
+    if task.startswith("FILE#"):
+        return "LocalHandlerAgent"
+    elif task.startswith("WEB#"):
+        return "ExternalHandlerAgent"
+    return "ExecutionAgent"
+
+def dispatch_task(task, local_handler_agent, external_handler_agent, execution_agent, memory=""):
+    """
+    Routes a task to the agent that handles it and returns the result text.
+    """
+    if task.startswith("FILE#"):
+        _, action, filename, *content = task.split("#")
+        content = "#".join(content)
+        if action == "create":
+            return local_handler_agent.create_file(filename, content)
+        elif action == "read":
+            return local_handler_agent.read_file(filename)
+        return f"Unknown file action: {action}"
+    elif task.startswith("WEB#"):
+        _, query = task.split("#", 1)
+        return external_handler_agent.do_web_search(query)
+    return execution_agent.execute_task(task, memory)
 
 def user_input_thread():
     """
     Background thread to read user input lines. Each line is either appended
     to short-term memory or if it's 'quit'/'exit', we signal the main loop to stop.
+    Lines starting with TASK#, FILE# or WEB# are also queued as tasks.
     """
     while True:
         try:
@@ -119,11 +140,55 @@ def user_input_thread():
         if line:
             user_input_queue.put(line)
 
-def main_loop(user_objective, debug_mode):
+def main_loop(user_objective, debug_mode, session=None):
+    """
+    Runs one objective to completion and returns the number of tasks completed.
+    'session' holds the working directory and user input queue of the run; by
+    default that is the current directory and the console input thread.
+    """
+    from agents.task_creation_agent import TaskCreationAgent
+    from agents.task_prioritization_agent import TaskPrioritizationAgent
+    from agents.execution_agent import ExecutionAgent
+    from agents.long_term_memory_agent import LongTermMemoryAgent
+    from agents.goal_evaluation_agent import GoalEvaluationAgent
+    from agents.local_handler_agent import LocalHandlerAgent
+    from agents.external_handler_agent import ExternalHandlerAgent
+    from ltm_index import LongTermMemoryIndex, VECTOR_FILE_SUFFIX
+
+    if session is None:
+        session = Session(user_objective, input_queue=user_input_queue)
+
+    checkpointer = None
+    resume_state = None
+    if args.checkpoint:
+        checkpointer = RunCheckpointer(session.path(args.checkpoint), save_kv=args.checkpoint_kv)
+        if args.resume:
+            resume_state = load_checkpoint(checkpointer.filename)
+            if resume_state is None:
+                print(Fore.YELLOW + f"[Main] No checkpoint to resume at {checkpointer.filename}; starting a new run.")
+            elif resume_state["status"] == FINISHED:
+                print(Fore.YELLOW + "[Main] The checkpointed run already finished; starting a new run.")
+                resume_state = None
+    if resume_state is not None:
+        user_objective = resume_state["objective"]
+
     print(Fore.CYAN + f"[Main] Objective: {user_objective}")
     log_message(f"Starting run with objective: {user_objective}")
-
-    clear_short_term_memory()
+    log_event("run_start", objective=user_objective)
+
+    # With --task_queue sqlite the task list lives in a database other processes can share
+    task_store = SQLiteTaskQueue(session.path(args.task_db)) if args.task_queue == "sqlite" else None
+    short_term_memory = ShortTermMemory(session.path(SHORT_TERM_MEMORY_FILE), task_store=task_store)
+    if resume_state is not None:
+        # Continue with the checkpointed queue instead of planning from scratch
+        short_term_memory.clear()
+        for line in resume_state["user_inputs"]:
+            short_term_memory.append_user_input(line)
+        short_term_memory.add_tasks(resume_state["tasks"])
+        short_term_memory.flush()
+        checkpointer.restore(resume_state)
+    else:
+        clear_short_term_memory(short_term_memory)
 
     # Initialize agents
     model_path = args.model_path
@@ -133,140 +198,720 @@ def main_loop(user_objective, debug_mode):
     long_term_memory_agent = LongTermMemoryAgent(model_path, debug_mode)
     goal_evaluation_agent = GoalEvaluationAgent(model_path, debug_mode)
 
-    local_handler_agent = LocalHandlerAgent(model_path, debug_mode)
+    local_handler_agent = LocalHandlerAgent(model_path, debug_mode, base_dir=session.workdir)
     external_handler_agent = ExternalHandlerAgent(model_path, debug_mode)
 
-    init_tasks = task_creation_agent.create_tasks(user_objective, read_short_term_memory())
-    set_tasks(init_tasks)
-    print(Fore.MAGENTA + f"Initial Tasks: {init_tasks}")
-    log_message(f"Initial Tasks: {init_tasks}")
+    # Retrieval index so agents get the relevant part of long-term memory within n_ctx
+    embed = None
+    if args.ltm_embeddings:
+        embed = lambda text: run_embedding(model_path, text)
+    long_term_memory_file = session.path(LONG_TERM_MEMORY_FILE)
+    ltm_index = LongTermMemoryIndex(embed=embed, vector_file=long_term_memory_file + VECTOR_FILE_SUFFIX)
+    ltm_dedup = NearDuplicateIndex(threshold=args.ltm_dedup_threshold)
+    task_dedup = None
+    if not args.no_task_dedup:
+        # Embeddings need a second copy of the model in embedding mode, so they are opt-in
+        task_embed = (lambda text: run_embedding(model_path, text)) if args.task_dedup_embeddings else None
+        task_dedup = TaskDeduplicator(task_embed, args.task_dedup_threshold)
+    for entry in split_entries(read_long_term_memory(long_term_memory_file)):
+        ltm_index.add(entry)
+        ltm_dedup.add(entry)
+    if args.ltm_embeddings:
+        msg = (f"LTM vectors: {ltm_index.vectors_reused} reused from {ltm_index.vector_file.filename}, "
+               f"{ltm_index.vectors_embedded} embedded.")
+        print(Fore.CYAN + f"[Main] {msg}")
+        log_message(msg)
+
+    # Goal checks go to the model only when the deterministic checks cannot decide
+    goal_verifier = None
+    check_goal = goal_evaluation_agent.evaluate_progress
+    if not args.no_goal_verifier:
+        goal_verifier = GoalVerifier(
+            goal_evaluation_agent.evaluate_progress, short_term_memory.get_tasks, base_dir=session.workdir,
+            ltm_file=long_term_memory_file, max_interval=args.goal_check_max_interval
+        )
+        check_goal = goal_verifier.check
+
+    worker_pool = TaskWorkerPool(args.concurrency, debug_mode)
+    scheduler = PriorityTaskScheduler(task_prioritization_agent, args.rerank_threshold, debug_mode=debug_mode)
+    latency = StageLatency()
+
+    def store_summary(task, result, summary):
+        if isinstance(summary, Exception):
+            err = f"[Main] Memory error on '{task}': {summary}"
+            print(Fore.RED + err)
+            log_message(err)
+            log_event("ltm_error", task=task, error=str(summary))
+        elif summary and ltm_dedup.check_and_add(summary):
+            print(Fore.YELLOW + "[Main] Insight is a near-duplicate of long-term memory; not stored.")
+            log_message(f"Skipped near-duplicate LTM insight:\n{summary}")
+            log_event("ltm_duplicate", task=task)
+        elif summary:
+            append_long_term_memory(summary, long_term_memory_file)
+            ltm_index.add(summary)
+            log_message(f"Stored in LTM:\n{summary}")
+            log_event("ltm_store", task=task, chars=len(summary))
+        else:
+            print(Fore.YELLOW + "[Main] No new insights to store.")
+
+    # In async mode LTM summarization and goal checks run as background stages
+    orchestrator = None
+    if args.orchestrator == "async":
+        orchestrator = AsyncOrchestrator(
+            session.bind(long_term_memory_agent.decide_what_to_store),
+            session.bind(check_goal),
+            on_summary=session.bind(store_summary),
+            latency=latency,
+            queue_size=args.stage_queue_size,
+            debug_mode=debug_mode
+        )
+        orchestrator.start()
+
+    def run_task(task):
+        with task_context(task):
+            start_time = time.perf_counter()
+            memory = "" if task.startswith(("FILE#", "WEB#")) else ltm_index.context(task, args.memory_tokens)
+            result = dispatch_task(task, local_handler_agent, external_handler_agent, execution_agent, memory)
+            elapsed = time.perf_counter() - start_time
+            latency.record("execute", elapsed)
+            log_event("task_result", agent=task_agent_name(task), latency=round(elapsed, 6), result=result)
+            if orchestrator is not None:
+                return result, None
+            start_time = time.perf_counter()
+            summary = long_term_memory_agent.decide_what_to_store(task, result)
+            latency.record("ltm_summarize", time.perf_counter() - start_time)
+            return result, summary
+
+    # Tasks popped for the batch that is running; they count as pending for dedup
+    executing = []
+
+    def queue_created_task(task):
+        # Called while TaskCreationAgent is still generating the following tasks
+        if task_dedup is not None:
+            duplicate = task_dedup.find_duplicate(task, short_term_memory.get_tasks() + executing)
+            if duplicate is not None:
+                print(Fore.YELLOW + f"[Main] Dropped duplicate task '{task}' (repeats '{duplicate}').")
+                log_message(f"Dropped duplicate task '{task}' (repeats '{duplicate}').")
+                log_event("task_duplicate", task=task, duplicate_of=duplicate)
+                return
+        short_term_memory.add_tasks([task])
+
+    run_logger = get_run_logger()
 
     completed_tasks = 0
+    iteration = 0
     max_iterations = 40  # safeguard
 
-    while max_iterations > 0:
-        max_iterations -= 1
+    if resume_state is not None:
+        completed_tasks = resume_state["completed_tasks"]
+        iteration = resume_state["iteration"]
+        restored_states = checkpointer.load_kv() if args.checkpoint_kv else 0
+        # Outcomes of tasks finished before the restart still count for dedup and goal checks
+        for entry in resume_state.get("results", []):
+            if task_dedup is not None:
+                task_dedup.mark_completed(entry["task"])
+            if goal_verifier is not None:
+                goal_verifier.record_outcome(entry["task"], entry["result"])
+        if goal_verifier is not None:
+            goal_verifier.restore_files(resume_state.get("files", {}))
+        resume_msg = (
+            f"Resumed at iteration {iteration}: {len(resume_state['tasks'])} task(s) queued, "
+            f"{completed_tasks} completed, {restored_states} prompt prefix state(s) restored."
+        )
+        print(Fore.MAGENTA + f"[Main] {resume_msg}")
+        log_message(resume_msg)
+        log_event("run_resume", iteration=iteration, tasks=resume_state["tasks"], tasks_completed=completed_tasks)
+    else:
+        init_tasks = task_creation_agent.create_tasks(
+            user_objective, short_term_memory.read(), ltm_index.context(user_objective, args.memory_tokens),
+            on_task=queue_created_task
+        )
+        print(Fore.MAGENTA + f"Initial Tasks: {init_tasks}")
+        log_message(f"Initial Tasks: {init_tasks}")
+        log_event("tasks_created", tasks=init_tasks)
+
+    def save_checkpoint(status=RUNNING):
+        checkpointer.save(
+            user_objective, iteration, short_term_memory.get_tasks(), short_term_memory.user_inputs, completed_tasks,
+            run_id=run_logger.run_id if run_logger is not None else None, status=status,
+            files=goal_verifier.expected_files() if goal_verifier is not None else None,
+        )
+
+    finished = False
+    try:
+        while iteration < max_iterations:
+            # Checkpoint the state left by the previous iteration; a resumed run starts here
+            if checkpointer is not None:
+                save_checkpoint()
+            iteration += 1
+            iteration_start = time.perf_counter()
+            if run_logger is not None:
+                run_logger.iteration = iteration
+            short_term_memory.flush()
+
+            # Check user input queue
+            while not session.input_queue.empty():
+                line = session.input_queue.get()
+                if line.lower() in ["quit", "exit"]:
+                    print(Fore.RED + "[Main] Stopping upon user request.")
+                    return completed_tasks
+                now_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                memory_line = f"USERINPUT#{now_str}#={line}"
+                short_term_memory.append_user_input(memory_line)
+                print(Fore.YELLOW + f"[Main] Logged user input: {memory_line}")
+                if line.startswith(USER_TASK_PREFIXES):
+                    user_task = line[len(USER_TASK_PREFIX):].strip() if line.startswith(USER_TASK_PREFIX) else line
+                    if user_task and user_task not in scheduler:
+                        # Scheduled before sync() so it keeps the user-input boost
+                        short_term_memory.add_tasks([user_task])
+                        scheduler.add(user_task, SOURCE_USER)
+                        print(Fore.YELLOW + f"[Main] Queued user task: {user_task}")
+                        log_event("tasks_created", tasks=[user_task], source=SOURCE_USER)
+
+            if orchestrator is not None and orchestrator.objective_met.is_set():
+                print(Fore.GREEN + "[Main] Objective met. Ending run.")
+                break
 
-        # Check user input queue
-        while not user_input_queue.empty():
-            line = user_input_queue.get()
-            if line.lower() in ["quit", "exit"]:
-                print(Fore.RED + "[Main] Stopping upon user request.")
-                return
-            now_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            memory_line = f"USERINPUT#{now_str}#={line}"
-            append_line_to_short_term_memory(memory_line)
-            print(Fore.YELLOW + f"[Main] Logged user input: {memory_line}")
-
-        tasks = get_tasks()
-        if not tasks:
-            print(Fore.YELLOW + "[Main] No tasks left. Attempting to create new tasks.")
-            new_tasks = task_creation_agent.create_tasks(user_objective, read_short_term_memory())
-            if not new_tasks:
-                if goal_evaluation_agent.evaluate_progress(user_objective):
-                    print(Fore.GREEN + "[Main] Objective is met. Ending run.")
+            short_term_memory.reload_tasks()
+            tasks = short_term_memory.get_tasks()
+            if not tasks:
+                print(Fore.YELLOW + "[Main] No tasks left. Attempting to create new tasks.")
+                new_tasks = task_creation_agent.create_tasks(
+                    user_objective, short_term_memory.read(), ltm_index.context(user_objective, args.memory_tokens),
+                    on_task=queue_created_task
+                )
+                # Tasks dropped as duplicates do not count as new work
+                queued = set(short_term_memory.get_tasks())
+                new_tasks = [task for task in new_tasks if task in queued]
+                if not new_tasks:
+                    if check_goal(user_objective):
+                        print(Fore.GREEN + "[Main] Objective is met. Ending run.")
+                    else:
+                        print(Fore.YELLOW + "[Main] Objective not met, no tasks remain. Stopping.")
+                    break
                 else:
-                    print(Fore.YELLOW + "[Main] Objective not met, no tasks remain. Stopping.")
-                break
+                    log_message(f"New tasks created: {new_tasks}")
+                    log_event("tasks_created", tasks=new_tasks)
+                    continue
+
+            # Prioritize tasks locally; the LLM only re-sorts once the task set changed enough
+            start_time = time.perf_counter()
+            scheduler.sync(tasks)
+            if scheduler.needs_rerank():
+                scheduler.rerank()
+            latency.record("prioritize", time.perf_counter() - start_time)
+
+            # Take up to 'concurrency' tasks and execute them on the worker pool
+            batch = []
+            task_ids = []
+            if task_store is not None:
+                # Other processes claim from the same queue, so the local order only sets priorities
+                task_store.set_priorities(scheduler.tasks())
+                while len(batch) < worker_pool.concurrency:
+                    claimed = task_store.claim_next_task()
+                    if claimed is None:
+                        break
+                    task_id, next_task = claimed
+                    scheduler.take(next_task)
+                    batch.append(next_task)
+                    task_ids.append(task_id)
             else:
-                add_tasks(new_tasks)
-                log_message(f"New tasks created: {new_tasks}")
+                while len(batch) < worker_pool.concurrency:
+                    next_task = scheduler.pop()
+                    if not next_task:
+                        break
+                    batch.append(next_task)
+                task_ids = [None] * len(batch)
+            remaining = scheduler.tasks()
+            short_term_memory.set_tasks(remaining)
+            get_metrics().set_gauge("queue_depth", len(remaining) + len(batch), queue="tasks")
+            if not batch:
+                print(Fore.YELLOW + "[Main] No next task after prioritization.")
                 continue
-
-        # Prioritize tasks
-        tasks_raw = "\n".join(tasks)
-        prioritized = task_prioritization_agent.prioritize_tasks(tasks_raw)
-        set_tasks(prioritized)
-
-        # Pop and execute next task
-        next_task = pop_next_task()
-        if not next_task:
-            print(Fore.YELLOW + "[Main] No next task after prioritization.")
-            continue
-
-        print(Fore.CYAN + f"[Main] Executing: {next_task}")
-        log_message(f"Executing task: {next_task}")
-
-        try:
-            if next_task.startswith("FILE#"):
-                _, action, filename, *content = next_task.split("#")
-                content = "#".join(content)
-                if action == "create":
-                    result = local_handler_agent.create_file(filename, content)
-                elif action == "read":
-                    result = local_handler_agent.read_file(filename)
-                else:
-                    result = f"Unknown file action: {action}"
-            elif next_task.startswith("WEB#"):
-                _, query = next_task.split("#", 1)
-                result = external_handler_agent.do_web_search(query)
+            executing[:] = batch
+
+            for next_task in batch:
+                print(Fore.CYAN + f"[Main] Executing: {next_task}")
+                log_message(f"Executing task: {next_task}")
+                log_event("task_start", task=next_task, agent=task_agent_name(next_task))
+
+            if orchestrator is not None:
+                # Speculative: earlier goal checks may still finish and cancel this batch
+                outcomes = orchestrator.run_speculative(worker_pool.run_batch, batch, session.bind(run_task))
+                if outcomes is None:
+                    for task_id in task_ids:
+                        if task_id is not None:
+                            task_store.fail_task(task_id, "Cancelled: objective met")
+                    print(Fore.GREEN + "[Main] Objective met. Ending run.")
+                    break
             else:
-                result = execution_agent.execute_task(next_task)
+                outcomes = worker_pool.run_batch(batch, session.bind(run_task))
+
+            # Merge results in the order the tasks were popped, not the order they finished
+            batch_completed = 0
+            for (next_task, outcome, error), task_id in zip(outcomes, task_ids):
+                if error is not None:
+                    err = f"[Main] Execution error on '{next_task}': {error}"
+                    print(Fore.RED + err)
+                    log_message(err)
+                    log_event("task_error", task=next_task, agent=task_agent_name(next_task), error=str(error))
+                    if task_id is not None:
+                        task_store.fail_task(task_id, str(error))
+                    continue
+
+                result, summary = outcome
+                if task_id is not None:
+                    task_store.complete_task(task_id, str(result))
+                print(Fore.GREEN + f"[Main] Task Result: {result}")
+                log_message(f"Task Result: {result}")
+                if checkpointer is not None:
+                    checkpointer.record_result(next_task, result)
+                if task_dedup is not None:
+                    task_dedup.mark_completed(next_task)
+                if goal_verifier is not None:
+                    goal_verifier.record_outcome(next_task, result)
+
+                if orchestrator is not None:
+                    orchestrator.submit_summary(next_task, result)
+                else:
+                    store_summary(next_task, result, summary)
 
-            print(Fore.GREEN + f"[Main] Task Result: {result}")
-            log_message(f"Task Result: {result}")
+                batch_completed += 1
 
-            summary = long_term_memory_agent.decide_what_to_store(next_task, result)
-            if summary:
-                append_long_term_memory(summary)
-                log_message(f"Stored in LTM:\n{summary}")
-            else:
-                print(Fore.YELLOW + "[Main] No new insights to store.")
+            completed_tasks += batch_completed
+            executing.clear()
+            if not batch_completed:
+                continue
 
-            completed_tasks += 1
-        except Exception as e:
-            err = f"[Main] Execution error on '{next_task}': {e}"
-            print(Fore.RED + err)
-            log_message(err)
-            continue
+            if orchestrator is not None:
+                orchestrator.submit_goal_check(user_objective)
+                latency.record("iteration", time.perf_counter() - iteration_start)
+                continue
 
-        if goal_evaluation_agent.evaluate_progress(user_objective):
-            print(Fore.GREEN + "[Main] Objective met. Ending run.")
-            break
+            start_time = time.perf_counter()
+            objective_met = check_goal(user_objective)
+            elapsed = time.perf_counter() - start_time
+            latency.record("goal_evaluate", elapsed)
+            log_event("goal_check", agent="GoalEvaluationAgent", latency=round(elapsed, 6), met=objective_met)
+            latency.record("iteration", time.perf_counter() - iteration_start)
+            if objective_met:
+                print(Fore.GREEN + "[Main] Objective met. Ending run.")
+                break
+        finished = True
+    finally:
+        short_term_memory.flush()
+        if task_store is not None:
+            task_counts = task_store.count_by_state()
+            log_message("Task store: " + ", ".join(f"{n} {state}" for state, n in sorted(task_counts.items())) + ".")
+            task_store.close()
+        # An interrupted run keeps its last iteration checkpoint to resume from
+        if checkpointer is not None:
+            if finished:
+                save_checkpoint(FINISHED)
+            checkpoint_stats = checkpointer.stats()
+            log_message(
+                f"Checkpoints: {checkpoint_stats['writes']} write(s), {checkpoint_stats['skipped']} unchanged, "
+                f"{checkpoint_stats['avg_write_ms']:.2f} ms per write."
+            )
+        worker_pool.shutdown()
+        if orchestrator is not None:
+            orchestrator.shutdown()
+            orchestrator_msg = (
+                f"Async orchestrator: {orchestrator.goal_checks} goal check(s), "
+                f"{orchestrator.goal_checks_skipped} coalesced, "
+                f"{orchestrator.goal_check_failures} failed, "
+                f"{orchestrator.speculative_cancelled()} speculative batch(es) cancelled, "
+                f"{orchestrator.backpressure_wait():.2f}s blocked on full stage queues."
+            )
+            print((Fore.RED if orchestrator.goal_check_failures else Fore.CYAN) + f"[Main] {orchestrator_msg}")
+            log_message(orchestrator_msg)
+        if task_dedup is not None:
+            task_dedup_stats = task_dedup.stats()
+            task_dedup_msg = (
+                f"Task dedup: {task_dedup_stats['duplicates']} of {task_dedup_stats['checks']} task(s) dropped, "
+                f"~{task_dedup_stats['calls_avoided']} model call(s) avoided, "
+                f"{task_dedup_stats['embeddings']} embedding(s) computed, "
+                f"{task_dedup_stats['embedding_cache_hits']} cache hit(s), "
+                f"{task_dedup_stats['avg_check_ms']:.2f} ms per check."
+            )
+            print(Fore.CYAN + f"[Main] {task_dedup_msg}")
+            log_message(task_dedup_msg)
+        if goal_verifier is not None:
+            goal_stats = goal_verifier.stats()
+            goal_msg = (
+                f"Goal checks: {goal_stats['checks']} check(s), {goal_stats['model_calls']} model call(s); "
+                f"{goal_stats['decided_by_files']} answered by file checks, "
+                f"{goal_stats['decided_unchanged']} with nothing changed, "
+                f"{goal_stats['decided_by_schedule']} skipped by backoff; "
+                f"{goal_stats['avg_check_ms']:.2f} ms per check."
+            )
+            print(Fore.CYAN + f"[Main] {goal_msg}")
+            log_message(goal_msg)
+        dedup_stats = ltm_dedup.stats()
+        log_message(
+            f"LTM dedup: {dedup_stats['duplicates']} of {dedup_stats['checks']} insight(s) skipped, "
+            f"{dedup_stats['avg_check_ms']:.3f} ms per check."
+        )
+        prioritization_msg = (
+            f"Prioritization: {scheduler.llm_calls} LLM re-rank(s), "
+            f"{scheduler.local_orderings} local ordering(s)."
+        )
+        print(Fore.CYAN + f"[Main] {prioritization_msg}")
+        log_message(prioritization_msg)
+        for line in latency.report_lines():
+            print(Fore.CYAN + f"[Main] Stage latency {line}")
+            log_message(f"Stage latency {line}")
 
     print(Fore.GREEN + f"[Main] Done. Tasks completed: {completed_tasks}")
     log_message(f"End of run. Tasks completed: {completed_tasks}\n")
+    log_event("run_end", tasks_completed=completed_tasks)
+    return completed_tasks
 
-def main():
-    init(autoreset=True)
-
+def build_arg_parser():
     parser = argparse.ArgumentParser(description="Two-thread autonomous system. Main loop is fully autonomous; background thread listens for user input.")
-    parser.add_argument("--model_path", required=True, help="Path to your Llama model (.gguf).")
+    parser.add_argument("--model_path", required=True,
+                        help="Path to your Llama model (.gguf); with --backend openai, the model name sent to the server.")
+    parser.add_argument("--backend", choices=["llama_cpp", "openai"], default="llama_cpp",
+                        help="'llama_cpp' loads the model in this process; 'openai' sends completions to an "
+                             "OpenAI-compatible server (llama.cpp server, llama_cpp.server) at --server_url.")
+    parser.add_argument("--server_url", default=DEFAULT_SERVER_URL, help="Base URL of the completion server.")
+    parser.add_argument("--server_timeout", type=float, default=DEFAULT_SERVER_TIMEOUT,
+                        help="Seconds to wait for the completion server to connect or send data.")
+    parser.add_argument("--server_retries", type=int, default=DEFAULT_SERVER_RETRIES,
+                        help="Retries for failed connections and overloaded-server responses.")
+    parser.add_argument("--no_mmap", action="store_true",
+                        help="Read the model weights into memory instead of memory-mapping the file.")
+    parser.add_argument("--mlock", action="store_true", help="Lock the model weights in RAM so they are never swapped out.")
+    parser.add_argument("--n_threads", type=int, default=None, help="CPU threads per model instance (default: llama_cpp's choice).")
+    parser.add_argument("--orchestrator", choices=["serial", "async"], default="serial",
+                        help="'async' runs LTM summarization and goal checks as background stages.")
+    parser.add_argument("--stage_queue_size", type=int, default=2,
+                        help="Maximum items waiting in each background stage before the main loop blocks.")
     parser.add_argument("--debug", action="store_true", help="Enable debug prints.")
-    args_parsed = parser.parse_args()
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Number of tasks executed at the same time, each on its own model context.")
+    parser.add_argument("--replica_gpu_layers", type=int, default=DEFAULT_REPLICA_GPU_LAYERS,
+                        help="GPU layers for the second and later instance of a model (--concurrency, async stages, "
+                             "--slots). Each instance keeps its own copy of offloaded layers in VRAM, so extra "
+                             "instances run on the CPU by default.")
+    parser.add_argument("--task_queue", choices=["memory", "sqlite"], default="memory",
+                        help="'sqlite' keeps the task queue, with each task's state and result, in --task_db; "
+                             "processes sharing the database claim tasks from it without running any twice.")
+    parser.add_argument("--task_db", default=DEFAULT_TASK_DB, help="SQLite task database for --task_queue sqlite.")
+    parser.add_argument("--rerank_threshold", type=float, default=DEFAULT_RERANK_THRESHOLD,
+                        help="Fraction of the task set that must change before TaskPrioritizationAgent re-sorts it.")
+    parser.add_argument("--memory_tokens", type=int, default=DEFAULT_MEMORY_TOKENS,
+                        help="Token budget for long-term memory entries given to TaskCreationAgent and ExecutionAgent.")
+    parser.add_argument("--ltm_embeddings", action="store_true",
+                        help="Also rank long-term memory by llama_cpp embeddings, not only BM25.")
+    parser.add_argument("--ltm_dedup_threshold", type=float, default=DEFAULT_DEDUP_THRESHOLD,
+                        help="Similarity at which a new insight counts as a near-duplicate of long-term memory.")
+    parser.add_argument("--task_dedup_embeddings", action="store_true",
+                        help="Compare new tasks by llama_cpp embeddings instead of word overlap "
+                             "(loads the model a second time in embedding mode).")
+    parser.add_argument("--task_dedup_threshold", type=float, default=DEFAULT_TASK_DEDUP_THRESHOLD,
+                        help="With --task_dedup_embeddings, the cosine similarity at which a new task counts as a "
+                             "repeat of a pending or recent one.")
+    parser.add_argument("--no_task_dedup", action="store_true",
+                        help="Queue every created task, even repeats of pending or recently completed ones.")
+    parser.add_argument("--goal_check_max_interval", type=int, default=DEFAULT_GOAL_CHECK_MAX_INTERVAL,
+                        help="Most goal checks skipped between model calls after repeated NO answers.")
+    parser.add_argument("--no_goal_verifier", action="store_true",
+                        help="Ask GoalEvaluationAgent after every batch instead of verifying outcomes first.")
+    parser.add_argument("--cache_agents", default=",".join(DEFAULT_CACHED_AGENTS),
+                        help="Comma-separated agent types whose responses are cached ('' disables the cache).")
+    parser.add_argument("--cache_dir", default=DEFAULT_CACHE_DIR, help="Directory for the on-disk response cache.")
+    parser.add_argument("--cache_ttl", type=float, default=DEFAULT_TTL_SECONDS, help="Response cache entry lifetime in seconds.")
+    parser.add_argument("--no_stream", action="store_true",
+                        help="Wait for full completions instead of streaming and stopping once the answer is decided.")
+    parser.add_argument("--grammars", action="store_true",
+                        help="Constrain agent outputs with GBNF grammars (task lines, FILE#/WEB# routing, YES/NO).")
+    parser.add_argument("--speculative", default="",
+                        help="Per-agent speculative decoding, e.g. 'ExecutionAgent=prompt_lookup:10,"
+                             "LongTermMemoryAgent=draft:small.gguf:4'.")
+    parser.add_argument("--metrics_file", default="metrics",
+                        help="Path prefix for metrics snapshots (<prefix>.prom and <prefix>.json; '' disables them).")
+    parser.add_argument("--metrics_interval", type=float, default=DEFAULT_EXPORT_INTERVAL,
+                        help="Seconds between metrics snapshots during a run.")
+    parser.add_argument("--run_log", default=DEFAULT_RUN_LOG_FILE,
+                        help="Structured JSONL run log, queried with run_log_query.py ('' disables it).")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT_FILE,
+                        help="Run checkpoint written every iteration ('' disables checkpoints).")
+    parser.add_argument("--checkpoint_kv", action="store_true",
+                        help="Also checkpoint the model's prompt prefix KV states (<checkpoint>.kv).")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the run saved in --checkpoint instead of starting from scratch.")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Keep the model resident and run objectives submitted with session_server.py as concurrent sessions.")
+    parser.add_argument("--daemon_host", default=DEFAULT_HOST, help="Address the session server listens on.")
+    parser.add_argument("--daemon_port", type=int, default=DEFAULT_PORT, help="Port the session server listens on.")
+    parser.add_argument("--max_sessions", type=int, default=DEFAULT_MAX_SESSIONS,
+                        help="Objectives run at the same time in daemon mode; later ones wait.")
+    parser.add_argument("--slots", type=int, default=None,
+                        help="Model calls run in parallel across daemon sessions, each on its own model context. "
+                             f"Defaults to {DEFAULT_SLOTS} with --backend openai or --replica_gpu_layers, otherwise "
+                             "to 1, since extra local contexts run on the CPU next to the GPU one.")
+    parser.add_argument("--sessions_dir", default=DEFAULT_SESSIONS_DIR,
+                        help="Directory holding one working directory (memory files, created files) per session.")
+    return parser
+
+def configure_components(args):
+    """
+    Applies the inference settings in 'args' to the process-wide components.
+    Raises ValueError for an invalid --speculative setting or --server_url.
+    """
+    configure_streaming(not args.no_stream)
+    configure_grammars(args.grammars)
+    speculative_configs = parse_speculative_spec(args.speculative)
+    configure_speculative(speculative_configs)
+    for agent, config in speculative_configs.items():
+        log_message(f"Speculative decoding for {agent}: {config.describe()}")
+
+    # Background stages get their own model context so they overlap with task execution
+    replicas = args.concurrency + 1 if args.orchestrator == "async" else args.concurrency
+    if args.daemon:
+        if args.slots is None:
+            # A CPU-only replica competes with the GPU context for the same cores
+            # and the scheduler treats it as an equal slot, so only add one on request
+            args.slots = DEFAULT_SLOTS if args.backend == "openai" or args.replica_gpu_layers > 0 else 1
+        # Sessions share the model contexts; the scheduler hands them out in turn
+        replicas = args.slots
+        configure_scheduler(args.slots)
+    else:
+        configure_scheduler(None)
+    get_engine().set_replicas(replicas)
+    if args.backend == "openai":
+        # One pooled connection per concurrent caller; the server batches their requests
+        configure_backend(OpenAICompatibleBackend(
+            args.server_url, timeout=args.server_timeout, retries=args.server_retries, pool_size=replicas,
+        ))
+        log_message(f"Inference backend: OpenAI-compatible server at {args.server_url}")
+        if speculative_configs:
+            log_message("Speculative decoding settings are ignored with --backend openai; configure the server's draft model instead.")
+    else:
+        configure_backend(LlamaCppBackend())
+    get_engine().set_load_options(use_mmap=not args.no_mmap, use_mlock=args.mlock, n_threads=args.n_threads,
+                                  replica_gpu_layers=args.replica_gpu_layers)
+
+    configure_response_cache(
+        cache_dir=args.cache_dir,
+        enabled_agents=[a.strip() for a in args.cache_agents.split(",") if a.strip()],
+        ttl_seconds=args.cache_ttl,
+    )
+
+def run_daemon(args):
+    """
+    Serves objectives as concurrent sessions until a 'shutdown' command or Ctrl+C.
+    """
+    try:
+        server = SessionServer(
+            lambda session: main_loop(session.objective, args.debug, session),
+            host=args.daemon_host,
+            port=args.daemon_port,
+            max_sessions=args.max_sessions,
+            sessions_dir=args.sessions_dir,
+            run_logger=get_run_logger(),
+            stats=lambda: {"scheduler": get_scheduler().stats(), "generation": generation_stats()},
+        )
+    except OSError as e:
+        msg = f"Could not start the session server on {args.daemon_host}:{args.daemon_port}: {e}"
+        print(Fore.RED + msg)
+        log_message(msg)
+        return
+    host, port = server.address
+    msg = (
+        f"Session server listening on {host}:{port} "
+        f"({args.max_sessions} concurrent session(s), {args.slots} model slot(s))."
+    )
+    print(Fore.GREEN + f"[Main] {msg}")
+    log_message(msg)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(Fore.YELLOW + "[Main] Stopping session server.")
+
+    for session_id, session_stats in sorted(get_scheduler().stats().items(), key=lambda item: str(item[0])):
+        scheduler_msg = (
+            f"Session {session_id}: {session_stats['calls']} model call(s), "
+            f"{session_stats['avg_wait'] * 1e3:.0f} ms average wait for a slot "
+            f"(max {session_stats['max_wait'] * 1e3:.0f} ms)."
+        )
+        print(Fore.CYAN + f"[Main] {scheduler_msg}")
+        log_message(scheduler_msg)
+    server_stats = server.stats()
+    throughput_msg = (
+        f"Session server: {sum(server_stats['sessions'].values())} session(s), "
+        f"{server_stats['tokens_generated']} token(s) generated, "
+        f"{server_stats['tokens_per_second']:.1f} token(s)/s aggregate."
+    )
+    print(Fore.CYAN + f"[Main] {throughput_msg}")
+    log_message(throughput_msg)
+
+def report_startup(timings: dict):
+    """
+    Prints and logs the startup breakdown in seconds.
+    """
+    breakdown = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items())
+    msg = f"Startup: {breakdown} (total {sum(timings.values()):.2f}s)."
+    print(Fore.CYAN + f"[Main] {msg}")
+    log_message(msg)
+    log_event("startup", **{stage: round(seconds, 6) for stage, seconds in timings.items()})
+
+def report_shutdown(backend):
+    """
+    Prints and logs the per-component statistics at the end of a run.
+    """
+    engine = get_engine()
+    stats = engine.stats()
+    engine_msg = (
+        f"Model engine: {stats['loads']} load(s) taking {stats['load_time_total']:.2f} seconds, "
+        f"{stats['loads_avoided']} load(s) avoided."
+    )
+    print(Fore.CYAN + f"[Main] {engine_msg}")
+    log_message(engine_msg)
+
+    if args.backend == "openai":
+        backend_stats = backend.stats()
+        backend_msg = (
+            f"Completion server: {backend_stats['requests']} request(s), {backend_stats['retries']} retry(ies), "
+            f"{backend_stats['failures']} failure(s), {backend_stats['connections_opened']} connection(s) opened, "
+            f"{backend_stats['connections_reused']} reused."
+        )
+        print(Fore.CYAN + f"[Main] {backend_msg}")
+        log_message(backend_msg)
+
+    prefix_stats = get_prefix_cache().stats()
+    prefix_msg = (
+        f"Prompt prefix cache: {prefix_stats['hits']} hit(s), {prefix_stats['misses']} miss(es), "
+        f"prompt tokens skipped per agent: {prefix_stats['tokens_skipped']}"
+    )
+    print(Fore.CYAN + f"[Main] {prefix_msg}")
+    log_message(prefix_msg)
+    get_prefix_cache().clear()
+
+    cache_stats = get_response_cache().stats()
+    cache_msg = (
+        f"Response cache: {cache_stats['memory_hits']} memory hit(s), {cache_stats['disk_hits']} disk hit(s), "
+        f"{cache_stats['misses']} miss(es)."
+    )
+    print(Fore.CYAN + f"[Main] {cache_msg}")
+    log_message(cache_msg)
+
+    for agent, agent_stats in sorted(generation_stats().items()):
+        generation_msg = (
+            f"Generation {agent}: {agent_stats['calls']} call(s), "
+            f"{agent_stats['tokens_per_call']:.1f} token(s) per call, "
+            f"{agent_stats['tokens_per_second']:.1f} token(s)/s, "
+            f"{agent_stats['avg_first_output'] * 1e3:.0f} ms to first useful output, "
+            f"{agent_stats['early_stops']} early stop(s)."
+        )
+        print(Fore.CYAN + f"[Main] {generation_msg}")
+        log_message(generation_msg)
+
+    for agent, agent_stats in sorted(speculative_stats().items()):
+        speculative_msg = (
+            f"Speculative decoding {agent}: {agent_stats['tokens_per_second']:.1f} token(s)/s, "
+            f"{agent_stats['drafted']} drafted, ~{agent_stats['acceptance_rate']:.0%} accepted."
+        )
+        print(Fore.CYAN + f"[Main] {speculative_msg}")
+        log_message(speculative_msg)
+
+    if args.grammars:
+        grammar_stats = get_grammar_cache().stats()
+        grammar_msg = f"Output grammars: {grammar_stats['compiled']} compiled, {grammar_stats['hits']} reused."
+        print(Fore.CYAN + f"[Main] {grammar_msg}")
+        log_message(grammar_msg)
+
+    builder_stats = get_prompt_builder(args.model_path).stats()
+    builder_msg = (
+        f"Prompt builder: {builder_stats['prompts_trimmed']} of {builder_stats['prompts_built']} prompt(s) trimmed, "
+        f"{builder_stats['tokens_dropped']} token(s) dropped."
+    )
+    print(Fore.CYAN + f"[Main] {builder_msg}")
+    log_message(builder_msg)
+
+def main():
+    startup = {"imports": time.perf_counter() - IMPORT_START}
+    args_parsed = build_arg_parser().parse_args()
 
     global args
     args = args_parsed
 
-    setup_logging()
+    start_time = time.perf_counter()
+    from colorama import init
+    init(autoreset=True)
+    startup["imports"] += time.perf_counter() - start_time
 
-    print(Fore.CYAN + f"Loading model from: {args.model_path}")
-    start_time = time.time()
-    if not os.path.exists(args.model_path):
-        msg = f"Model file not found at {args.model_path}."
-        print(Fore.RED + msg)
-        log_message(msg)
+    setup_logging()
+    try:
+        configure_components(args)
+    except ValueError as e:
+        print(Fore.RED + f"Invalid setting: {e}")
         sys.exit(1)
-
+    if args.run_log:
+        # A resumed run keeps its run id, so run_log_query.py --run shows it whole
+        resume_state = load_checkpoint(args.checkpoint) if args.resume and args.checkpoint and not args.daemon else None
+        run_id = resume_state.get("run_id") if resume_state is not None and resume_state["status"] == RUNNING else None
+        run_logger = configure_run_log(args.run_log, run_id=run_id)
+        print(Fore.CYAN + f"[Main] Run id: {run_logger.run_id} (structured log: {args.run_log})")
+        log_message(f"Run id: {run_logger.run_id}")
+
+    backend = get_backend()
+    if args.backend == "openai":
+        print(Fore.CYAN + f"Connecting to completion server at: {args.server_url}")
+    else:
+        print(Fore.CYAN + f"Loading model from: {args.model_path}")
+    start_time = time.perf_counter()
     try:
-        test_llm = Llama(model_path=args.model_path, n_gpu_layers=30, gpu_layers_size_mb=512, verbose=False)
-        _ = test_llm("Test", max_tokens=1)
-        del test_llm
-    except Exception as e:
-        msg = f"Failed to load model: {e}"
+        backend.check(args.model_path)
+    except InferenceBackendError as e:
+        msg = str(e)
         print(Fore.RED + msg)
         log_message(msg)
         sys.exit(1)
 
-    load_time = time.time() - start_time
-    print(Fore.GREEN + f"Model loaded successfully in {load_time:.2f} seconds.")
-    log_message(f"Model loaded in {load_time:.2f} seconds.")
-
-    thread = threading.Thread(target=user_input_thread, daemon=True)
-    thread.start()
+    if args.backend == "openai":
+        startup["connect"] = time.perf_counter() - start_time
+        print(Fore.GREEN + f"Completion server reachable in {startup['connect']:.2f} seconds.")
+        log_message(f"Completion server at {args.server_url} reachable in {startup['connect']:.2f} seconds.")
+    else:
+        # The validation load becomes the resident instance the agents use
+        try:
+            timings = get_engine().warm_up(args.model_path, verbose=args.debug)
+        except Exception as e:
+            msg = f"Failed to load model: {e}"
+            print(Fore.RED + msg)
+            log_message(msg)
+            sys.exit(1)
+        startup["imports"] += timings["import"]
+        startup["load"] = timings["load"]
+        startup["warmup"] = timings["warmup"]
+        print(Fore.GREEN + f"Model loaded successfully in {timings['load']:.2f} seconds.")
+        log_message(f"Model loaded in {timings['load']:.2f} seconds.")
+    report_startup(startup)
+
+    metrics_exporter = None
+    if args.metrics_file:
+        metrics_exporter = MetricsExporter(get_metrics(), args.metrics_file, args.metrics_interval)
+        metrics_exporter.start()
 
-    user_objective = "write hello world! to a file and save it."
-    main_loop(user_objective, args.debug)
+    try:
+        if args.daemon:
+            run_daemon(args)
+        else:
+            thread = threading.Thread(target=user_input_thread, daemon=True)
+            thread.start()
+            user_objective = "write hello world! to a file and save it."
+            main_loop(user_objective, args.debug)
+    finally:
+        if metrics_exporter is not None:
+            metrics_exporter.stop()
+            log_message(f"Metrics written to {args.metrics_file}.prom and {args.metrics_file}.json")
+        try:
+            report_shutdown(backend)
+        finally:
+            get_engine().release_all()
+            backend.close()
 
     print(Fore.GREEN + "[Main] Program ended. Goodbye.")
 
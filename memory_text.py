@@ -0,0 +1,26 @@
+import re
+
+# Text helpers shared by the long-term memory index, its deduplication and the
+# prompt builder. They need no NumPy, so importing them stays cheap.
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+ENTRY_SEPARATOR = re.compile(r"\n\s*\n")
+
+DEFAULT_MEMORY_TOKENS = 256
+
+
+def tokenize(text: str) -> list:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def split_entries(content: str) -> list:
+    """
+    Splits long_term_memory.txt content into entries. append_long_term_memory
+    separates entries with a blank line.
+    """
+    return [entry.strip() for entry in ENTRY_SEPARATOR.split(content) if entry.strip()]
+
+
+def approx_token_count(text: str) -> int:
+    # Roughly four characters per token for English text with Llama tokenizers.
+    return max(1, len(text) // 4)
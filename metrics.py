@@ -0,0 +1,220 @@
+import bisect
+import json
+import logging
+import math
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXPORT_INTERVAL = 30.0
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+TOKEN_BUCKETS = (1, 4, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+RATE_BUCKETS = (0.5, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+# name -> (type, help, buckets)
+METRICS = {
+    "inference_seconds": ("histogram", "Wall time of run_model_inference calls.", SECONDS_BUCKETS),
+    "inference_prompt_tokens": ("histogram", "Prompt tokens per model call.", TOKEN_BUCKETS),
+    "inference_generated_tokens": ("histogram", "Generated tokens per model call.", TOKEN_BUCKETS),
+    "inference_tokens_per_second": ("histogram", "Generation speed per model call.", RATE_BUCKETS),
+    "inference_cache_total": ("counter", "Response and prompt-prefix cache lookups by result.", None),
+    "model_load_seconds": ("histogram", "Time to load a model instance.", SECONDS_BUCKETS),
+    "stage_seconds": ("histogram", "Wall time of main_loop and background stages.", SECONDS_BUCKETS),
+    "stage_errors_total": ("counter", "Background stage items whose handler raised.", None),
+    "queue_depth": ("gauge", "Items waiting in the task queue and in background stage queues.", None),
+}
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float):
+        """
+        Upper bound of the bucket holding the q-quantile (inf if past the last bucket).
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets + (math.inf,), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return math.inf
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_bound(bound) -> str:
+    return "+Inf" if bound == math.inf else repr(float(bound))
+
+
+def _json_bound(bound):
+    return "+Inf" if bound == math.inf else bound
+
+
+class MetricsRegistry:
+    """
+    In-process counters, gauges and histograms, labelled by agent or stage.
+
+    Recording is a dict lookup and a bisect under one lock, so it can be
+    called on every model call and stage. Snapshots render as Prometheus text
+    format or JSON; write() replaces both files atomically.
+    """
+
+    def __init__(self, prefix="agent"):
+        self.prefix = prefix
+        self._series = {name: {} for name in METRICS}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, **labels):
+        _, _, buckets = METRICS[name]
+        key = _label_key(labels)
+        with self._lock:
+            histogram = self._series[name].get(key)
+            if histogram is None:
+                histogram = self._series[name][key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name: str, value=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series[name]
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._series[name][key] = value
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, buckets) in METRICS.items():
+                series = self._series[name]
+                if not series:
+                    continue
+                full_name = f"{self.prefix}_{name}"
+                lines.append(f"# HELP {full_name} {help_text}")
+                lines.append(f"# TYPE {full_name} {kind}")
+                for key, value in sorted(series.items()):
+                    if kind != "histogram":
+                        lines.append(f"{full_name}{_format_labels(key)} {value}")
+                        continue
+                    cumulative = 0
+                    for bound, n in zip(buckets + (math.inf,), value.counts):
+                        cumulative += n
+                        lines.append(f"{full_name}_bucket{_format_labels(key, [('le', _format_bound(bound))])} {cumulative}")
+                    lines.append(f"{full_name}_sum{_format_labels(key)} {value.sum}")
+                    lines.append(f"{full_name}_count{_format_labels(key)} {value.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict:
+        snapshot = {}
+        with self._lock:
+            for name, (kind, _, _) in METRICS.items():
+                entries = []
+                for key, value in sorted(self._series[name].items()):
+                    entry = {"labels": dict(key)}
+                    if kind == "histogram":
+                        entry.update(
+                            count=value.count,
+                            sum=value.sum,
+                            mean=value.sum / value.count if value.count else None,
+                            p50=_json_bound(value.quantile(0.5)),
+                            p95=_json_bound(value.quantile(0.95)),
+                        )
+                    else:
+                        entry["value"] = value
+                    entries.append(entry)
+                if entries:
+                    snapshot[name] = {"type": kind, "series": entries}
+        return snapshot
+
+    def write(self, path_prefix: str):
+        """
+        Writes '<path_prefix>.prom' and '<path_prefix>.json'.
+        """
+        for suffix, content in ((".prom", self.to_prometheus()),
+                                (".json", json.dumps(self.to_dict(), indent=2))):
+            path = path_prefix + suffix
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+
+
+class MetricsExporter:
+    """
+    Writes registry snapshots every 'interval' seconds from a daemon thread,
+    and a final one on stop().
+    """
+
+    def __init__(self, registry: MetricsRegistry, path_prefix: str, interval=DEFAULT_EXPORT_INTERVAL):
+        self.registry = registry
+        self.path_prefix = path_prefix
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+        self._thread.start()
+
+    def _write(self):
+        try:
+            self.registry.write(self.path_prefix)
+        except OSError as e:
+            logger.warning("Could not write metrics snapshot %s: %s", self.path_prefix, e)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._write()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._write()
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """
+    Returns the process-wide MetricsRegistry, creating it on first use.
+    """
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = MetricsRegistry()
+        return _metrics
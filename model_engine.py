@@ -0,0 +1,268 @@
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import get_metrics
+
+DEFAULT_N_CTX = 2048
+DEFAULT_N_GPU_LAYERS = 30
+DEFAULT_GPU_LAYERS_SIZE_MB = 512
+# Every instance holds its own copy of the layers it offloads, so only the
+# first instance of a model goes to the GPU unless asked otherwise.
+DEFAULT_REPLICA_GPU_LAYERS = 0
+
+
+class ModelEngine:
+    """
+    Process-wide holder for loaded Llama models.
+
+    Each distinct (model_path, n_ctx, embedding, logits_all, draft_model) combination is loaded once
+    and then shared by every agent. A llama_cpp context is not safe to use from several threads at once, so
+    each loaded instance is handed to one caller at a time. With 'replicas' > 1 up
+    to that many instances of the same model are loaded on demand so that calls
+    from different worker threads can run in parallel. llama_cpp does not share
+    weights between contexts on the GPU, so each replica offloading layers costs
+    the VRAM of those layers again; the second and later instances therefore
+    use 'replica_gpu_layers' (CPU only by default) instead of
+    DEFAULT_N_GPU_LAYERS.
+
+    llama_cpp only honours 'logits_all' and 'draft_model' when a Llama is
+    constructed, so instances used for speculative decoding are loaded with
+    them and kept under their own key.
+    """
+
+    def __init__(self, replicas=1, loader=None):
+        self.replicas = max(1, replicas)
+        self.loader = loader
+        self.load_options = {"use_mmap": True, "use_mlock": False}
+        self.replica_gpu_layers = DEFAULT_REPLICA_GPU_LAYERS
+        self._models = {}
+        self._idle = {}
+        self._loading = {}
+        self._cond = threading.Condition()
+        self.loads = 0
+        self.loads_avoided = 0
+        self.load_times = {}
+        self._tokenizers = {}
+        self._tokenizer_lock = threading.Lock()
+
+    def set_replicas(self, replicas: int):
+        """
+        Sets how many instances of each model may be loaded for concurrent use.
+        """
+        with self._cond:
+            self.replicas = max(1, replicas)
+            self._cond.notify_all()
+
+    def set_loader(self, loader):
+        """
+        Replaces the model constructor, e.g. with fake_llm.FakeLlama for offline
+        benchmarks. It is called with Llama's keyword arguments. None restores
+        llama_cpp.Llama.
+        """
+        with self._cond:
+            self.loader = loader
+
+    def set_load_options(self, use_mmap=True, use_mlock=False, n_threads=None,
+                         replica_gpu_layers=DEFAULT_REPLICA_GPU_LAYERS):
+        """
+        Sets how models loaded from now on are mapped and run: 'use_mmap' maps
+        the weights instead of reading them (fast loads, pages shared between
+        replicas), 'use_mlock' pins them in RAM, 'n_threads' overrides
+        llama_cpp's CPU thread count, and 'replica_gpu_layers' is how many layers
+        the second and later instances of a model offload to the GPU.
+        """
+        options = {"use_mmap": use_mmap, "use_mlock": use_mlock}
+        if n_threads:
+            options["n_threads"] = n_threads
+        with self._cond:
+            self.load_options = options
+            self.replica_gpu_layers = replica_gpu_layers
+
+    def _constructor(self):
+        if self.loader is not None:
+            return self.loader
+        from llama_cpp import Llama
+        return Llama
+
+    def _load(self, key, replica=0, verbose=False):
+        model_path, n_ctx, embedding, logits_all, draft_model = key
+        options = dict(self.load_options)
+        n_gpu_layers = DEFAULT_N_GPU_LAYERS if replica == 0 else self.replica_gpu_layers
+        if logits_all:
+            options["logits_all"] = True
+        if draft_model is not None:
+            options["draft_model"] = draft_model
+        start_time = time.time()
+        llm = self._constructor()(
+            model_path=model_path,
+            n_gpu_layers=n_gpu_layers,
+            gpu_layers_size_mb=DEFAULT_GPU_LAYERS_SIZE_MB,
+            verbose=verbose,
+            n_ctx=n_ctx,
+            embedding=embedding,
+            **options
+        )
+        load_time = time.time() - start_time
+        get_metrics().observe("model_load_seconds", load_time, model=os.path.basename(model_path))
+        if verbose:
+            print(f"[DEBUG] ModelEngine loaded '{model_path}' (n_ctx={n_ctx}, replica {replica}, "
+                  f"{n_gpu_layers} GPU layer(s)) in {load_time:.2f} seconds.")
+        return llm, load_time
+
+    def _checkout(self, key, verbose=False):
+        """
+        Takes an idle instance for 'key', loading a new one if the replica limit
+        allows it, otherwise waiting for another caller to hand one back.
+        """
+        with self._cond:
+            while True:
+                idle = self._idle.setdefault(key, [])
+                if idle:
+                    self.loads_avoided += 1
+                    return idle.pop()
+                loaded = len(self._models.get(key, [])) + self._loading.get(key, 0)
+                if loaded < self.replicas:
+                    self._loading[key] = self._loading.get(key, 0) + 1
+                    break
+                self._cond.wait()
+
+        try:
+            llm, load_time = self._load(key, replica=loaded, verbose=verbose)
+        finally:
+            with self._cond:
+                self._loading[key] -= 1
+                # A failed load frees its slot for callers waiting in the loop above
+                self._cond.notify_all()
+
+        with self._cond:
+            self.loads += 1
+            self.load_times[key] = self.load_times.get(key, 0.0) + load_time
+            self._models.setdefault(key, []).append(llm)
+        return llm
+
+    def _checkin(self, key, llm):
+        with self._cond:
+            self._idle.setdefault(key, []).append(llm)
+            self._cond.notify_all()
+
+    def get_model(self, model_path: str, n_ctx=DEFAULT_N_CTX, verbose=False, embedding=False, logits_all=False,
+                  draft_model=None):
+        """
+        Makes sure (model_path, n_ctx) is resident and returns one of its instances.
+        Use acquire() to run calls on it.
+        """
+        key = (model_path, n_ctx, embedding, logits_all, draft_model)
+        llm = self._checkout(key, verbose=verbose)
+        self._checkin(key, llm)
+        return llm
+
+    @contextmanager
+    def acquire(self, model_path: str, n_ctx=DEFAULT_N_CTX, verbose=False, embedding=False, logits_all=False,
+                draft_model=None):
+        """
+        Yields a resident Llama for (model_path, n_ctx) for the exclusive use of the caller.
+        With 'embedding' the instance is created in embedding mode for Llama.embed().
+        With 'draft_model' it is created for speculative decoding with that drafter
+        (which implies logits_all); 'logits_all' alone keeps logits for every token.
+        """
+        key = (model_path, n_ctx, embedding, logits_all, draft_model)
+        llm = self._checkout(key, verbose=verbose)
+        try:
+            yield llm
+        finally:
+            self._checkin(key, llm)
+
+    def warm_up(self, model_path: str, n_ctx=DEFAULT_N_CTX, verbose=False) -> dict:
+        """
+        Makes (model_path, n_ctx) resident and runs a one-token completion on it,
+        so the first agent call neither loads the model nor pays for the first
+        evaluation. Returns the seconds spent importing llama_cpp, loading and
+        warming up; 'load' is 0.0 if the model was already resident.
+        """
+        start_time = time.perf_counter()
+        self._constructor()
+        timings = {"import": time.perf_counter() - start_time}
+
+        start_time = time.perf_counter()
+        loads_before = self.loads
+        with self.acquire(model_path, n_ctx=n_ctx, verbose=verbose) as llm:
+            timings["load"] = time.perf_counter() - start_time if self.loads > loads_before else 0.0
+            start_time = time.perf_counter()
+            llm("Test", max_tokens=1)
+            llm.reset()
+            timings["warmup"] = time.perf_counter() - start_time
+        return timings
+
+    def get_tokenizer(self, model_path: str, verbose=False):
+        """
+        Returns a vocab-only Llama for 'model_path'. It only tokenizes, so prompt
+        sizes can be measured without checking out an inference instance.
+        """
+        with self._tokenizer_lock:
+            tokenizer = self._tokenizers.get(model_path)
+            if tokenizer is None:
+                tokenizer = self._constructor()(model_path=model_path, vocab_only=True, verbose=verbose)
+                self._tokenizers[model_path] = tokenizer
+            return tokenizer
+
+    def stats(self) -> dict:
+        """
+        Returns load counters and per-model load times in seconds.
+        """
+        with self._cond:
+            return {
+                "loaded_models": sum(len(instances) for instances in self._models.values()),
+                "loads": self.loads,
+                "loads_avoided": self.loads_avoided,
+                "load_time_total": sum(self.load_times.values()),
+                "load_times": {
+                    f"{path} (n_ctx={n_ctx}{', embedding' if embedding else ''}{', logits_all' if logits_all else ''}"
+                    f"{', speculative' if draft_model is not None else ''})": t
+                    for (path, n_ctx, embedding, logits_all, draft_model), t in self.load_times.items()
+                },
+            }
+
+    def release(self, model_path: str, n_ctx=DEFAULT_N_CTX, embedding=False, logits_all=False, draft_model=None):
+        """
+        Frees every instance of a model, waiting for in-flight calls to finish.
+        """
+        key = (model_path, n_ctx, embedding, logits_all, draft_model)
+        with self._cond:
+            while len(self._idle.get(key, [])) < len(self._models.get(key, [])):
+                self._cond.wait()
+            instances = self._models.pop(key, [])
+            self._idle.pop(key, None)
+        for llm in instances:
+            if hasattr(llm, "close"):
+                llm.close()
+        del instances
+
+    def release_all(self):
+        """
+        Frees every resident model. Registered with atexit so shutdown is clean.
+        """
+        with self._cond:
+            keys = list(self._models.keys())
+        for key in keys:
+            self.release(*key)
+        with self._tokenizer_lock:
+            self._tokenizers.clear()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> ModelEngine:
+    """
+    Returns the process-wide ModelEngine, creating it on first use.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = ModelEngine()
+            atexit.register(_engine.release_all)
+        return _engine
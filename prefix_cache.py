@@ -0,0 +1,197 @@
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_STATES = 8
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_zero_rows = {}
+
+
+def _zero_scores(n_tokens: int, n_vocab: int):
+    """
+    Returns an (n_tokens, n_vocab) float32 array of zeros backed by a single
+    shared row, so it costs O(n_vocab) memory whatever n_tokens is.
+    """
+    import numpy as np
+
+    row = _zero_rows.get(n_vocab)
+    if row is None:
+        row = _zero_rows.setdefault(n_vocab, np.zeros(n_vocab, dtype=np.float32))
+    return np.broadcast_to(row, (n_tokens, n_vocab))
+
+
+class SavedState:
+    """
+    A llama_cpp LlamaState without its 'scores' copy.
+
+    Llama.save_state() copies the logits of every prefix token (n_tokens x
+    n_vocab float32, tens of MB for large vocabularies). They are never read
+    here, because at least one prompt token is evaluated after load_state(), so
+    only the KV state ('llama_state') and the token ids are kept. 'scores' is a
+    zero view with the shape Llama.load_state() expects.
+    """
+
+    __slots__ = ("input_ids", "n_tokens", "llama_state", "llama_state_size", "seed", "n_vocab")
+
+    def __init__(self, input_ids, n_tokens: int, llama_state: bytes, llama_state_size: int, seed=None, n_vocab=1):
+        self.input_ids = input_ids
+        self.n_tokens = n_tokens
+        self.llama_state = llama_state
+        self.llama_state_size = llama_state_size
+        self.seed = seed
+        self.n_vocab = n_vocab
+
+    @classmethod
+    def from_state(cls, state, n_vocab: int):
+        return cls(
+            state.input_ids.copy(), int(state.n_tokens), bytes(state.llama_state), int(state.llama_state_size),
+            getattr(state, "seed", None), n_vocab,
+        )
+
+    @property
+    def scores(self):
+        return _zero_scores(self.n_tokens, self.n_vocab)
+
+    @property
+    def nbytes(self) -> int:
+        return self.llama_state_size + self.input_ids.nbytes
+
+
+class PromptPrefixCache:
+    """
+    Keeps saved llama_cpp KV states for the fixed preamble of each agent prompt.
+
+    Before a call the matching state is loaded back into the model, so the
+    completion only has to evaluate the variable suffix of the prompt. States
+    are kept as SavedState, without the per-token logits, and evicted
+    least-recently-used once more than 'max_states' are held or together they
+    exceed 'max_bytes'.
+    """
+
+    def __init__(self, max_states=DEFAULT_MAX_STATES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_states = max_states
+        self.max_bytes = max_bytes
+        self._states = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.tokens_skipped = {}
+
+    def prepare(self, llm, model_key, agent_type: str, prompt: str, prefix: str, verbose=False) -> int:
+        """
+        Puts the KV state for 'prefix' into 'llm' ahead of running 'prompt'.
+        Must be called while holding the model lock. Returns the number of
+        prompt tokens the next completion will not have to evaluate.
+        """
+        if not prefix or not prompt.startswith(prefix):
+            return 0
+
+        prompt_tokens = llm.tokenize(prompt.encode("utf-8"))
+        prefix_tokens = llm.tokenize(prefix.encode("utf-8"))
+
+        # The prefix may tokenize differently at its boundary, so only reuse
+        # the tokens it shares with the full prompt. At least one token is
+        # left for the completion to evaluate so fresh logits are produced.
+        shared = 0
+        for a, b in zip(prefix_tokens, prompt_tokens):
+            if a != b:
+                break
+            shared += 1
+        shared = min(shared, len(prompt_tokens) - 1)
+        if shared <= 0:
+            return 0
+        prefix_tokens = list(prefix_tokens[:shared])
+
+        key = (model_key, agent_type, prefix)
+        with self._lock:
+            state = self._states.get(key)
+            if state is not None:
+                self._states.move_to_end(key)
+
+        if state is None:
+            llm.reset()
+            llm.eval(prefix_tokens)
+            state = SavedState.from_state(llm.save_state(), llm.n_vocab())
+            with self._lock:
+                self.misses += 1
+                self._store(key, state)
+            if verbose:
+                print(f"[DEBUG] Cached prompt prefix for '{agent_type}' ({shared} tokens).")
+            return 0
+
+        # Skip the state copy if the model still holds this prefix from the last call.
+        if list(llm.input_ids[:shared]) != prefix_tokens:
+            llm.load_state(state)
+
+        with self._lock:
+            self.hits += 1
+            self.tokens_skipped[agent_type] = self.tokens_skipped.get(agent_type, 0) + shared
+        if verbose:
+            print(f"[DEBUG] Reused prompt prefix for '{agent_type}', skipped {shared} tokens.")
+        return shared
+
+    def _store(self, key, state: SavedState):
+        # Called with the lock held
+        previous = self._states.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes
+        self._states[key] = state
+        self._bytes += state.nbytes
+        while self._states and (len(self._states) > self.max_states or self._bytes > self.max_bytes):
+            _, evicted = self._states.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """
+        Returns hit/miss/eviction counters, bytes held and prompt tokens skipped per agent.
+        """
+        with self._lock:
+            return {
+                "cached_states": len(self._states),
+                "cached_bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "tokens_skipped": dict(self.tokens_skipped),
+            }
+
+    def export_states(self) -> list:
+        """
+        Returns the saved states as (key, state) pairs, least recently used first.
+        """
+        with self._lock:
+            return list(self._states.items())
+
+    def import_states(self, items):
+        """
+        Adds (key, state) pairs from export_states(), e.g. from a run checkpoint.
+        """
+        with self._lock:
+            for key, state in items:
+                self._store(key, state)
+
+    def clear(self):
+        """
+        Drops every saved state, e.g. when the owning model is released.
+        """
+        with self._lock:
+            self._states.clear()
+            self._bytes = 0
+
+
+_prefix_cache = None
+_prefix_cache_lock = threading.Lock()
+
+
+def get_prefix_cache() -> PromptPrefixCache:
+    """
+    Returns the process-wide PromptPrefixCache, creating it on first use.
+    """
+    global _prefix_cache
+    with _prefix_cache_lock:
+        if _prefix_cache is None:
+            _prefix_cache = PromptPrefixCache()
+        return _prefix_cache
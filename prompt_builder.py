@@ -0,0 +1,200 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from memory_text import approx_token_count
+from model_engine import get_engine, DEFAULT_N_CTX
+from run_log import log_event
+
+logger = logging.getLogger(__name__)
+
+# Room for BOS and for sections tokenizing slightly differently once joined
+DEFAULT_SAFETY_MARGIN = 8
+DEFAULT_TEMPLATE_CACHE_SIZE = 256
+TRUNCATION_MARKER = "\n[...]\n"
+
+TRIM_TAIL = "tail"      # keep the start of the text
+TRIM_LINES = "lines"    # drop whole lines from the end (task lists, memory entries)
+TRIM_MIDDLE = "middle"  # keep the start and the end, e.g. a file read by FILE#read
+
+
+class PromptSection:
+    """
+    One piece of a prompt.
+
+    Sections with 'trim' set to None are required and never shortened. Other
+    sections are trimmed when the prompt does not fit, lowest 'priority'
+    first. 'fixed' marks template text whose token count is cached.
+    """
+
+    def __init__(self, text: str, priority=0, trim=None, fixed=False):
+        self.text = text
+        self.priority = priority
+        self.trim = trim
+        self.fixed = fixed
+
+
+class PromptBuilder:
+    """
+    Assembles agent prompts that fit into the model context.
+
+    Tokens are counted with the model's own tokenizer (a vocab-only instance
+    from the ModelEngine), falling back to a character estimate if it cannot be
+    loaded. The budget is n_ctx minus the completion's 'max_tokens' and a small
+    safety margin. Counts of fixed template sections are cached.
+    """
+
+    def __init__(self, model_path: str, n_ctx=DEFAULT_N_CTX, safety_margin=DEFAULT_SAFETY_MARGIN,
+                 template_cache_size=DEFAULT_TEMPLATE_CACHE_SIZE, debug_mode=False):
+        self.model_path = model_path
+        self.n_ctx = n_ctx
+        self.safety_margin = safety_margin
+        self.template_cache_size = template_cache_size
+        self.debug_mode = debug_mode
+        self._tokenizer = None
+        self._tokenizer_failed = False
+        self._template_counts = OrderedDict()
+        self._lock = threading.Lock()
+        self.prompts_built = 0
+        self.prompts_trimmed = 0
+        self.tokens_dropped = 0
+
+    def _get_tokenizer(self):
+        if self._tokenizer is None and not self._tokenizer_failed:
+            try:
+                self._tokenizer = get_engine().get_tokenizer(self.model_path)
+            except Exception as e:
+                self._tokenizer_failed = True
+                logger.warning("No tokenizer for %s, estimating prompt tokens: %s", self.model_path, e)
+        return self._tokenizer
+
+    def _tokenize(self, text: str) -> list:
+        return self._get_tokenizer().tokenize(text.encode("utf-8"), add_bos=False, special=False)
+
+    def count(self, text: str) -> int:
+        """
+        Returns the number of tokens in 'text'.
+        """
+        if not text:
+            return 0
+        if self._get_tokenizer() is None:
+            return approx_token_count(text)
+        return len(self._tokenize(text))
+
+    def _count_section(self, section: PromptSection) -> int:
+        if not section.fixed:
+            return self.count(section.text)
+        with self._lock:
+            n_tokens = self._template_counts.get(section.text)
+            if n_tokens is not None:
+                self._template_counts.move_to_end(section.text)
+                return n_tokens
+        n_tokens = self.count(section.text)
+        with self._lock:
+            self._template_counts[section.text] = n_tokens
+            while len(self._template_counts) > self.template_cache_size:
+                self._template_counts.popitem(last=False)
+        return n_tokens
+
+    def _truncate(self, text: str, n_tokens: int, from_middle=False) -> str:
+        """
+        Returns 'text' cut to about 'n_tokens' tokens.
+        """
+        if n_tokens <= 0:
+            return ""
+        tokenizer = self._get_tokenizer()
+        if tokenizer is None:
+            keep = n_tokens * 4
+            if from_middle:
+                return text[:keep // 2] + TRUNCATION_MARKER + text[-(keep - keep // 2):]
+            return text[:keep]
+        tokens = self._tokenize(text)
+        if from_middle:
+            head = n_tokens // 2
+            tail = n_tokens - head
+            return (
+                tokenizer.detokenize(tokens[:head]).decode("utf-8", errors="ignore") + TRUNCATION_MARKER +
+                tokenizer.detokenize(tokens[-tail:]).decode("utf-8", errors="ignore")
+            )
+        return tokenizer.detokenize(tokens[:n_tokens]).decode("utf-8", errors="ignore")
+
+    def _trim(self, section: PromptSection, n_tokens: int, excess: int) -> str:
+        target = n_tokens - excess
+        if section.trim == TRIM_LINES:
+            lines = section.text.splitlines(keepends=True)
+            line_counts = [self.count(line) for line in lines]
+            used = sum(line_counts)
+            while lines and used > target:
+                lines.pop()
+                used -= line_counts.pop()
+            return "".join(lines)
+        if section.trim == TRIM_MIDDLE:
+            return self._truncate(section.text, target - self.count(TRUNCATION_MARKER), from_middle=True)
+        return self._truncate(section.text, target)
+
+    def build(self, sections, max_tokens: int, agent_type=None) -> str:
+        """
+        Joins 'sections' into a prompt that leaves room for 'max_tokens' of output.
+        Optional sections are trimmed lowest priority first until the prompt fits;
+        the number of tokens dropped is logged.
+        """
+        budget = self.n_ctx - max_tokens - self.safety_margin
+        texts = [section.text for section in sections]
+        counts = [self._count_section(section) for section in sections]
+        total = sum(counts)
+        original_total = total
+
+        trimmable = sorted(
+            (i for i, section in enumerate(sections) if section.trim is not None and counts[i]),
+            key=lambda i: sections[i].priority,
+        )
+        for i in trimmable:
+            if total <= budget:
+                break
+            texts[i] = self._trim(sections[i], counts[i], total - budget)
+            new_count = self.count(texts[i])
+            total -= counts[i] - new_count
+            counts[i] = new_count
+
+        dropped = original_total - total
+        with self._lock:
+            self.prompts_built += 1
+            if dropped > 0:
+                self.prompts_trimmed += 1
+                self.tokens_dropped += dropped
+        if dropped > 0:
+            logger.info("Trimmed %d prompt token(s) for %s to fit n_ctx=%d.", dropped, agent_type, self.n_ctx)
+            log_event("prompt_trim", agent=agent_type, tokens_dropped=dropped, prompt_tokens=total)
+            if self.debug_mode:
+                print(f"[DEBUG] Dropped {dropped} prompt token(s) for '{agent_type}' to fit the context.")
+        if total > budget:
+            logger.warning(
+                "Required prompt sections for %s need %d token(s), over the budget of %d.", agent_type, total, budget
+            )
+        return "".join(texts)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "prompts_built": self.prompts_built,
+                "prompts_trimmed": self.prompts_trimmed,
+                "tokens_dropped": self.tokens_dropped,
+                "cached_templates": len(self._template_counts),
+            }
+
+
+_builders = {}
+_builders_lock = threading.Lock()
+
+
+def get_prompt_builder(model_path: str, n_ctx=DEFAULT_N_CTX, debug_mode=False) -> PromptBuilder:
+    """
+    Returns the shared PromptBuilder for (model_path, n_ctx), so every agent
+    uses the same tokenizer, template cache and counters.
+    """
+    with _builders_lock:
+        builder = _builders.get((model_path, n_ctx))
+        if builder is None:
+            builder = PromptBuilder(model_path, n_ctx, debug_mode=debug_mode)
+            _builders[(model_path, n_ctx)] = builder
+        return builder
@@ -0,0 +1,238 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_DIR = "inference_cache"
+DEFAULT_CACHED_AGENTS = ("GoalEvaluationAgent", "TaskCreationAgent", "TaskPrioritizationAgent")
+DEFAULT_MAX_MEMORY_ENTRIES = 256
+DEFAULT_MAX_DISK_ENTRIES = 4096
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+STATS_LOG_INTERVAL = 50
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Memoizes model completions for agents whose sampling is (near) deterministic.
+
+    Lookups go through an in-memory LRU first and then an on-disk tier of one JSON
+    file per entry, so answers survive restarts. Entries expire after
+    'ttl_seconds'; each tier evicts its oldest entries past its size limit.
+    Only agent types listed in 'enabled_agents' are cached.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, enabled_agents=DEFAULT_CACHED_AGENTS,
+                 max_memory_entries=DEFAULT_MAX_MEMORY_ENTRIES, max_disk_entries=DEFAULT_MAX_DISK_ENTRIES,
+                 ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.cache_dir = cache_dir
+        self.enabled_agents = set(enabled_agents or ())
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_entries = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def is_enabled_for(self, agent_type) -> bool:
+        return agent_type in self.enabled_agents
+
+    @staticmethod
+    def model_identity(model_path: str) -> str:
+        """
+        Identifies a model file by its absolute path, size and modification time.
+        """
+        try:
+            st = os.stat(model_path)
+            return f"{os.path.abspath(model_path)}|{st.st_size}|{st.st_mtime_ns}"
+        except OSError:
+            return os.path.abspath(model_path)
+
+    def make_key(self, model_path: str, agent_type, prompt: str, params: dict, max_tokens: int) -> str:
+        """
+        Builds the cache key from everything that determines the completion.
+        """
+        payload = json.dumps(
+            {
+                "model": self.model_identity(model_path),
+                "agent_type": agent_type,
+                "prompt": prompt,
+                "params": params,
+                "max_tokens": max_tokens,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str):
+        """
+        Returns the cached text for 'key', or None on a miss or expired entry.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, text = entry
+                if now - created <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    self._maybe_log_stats()
+                    return text
+                del self._memory[key]
+
+        text = self._read_disk(key, now)
+
+        with self._lock:
+            if text is None:
+                self.misses += 1
+            else:
+                self.disk_hits += 1
+                self._remember(key, now, text)
+            self._maybe_log_stats()
+        return text
+
+    def put(self, key: str, text: str):
+        """
+        Stores 'text' under 'key' in both tiers.
+        """
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, text)
+            self.stores += 1
+        self._write_disk(key, now, text)
+
+    def _remember(self, key, created, text):
+        self._memory[key] = (created, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key, now):
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if now - entry.get("created", 0) > self.ttl_seconds:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry.get("text")
+
+    def _write_disk(self, key, created, text):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"created": created, "text": text}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Response cache write failed: %s", e)
+            return
+        with self._lock:
+            if self._disk_entries is None:
+                self._disk_entries = len(self._list_disk())
+            else:
+                self._disk_entries += 1
+            over_limit = self._disk_entries > self.max_disk_entries
+        if over_limit:
+            self._evict_disk()
+
+    def _list_disk(self):
+        try:
+            return [
+                os.path.join(self.cache_dir, name)
+                for name in os.listdir(self.cache_dir)
+                if name.endswith(".json")
+            ]
+        except OSError:
+            return []
+
+    def _evict_disk(self):
+        """
+        Removes expired files, then the oldest ones until the disk tier is back
+        to 90% of its limit so eviction does not run on every write.
+        """
+        now = time.time()
+        entries = []
+        for path in self._list_disk():
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if now - mtime > self.ttl_seconds:
+                self._remove(path)
+            else:
+                entries.append((mtime, path))
+        entries.sort()
+        target = int(self.max_disk_entries * 0.9)
+        while len(entries) > target:
+            _, path = entries.pop(0)
+            self._remove(path)
+        with self._lock:
+            self._disk_entries = len(entries)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "memory_entries": len(self._memory),
+            }
+
+    def _maybe_log_stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        if lookups % STATS_LOG_INTERVAL == 0:
+            logger.info(
+                "Response cache: %d memory hit(s), %d disk hit(s), %d miss(es) after %d lookup(s).",
+                self.memory_hits, self.disk_hits, self.misses, lookups,
+            )
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    Returns the process-wide ResponseCache, creating it with defaults on first use.
+    """
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
+
+
+def configure_response_cache(**kwargs) -> ResponseCache:
+    """
+    Replaces the process-wide ResponseCache with one built from 'kwargs'.
+    """
+    global _response_cache
+    with _response_cache_lock:
+        _response_cache = ResponseCache(**kwargs)
+        return _response_cache
@@ -0,0 +1,126 @@
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from log_writer import BackgroundLogWriter
+
+DEFAULT_RUN_LOG_FILE = "run_log.jsonl"
+
+
+class RunLogger:
+    """
+    Emits one JSON object per line for every event of a run.
+
+    Each record carries 'ts', 'run_id', 'iteration' and 'event', plus event
+    specific fields such as 'task', 'agent', 'latency' (seconds),
+    'prompt_tokens' and 'completion_tokens'. Lines go through a
+    BackgroundLogWriter with rotation disabled, because run_log_query.py
+    indexes records by byte offset. Events emitted inside task_context()
+    (for example inference calls made while executing a task on a worker
+    thread) get that task added automatically.
+
+    Loggers for concurrent runs in one process share the file through
+    'writer', so their lines never interleave mid-record.
+    """
+
+    def __init__(self, filename=DEFAULT_RUN_LOG_FILE, run_id=None, writer=None):
+        self.filename = filename
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.iteration = 0
+        self._owns_writer = writer is None
+        self.writer = writer if writer is not None else BackgroundLogWriter(filename, max_bytes=0)
+        self._context = threading.local()
+
+    def event(self, event_type: str, **fields):
+        record = {
+            "ts": round(time.time(), 6),
+            "run_id": self.run_id,
+            "iteration": self.iteration,
+            "event": event_type,
+        }
+        task = getattr(self._context, "task", None)
+        if task is not None:
+            record["task"] = task
+        record.update(fields)
+        self.writer.write(json.dumps(record, separators=(",", ":"), ensure_ascii=False))
+
+    @contextmanager
+    def task_context(self, task: str):
+        previous = getattr(self._context, "task", None)
+        self._context.task = task
+        try:
+            yield
+        finally:
+            self._context.task = previous
+
+    def for_run(self, run_id=None) -> "RunLogger":
+        """
+        Returns a logger for another run that writes through the same writer.
+        """
+        return RunLogger(self.filename, run_id, writer=self.writer)
+
+    def close(self):
+        if self._owns_writer:
+            self.writer.close()
+
+
+_run_logger = None
+_run_logger_lock = threading.Lock()
+_thread_logger = threading.local()
+
+
+def configure_run_log(filename=DEFAULT_RUN_LOG_FILE, run_id=None) -> RunLogger:
+    """
+    Starts structured logging for this process and returns the RunLogger.
+    """
+    global _run_logger
+    with _run_logger_lock:
+        if _run_logger is not None:
+            _run_logger.close()
+        _run_logger = RunLogger(filename, run_id)
+        return _run_logger
+
+
+def get_run_logger():
+    """
+    Returns the RunLogger of the current thread's run (see run_logger_context),
+    else the configured one, or None if structured logging is off.
+    """
+    return getattr(_thread_logger, "run_logger", None) or _run_logger
+
+
+@contextmanager
+def run_logger_context(run_logger: RunLogger):
+    """
+    Sends events recorded on this thread to 'run_logger' until the block exits.
+    """
+    previous = getattr(_thread_logger, "run_logger", None)
+    _thread_logger.run_logger = run_logger
+    try:
+        yield
+    finally:
+        _thread_logger.run_logger = previous
+
+
+def log_event(event_type: str, **fields):
+    """
+    Records an event if structured logging is configured; otherwise does nothing.
+    """
+    run_logger = get_run_logger()
+    if run_logger is not None:
+        run_logger.event(event_type, **fields)
+
+
+@contextmanager
+def task_context(task: str):
+    """
+    Tags events recorded on this thread with 'task' until the block exits.
+    """
+    run_logger = get_run_logger()
+    if run_logger is None:
+        yield
+        return
+    with run_logger.task_context(task):
+        yield
@@ -0,0 +1,288 @@
+import argparse
+import datetime
+import json
+import mmap
+import os
+import sys
+
+import numpy as np
+
+from run_log import DEFAULT_RUN_LOG_FILE
+
+# One fixed-size sidecar record per log line; strings are stored as slots into
+# the tables kept in '<log>.idx.json'.
+INDEX_DTYPE = np.dtype([
+    ("offset", "<u8"),
+    ("ts", "<f8"),
+    ("latency", "<f4"),
+    ("run", "<u4"),
+    ("event", "<u2"),
+    ("agent", "<u2"),
+])
+
+# '<log>.idx.order': the index positions sorted by run, then timestamp, with
+# those two keys alongside so run and time bounds are found by binary search.
+ORDER_DTYPE = np.dtype([
+    ("pos", "<u8"),
+    ("ts", "<f8"),
+    ("run", "<u4"),
+])
+
+SLOT_TABLES = ("runs", "events", "agents")
+
+
+class RunLogIndex:
+    """
+    Sidecar offset index for a JSONL run log.
+
+    '<log>.idx' holds one INDEX_DTYPE record (byte offset, timestamp, latency,
+    run/event/agent slots) per log line, and '<log>.idx.json' the string tables
+    and how far the log has been indexed. update() only parses lines appended
+    since the last call. '<log>.idx.order' sorts the records by run and then
+    timestamp and is rebuilt lazily once new records exist, so run and time
+    filters narrow the candidates by binary search; the remaining filters are
+    applied with NumPy to those candidates only. Matching lines are then read
+    from the memory-mapped log.
+    """
+
+    def __init__(self, log_path: str):
+        self.log_path = log_path
+        self.index_path = log_path + ".idx"
+        self.meta_path = log_path + ".idx.json"
+        self.order_path = log_path + ".idx.order"
+        self._set_meta(self._load_meta())
+
+    def _set_meta(self, meta):
+        self.meta = meta
+        # value -> slot for each string table, so indexing a record is O(1)
+        self._slots = {table: {value: slot for slot, value in enumerate(meta[table])} for table in SLOT_TABLES}
+
+    def _empty_meta(self):
+        return {"indexed_bytes": 0, "records": 0, "runs": [], "events": [], "agents": [""]}
+
+    def _load_meta(self):
+        if not os.path.exists(self.meta_path):
+            return self._empty_meta()
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return self._empty_meta()
+        # Drop index records written after the last saved metadata (interrupted update)
+        expected = meta["records"] * INDEX_DTYPE.itemsize
+        if os.path.exists(self.index_path) and os.path.getsize(self.index_path) > expected:
+            with open(self.index_path, "r+b") as f:
+                f.truncate(expected)
+        return meta
+
+    def _save_meta(self):
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def reset(self):
+        self._set_meta(self._empty_meta())
+        for path in (self.index_path, self.meta_path, self.order_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _slot(self, table: str, value) -> int:
+        value = "" if value is None else str(value)
+        slots = self._slots[table]
+        slot = slots.get(value)
+        if slot is None:
+            slot = slots[value] = len(self.meta[table])
+            self.meta[table].append(value)
+        return slot
+
+    def update(self) -> int:
+        """
+        Indexes lines appended since the last update. Returns how many were added.
+        """
+        if not os.path.exists(self.log_path):
+            return 0
+        size = os.path.getsize(self.log_path)
+        if size < self.meta["indexed_bytes"]:
+            self.reset()  # the log was truncated or replaced
+        start = self.meta["indexed_bytes"]
+        if size == start:
+            return 0
+
+        rows = []
+        with open(self.log_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = start
+            while pos < size:
+                end = mm.find(b"\n", pos)
+                if end == -1:
+                    break  # partial last line; index it once it is complete
+                line = mm[pos:end]
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        record = None
+                    if isinstance(record, dict):
+                        rows.append((
+                            pos,
+                            float(record.get("ts") or 0.0),
+                            float(record.get("latency") or 0.0),
+                            self._slot("runs", record.get("run_id")),
+                            self._slot("events", record.get("event")),
+                            self._slot("agents", record.get("agent")),
+                        ))
+                pos = end + 1
+
+        if rows:
+            with open(self.index_path, "ab") as f:
+                np.array(rows, dtype=INDEX_DTYPE).tofile(f)
+        self.meta["indexed_bytes"] = pos
+        self.meta["records"] += len(rows)
+        self._save_meta()
+        return len(rows)
+
+    def _records(self):
+        if not self.meta["records"]:
+            return np.zeros(0, dtype=INDEX_DTYPE)
+        return np.memmap(self.index_path, dtype=INDEX_DTYPE, mode="r", shape=(self.meta["records"],))
+
+    def _order(self, records):
+        """
+        Returns the run-then-timestamp ordering of 'records', rebuilding
+        '<log>.idx.order' if records were indexed since it was written.
+        """
+        count = len(records)
+        if (self.meta.get("ordered_records") == count and os.path.exists(self.order_path)
+                and os.path.getsize(self.order_path) == count * ORDER_DTYPE.itemsize):
+            return np.memmap(self.order_path, dtype=ORDER_DTYPE, mode="r", shape=(count,))
+        positions = np.lexsort((records["ts"], records["run"]))
+        order = np.empty(count, dtype=ORDER_DTYPE)
+        order["pos"] = positions
+        order["ts"] = records["ts"][positions]
+        order["run"] = records["run"][positions]
+        tmp_path = self.order_path + ".tmp"
+        order.tofile(tmp_path)
+        os.replace(tmp_path, self.order_path)
+        self.meta["ordered_records"] = count
+        self._save_meta()
+        return order
+
+    def _run_ranges(self, order) -> np.ndarray:
+        # ranges[slot]..ranges[slot + 1] is the run's block in 'order'
+        return np.searchsorted(order["run"], np.arange(len(self.meta["runs"]) + 1))
+
+    def runs(self) -> list:
+        """
+        Returns (run_id, records, first_ts, last_ts) for every indexed run.
+        """
+        records = self._records()
+        if not len(records):
+            return []
+        order = self._order(records)
+        ranges = self._run_ranges(order)
+        out = []
+        for slot, run_id in enumerate(self.meta["runs"]):
+            lo, hi = int(ranges[slot]), int(ranges[slot + 1])
+            if hi > lo:
+                out.append((run_id, hi - lo, float(order["ts"][lo]), float(order["ts"][hi - 1])))
+        return out
+
+    def _candidates(self, records, run_slot, since, until) -> np.ndarray:
+        """
+        Returns the positions, in log order, of the records within the run and
+        time bounds, found by binary search in the run-then-timestamp order.
+        """
+        order = self._order(records)
+        ranges = self._run_ranges(order)
+        slots = [run_slot] if run_slot is not None else range(len(self.meta["runs"]))
+        parts = []
+        for slot in slots:
+            lo, hi = int(ranges[slot]), int(ranges[slot + 1])
+            ts = order["ts"][lo:hi]
+            start = lo + (int(np.searchsorted(ts, since, "left")) if since is not None else 0)
+            end = lo + (int(np.searchsorted(ts, until, "right")) if until is not None else hi - lo)
+            if end > start:
+                parts.append(order["pos"][start:end])
+        if not parts:
+            return np.zeros(0, dtype=np.uint64)
+        return np.sort(np.concatenate(parts))
+
+    def query(self, run_id=None, event=None, agent=None, min_latency=None, since=None, until=None, limit=None):
+        """
+        Yields the raw JSON lines matching every given filter, in log order.
+        """
+        records = self._records()
+        if not len(records):
+            return
+        slots = {}
+        for table, value in (("runs", run_id), ("events", event), ("agents", agent)):
+            if value is not None:
+                if value not in self._slots[table]:
+                    return
+                slots[table] = self._slots[table][value]
+
+        if run_id is not None or since is not None or until is not None:
+            records = records[self._candidates(records, slots.get("runs"), since, until)]
+        mask = np.ones(len(records), dtype=bool)
+        if "events" in slots:
+            mask &= records["event"] == slots["events"]
+        if "agents" in slots:
+            mask &= records["agent"] == slots["agents"]
+        if min_latency is not None:
+            mask &= records["latency"] >= min_latency
+
+        offsets = records["offset"][mask]
+        if limit is not None:
+            offsets = offsets[:limit]
+        with open(self.log_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for offset in offsets:
+                end = mm.find(b"\n", int(offset))
+                yield mm[int(offset):end].decode("utf-8")
+
+
+def parse_time(value: str) -> float:
+    """
+    Accepts epoch seconds or an ISO timestamp such as 2026-01-31T12:00:00.
+    """
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the structured JSONL run log through a sidecar offset index.")
+    parser.add_argument("--log", default=DEFAULT_RUN_LOG_FILE, help="Run log to query.")
+    parser.add_argument("--run", help="Only records of this run id.")
+    parser.add_argument("--event", help="Only records of this event type, e.g. 'inference'.")
+    parser.add_argument("--agent", help="Only records of this agent, e.g. 'ExecutionAgent'.")
+    parser.add_argument("--min_latency", type=float, help="Only records with latency of at least this many seconds.")
+    parser.add_argument("--since", type=parse_time, help="Only records at or after this time.")
+    parser.add_argument("--until", type=parse_time, help="Only records at or before this time.")
+    parser.add_argument("--limit", type=int, help="Stop after this many records.")
+    parser.add_argument("--list_runs", action="store_true", help="List indexed runs instead of records.")
+    parser.add_argument("--reindex", action="store_true", help="Rebuild the sidecar index from scratch.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.log):
+        print(f"Run log not found: {args.log}", file=sys.stderr)
+        sys.exit(1)
+
+    index = RunLogIndex(args.log)
+    if args.reindex:
+        index.reset()
+    index.update()
+
+    if args.list_runs:
+        for run_id, count, first_ts, last_ts in index.runs():
+            first = datetime.datetime.fromtimestamp(first_ts).strftime("%Y-%m-%d %H:%M:%S")
+            last = datetime.datetime.fromtimestamp(last_ts).strftime("%Y-%m-%d %H:%M:%S")
+            print(f"{run_id}  {count} record(s)  {first} .. {last}")
+        return
+
+    for line in index.query(args.run, args.event, args.agent, args.min_latency, args.since, args.until, args.limit):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,75 @@
-from llama_cpp import Llama
+import threading
+import time
+from contextlib import nullcontext
 
-def run_model_inference(model_path: str, prompt: str, max_tokens=128, agent_type=None, verbose=False):
+from fair_scheduler import get_scheduler
+from grammars import get_grammar_cache
+from inference_backend import get_backend
+from metrics import get_metrics
+from response_cache import get_response_cache
+from run_log import log_event
+from sessions import current_session
+from speculative import get_speculative_config, CountingDrafter, record as record_speculative
+
+# Streamed generation is on by default; configure_streaming(False) restores
+# full completions (parsers then see the whole text at once) for comparison.
+_streaming = True
+_generation_stats = {}
+_generation_stats_lock = threading.Lock()
+
+def configure_streaming(enabled: bool):
+    global _streaming
+    _streaming = enabled
+
+def _record_generation(agent_type, tokens, seconds, first_output, stopped_early):
+    with _generation_stats_lock:
+        stats = _generation_stats.setdefault(agent_type or "Unknown", {
+            "calls": 0, "tokens": 0, "seconds": 0.0, "first_output_time": 0.0, "early_stops": 0,
+        })
+        stats["calls"] += 1
+        stats["tokens"] += tokens or 0
+        stats["seconds"] += seconds
+        stats["first_output_time"] += first_output
+        stats["early_stops"] += int(stopped_early)
+
+def generation_stats() -> dict:
+    """
+    Returns per-agent model calls, tokens generated per call, tokens/s, mean time
+    to the first useful output in seconds and the number of early stops.
+    """
+    with _generation_stats_lock:
+        return {
+            agent: {
+                "calls": s["calls"],
+                "tokens_per_call": s["tokens"] / s["calls"],
+                "tokens_per_second": s["tokens"] / s["seconds"] if s["seconds"] else 0.0,
+                "avg_first_output": s["first_output_time"] / s["calls"],
+                "early_stops": s["early_stops"],
+            }
+            for agent, s in _generation_stats.items()
+        }
+
+def run_model_inference(model_path: str, prompt: str, max_tokens=128, agent_type=None, verbose=False, prompt_prefix=None,
+                        stream_parser=None, grammar=None, speculative=None):
     """
     Runs inference using the specified Llama model. Adjusts parameters based on agent_type.
+    The completion comes from the process-wide inference backend (see
+    inference_backend.configure_backend): in-process llama_cpp, where the model is
+    only loaded once, or an OpenAI-compatible server.
+    If 'prompt_prefix' is given and starts 'prompt', its saved KV state is reused so
+    only the rest of the prompt is evaluated.
+    Agent types enabled in the ResponseCache are answered from it when the same
+    model, prompt and sampling parameters were seen before.
+    With a 'stream_parser' the completion is streamed into it and generation stops
+    as soon as the parser has its answer; cached or non-streamed text is fed to it
+    in one piece.
+    'grammar' is GBNF text constraining the output; it is only applied while
+    grammars are enabled (see grammars.configure_grammars).
+    'speculative' is a SpeculativeConfig; by default the one configured for
+    'agent_type' is used, if any. Backends without speculative support ignore it.
+    When a FairScheduler is configured (daemon mode), the completion waits for a
+    model slot in turn with the other sessions.
+    Every call is recorded as an 'inference' event in the structured run log.
     Returns the text from the first choice, or an empty string if none is found.
     """
     # Default parameters
@@ -32,31 +99,111 @@ def run_model_inference(model_path: str, prompt: str, max_tokens=128, agent_type
         top_p = 0.5
         top_k = 10
 
-    llm = Llama(
-        model_path=model_path,
-        n_gpu_layers=30,
-        gpu_layers_size_mb=512,
-        verbose=verbose,
-        n_ctx=2048
-    )
-
     stop_seq = ["\n"] if agent_type in ["GoalEvaluationAgent", "ExecutionAgent"] else None
 
+    start_time = time.perf_counter()
+    metrics = get_metrics()
+    if not get_grammar_cache().enabled:
+        grammar = None
+    backend = get_backend()
+    response_cache = get_response_cache()
+    cache_key = None
+    if response_cache.is_enabled_for(agent_type):
+        params = {"temperature": temperature, "top_p": top_p, "top_k": top_k, "stop": stop_seq}
+        if grammar:
+            params["grammar"] = grammar
+        cache_key = response_cache.make_key(model_path, agent_type, prompt, params, max_tokens)
+        cached = response_cache.get(cache_key)
+        metrics.inc("inference_cache_total", agent=agent_type, cache="response", result="miss" if cached is None else "hit")
+        if cached is not None:
+            if verbose:
+                print(f"[DEBUG] Response cache hit for '{agent_type}': {cached}")
+            if stream_parser is not None:
+                stream_parser.feed(cached)
+                stream_parser.finish()
+            latency = time.perf_counter() - start_time
+            metrics.observe("inference_seconds", latency, agent=agent_type)
+            log_event("inference", agent=agent_type, latency=round(latency, 6), cached=True)
+            return cached
+
     if verbose:
         print(f"[DEBUG] Running inference for '{agent_type or 'Unknown'}' with prompt length={len(prompt)}")
 
-    response = llm(
-        prompt,
-        max_tokens=max_tokens,
-        temperature=temperature,
-        top_p=top_p,
-        top_k=top_k,
-        stop=stop_seq
-    )
+    drafter = None
+    if backend.supports_speculative:
+        if speculative is None:
+            speculative = get_speculative_config(agent_type)
+        if speculative is not None:
+            drafter = CountingDrafter(speculative.drafter())
+
+    params = dict(max_tokens=max_tokens, temperature=temperature, top_p=top_p, top_k=top_k, stop=stop_seq)
+    streaming = stream_parser is not None and _streaming
+    session = current_session()
+    scheduler = get_scheduler()
+    slot = scheduler.slot(session.session_id if session is not None else None) if scheduler is not None else nullcontext()
+    with slot:
+        generation_start = time.perf_counter()
+        completion = backend.complete(
+            model_path, prompt, params, agent_type=agent_type, stream_parser=stream_parser if streaming else None,
+            prompt_prefix=prompt_prefix, grammar=grammar, drafter=drafter, verbose=verbose,
+        )
+        generation_time = time.perf_counter() - generation_start
+    text = completion.text
+    completion_tokens = completion.completion_tokens
+    first_output, stopped_early = completion.first_output, completion.stopped_early
+    if stream_parser is not None and not streaming:
+        stream_parser.feed(text)
+
+    if stream_parser is not None:
+        stream_parser.finish()
+    latency = time.perf_counter() - start_time
+    first_output = latency if first_output is None else first_output - start_time
 
-    text = response["choices"][0]["text"].strip() if response.get("choices") else ""
+    text = text.strip()
     if verbose:
         print(f"[DEBUG] Model response: {text}")
+        if stopped_early:
+            print(f"[DEBUG] Stopped '{agent_type}' generation early after {completion_tokens} token(s).")
 
-    del llm
+    if cache_key is not None:
+        response_cache.put(cache_key, text)
+
+    _record_generation(agent_type, completion_tokens, generation_time, first_output, stopped_early)
+    if session is not None:
+        session.add_generation(completion_tokens)
+    metrics.observe("inference_seconds", latency, agent=agent_type)
+    if completion.prompt_tokens is not None:
+        metrics.observe("inference_prompt_tokens", completion.prompt_tokens, agent=agent_type)
+    if completion_tokens:
+        metrics.observe("inference_generated_tokens", completion_tokens, agent=agent_type)
+        if generation_time > 0:
+            metrics.observe("inference_tokens_per_second", completion_tokens / generation_time, agent=agent_type)
+    if drafter is not None:
+        record_speculative(agent_type, drafter, completion_tokens, generation_time)
+        if verbose:
+            print(f"[DEBUG] Speculative decoding for '{agent_type}': {drafter.drafted} token(s) drafted "
+                  f"in {drafter.rounds} round(s), {completion_tokens} generated.")
+    log_event(
+        "inference",
+        agent=agent_type,
+        latency=round(latency, 6),
+        first_output_latency=round(first_output, 6),
+        prompt_tokens=completion.prompt_tokens,
+        completion_tokens=completion_tokens,
+        stopped_early=stopped_early,
+        cached=False,
+    )
     return text
+
+
+def run_embedding(model_path: str, text: str, verbose=False) -> list:
+    """
+    Returns the embedding vector of 'text' from the inference backend; in-process
+    this is an embedding-mode instance of the model.
+    Per-token embeddings (models without pooling) are mean-pooled into one vector.
+    """
+    vector = get_backend().embed(model_path, text, verbose=verbose)
+    if vector and isinstance(vector[0], list):
+        dims = len(vector[0])
+        vector = [sum(row[i] for row in vector) / len(vector) for i in range(dims)]
+    return vector
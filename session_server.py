@@ -0,0 +1,202 @@
+import argparse
+import json
+import logging
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from sessions import Session, session_context, QUEUED, RUNNING, DONE, FAILED
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_SESSIONS = 4
+DEFAULT_SESSIONS_DIR = "sessions"
+
+
+class SessionServer:
+    """
+    Daemon that runs objectives submitted over a local socket, each as its own
+    Session on a thread of its own, against the model already resident in
+    this process.
+
+    The protocol is one JSON object per line in each direction. Commands:
+    submit {objective}, status {session?}, input {session, line},
+    stop {session}, stats, shutdown. At most 'max_sessions' objectives run at
+    once; later ones stay queued until a running one ends. 'run_session' is
+    called with the Session and returns the number of tasks completed.
+    """
+
+    def __init__(self, run_session, host=DEFAULT_HOST, port=DEFAULT_PORT, max_sessions=DEFAULT_MAX_SESSIONS,
+                 sessions_dir=DEFAULT_SESSIONS_DIR, run_logger=None, stats=None):
+        self.run_session = run_session
+        self.sessions_dir = sessions_dir
+        self.run_logger = run_logger
+        self.extra_stats = stats
+        self.sessions = {}
+        self._threads = []
+        self._lock = threading.Lock()
+        self._running = threading.BoundedSemaphore(max(1, max_sessions))
+        self.started = time.time()
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    try:
+                        reply = server.handle_command(json.loads(line))
+                    except (ValueError, KeyError) as e:
+                        reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                    self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+                    if reply.get("shutdown"):
+                        threading.Thread(target=server.server.shutdown, daemon=True).start()
+                        return
+
+        class Server(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        self.server = Server((host, port), Handler)
+        self.address = self.server.server_address
+
+    def submit(self, objective: str) -> Session:
+        session = Session.create(objective, self.sessions_dir)
+        if self.run_logger is not None:
+            # The session id doubles as the run id, so run_log_query.py --run selects one session
+            session.run_logger = self.run_logger.for_run(session.session_id)
+        thread = threading.Thread(target=self._run, args=(session,), name=f"session-{session.session_id}", daemon=True)
+        with self._lock:
+            self.sessions[session.session_id] = session
+            self._threads.append(thread)
+        thread.start()
+        logger.info("Session %s queued: %s", session.session_id, objective)
+        return session
+
+    def _run(self, session: Session):
+        with self._running:
+            session.state = RUNNING
+            session.started = time.time()
+            try:
+                with session_context(session):
+                    session.tasks_completed = self.run_session(session) or 0
+                session.state = DONE
+            except Exception as e:
+                session.state = FAILED
+                session.error = str(e)
+                logger.exception("Session %s failed", session.session_id)
+            finally:
+                session.finished = time.time()
+
+    def _session(self, command: dict) -> Session:
+        with self._lock:
+            session = self.sessions.get(command["session"])
+        if session is None:
+            raise KeyError(f"unknown session {command['session']}")
+        return session
+
+    def handle_command(self, command: dict) -> dict:
+        cmd = command.get("cmd")
+        if cmd == "submit":
+            objective = command["objective"].strip()
+            if not objective:
+                raise ValueError("empty objective")
+            return {"ok": True, "session": self.submit(objective).session_id}
+        if cmd == "status":
+            if command.get("session"):
+                return {"ok": True, "sessions": [self._session(command).to_dict()]}
+            with self._lock:
+                sessions = list(self.sessions.values())
+            return {"ok": True, "sessions": [s.to_dict() for s in sessions]}
+        if cmd == "input":
+            self._session(command).input_queue.put(command["line"])
+            return {"ok": True}
+        if cmd == "stop":
+            self._session(command).stop()
+            return {"ok": True}
+        if cmd == "stats":
+            return {"ok": True, "stats": self.stats()}
+        if cmd == "shutdown":
+            return {"ok": True, "shutdown": True}
+        raise ValueError(f"unknown command {cmd!r}")
+
+    def stats(self) -> dict:
+        """
+        Returns session counts by state and the aggregate generation rate since
+        the server started, plus whatever the 'stats' callable adds.
+        """
+        with self._lock:
+            sessions = list(self.sessions.values())
+        uptime = time.time() - self.started
+        tokens = sum(s.tokens_generated for s in sessions)
+        out = {
+            "uptime": uptime,
+            "sessions": {state: sum(s.state == state for s in sessions) for state in (QUEUED, RUNNING, DONE, FAILED)},
+            "tokens_generated": tokens,
+            "tokens_per_second": tokens / uptime if uptime else 0.0,
+        }
+        if self.extra_stats is not None:
+            out.update(self.extra_stats())
+        return out
+
+    def serve_forever(self):
+        """
+        Handles commands until shutdown, then stops the sessions still queued
+        or running and waits for them to end.
+        """
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            with self._lock:
+                sessions = list(self.sessions.values())
+                threads = list(self._threads)
+            for session in sessions:
+                if session.state in (QUEUED, RUNNING):
+                    session.stop()
+            for thread in threads:
+                thread.join()
+
+
+def send_command(command: dict, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=10.0) -> dict:
+    """
+    Sends one command to a running SessionServer and returns its reply.
+    """
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall(json.dumps(command).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as reply:
+            return json.loads(reply.readline())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Talks to a main.py --daemon session server.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("submit", help="Start a session for an objective.").add_argument("objective")
+    sub.add_parser("status", help="Show all sessions or one.").add_argument("session", nargs="?")
+    input_parser = sub.add_parser("input", help="Send a user input line to a session.")
+    input_parser.add_argument("session")
+    input_parser.add_argument("line")
+    sub.add_parser("stop", help="Stop a session.").add_argument("session")
+    sub.add_parser("stats", help="Show server throughput and scheduling stats.")
+    sub.add_parser("shutdown", help="Stop the server.")
+    args = parser.parse_args()
+
+    command = {k: v for k, v in vars(args).items() if k not in ("host", "port") and v is not None}
+    try:
+        reply = send_command(command, args.host, args.port)
+    except OSError as e:
+        print(f"Could not reach the session server at {args.host}:{args.port}: {e}")
+        sys.exit(1)
+    print(json.dumps(reply, indent=2))
+    if not reply.get("ok"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
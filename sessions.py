@@ -0,0 +1,120 @@
+import functools
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from run_log import run_logger_context
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Session:
+    """
+    State of one objective's main_loop.
+
+    Short- and long-term memory and the files LocalHandlerAgent creates live in
+    'workdir', user input arrives on 'input_queue', and structured events go to
+    'run_logger' when one is given. Work done on other threads for the session
+    (task workers, background stages) is wrapped with bind() so model calls and
+    log lines are attributed to it.
+    """
+
+    def __init__(self, objective: str, workdir=".", session_id=None, input_queue=None, run_logger=None):
+        self.objective = objective
+        self.workdir = workdir
+        self.session_id = session_id
+        self.input_queue = input_queue if input_queue is not None else queue.Queue()
+        self.run_logger = run_logger
+        self.state = QUEUED
+        self.error = None
+        self.tasks_completed = 0
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._tokens_lock = threading.Lock()
+        self.model_calls = 0
+        self.tokens_generated = 0
+
+    @classmethod
+    def create(cls, objective: str, sessions_dir: str) -> "Session":
+        """
+        Returns a session with a new id and its own directory under 'sessions_dir'.
+        """
+        session_id = uuid.uuid4().hex[:8]
+        workdir = os.path.join(sessions_dir, session_id)
+        os.makedirs(workdir, exist_ok=True)
+        return cls(objective, workdir, session_id)
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.workdir, filename)
+
+    def add_generation(self, tokens):
+        with self._tokens_lock:
+            self.model_calls += 1
+            self.tokens_generated += tokens or 0
+
+    def bind(self, func):
+        """
+        Returns 'func' wrapped to run inside this session's context on any thread.
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with session_context(self):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def stop(self):
+        """
+        Asks main_loop to stop at its next iteration, as typing 'quit' does.
+        """
+        self.input_queue.put("quit")
+
+    def to_dict(self) -> dict:
+        end = self.finished or time.time()
+        elapsed = end - self.started if self.started else 0.0
+        return {
+            "session": self.session_id,
+            "objective": self.objective,
+            "state": self.state,
+            "error": self.error,
+            "workdir": self.workdir,
+            "tasks_completed": self.tasks_completed,
+            "model_calls": self.model_calls,
+            "tokens_generated": self.tokens_generated,
+            "tokens_per_second": self.tokens_generated / elapsed if elapsed else 0.0,
+            "elapsed": elapsed,
+        }
+
+
+_context = threading.local()
+
+
+def current_session():
+    """
+    Returns the Session the current thread is working for, or None.
+    """
+    return getattr(_context, "session", None)
+
+
+@contextmanager
+def session_context(session: Session):
+    """
+    Attributes work on this thread to 'session' until the block exits, including
+    its structured run log events.
+    """
+    previous = getattr(_context, "session", None)
+    _context.session = session
+    try:
+        if session.run_logger is not None:
+            with run_logger_context(session.run_logger):
+                yield
+        else:
+            yield
+    finally:
+        _context.session = previous
@@ -0,0 +1,128 @@
+import os
+import threading
+
+USER_INPUT_PREFIX = "USERINPUT#"
+
+
+class ShortTermMemory:
+    """
+    In-memory view of short_term_memory.txt.
+
+    User inputs and tasks live in separate lists, so reading tasks no longer
+    re-parses the file or re-filters USERINPUT# lines. Changes only mark the
+    memory dirty; flush() writes it back (user inputs first, then tasks, one
+    per line, the same format as before) through a temp file and an atomic
+    rename. main_loop flushes at iteration boundaries and on exit.
+
+    With a 'task_store' (a SQLiteTaskQueue) the tasks are loaded from its
+    pending tasks instead of the file and add_tasks() enqueues new ones there
+    at once. The store is shared with other processes, so tasks are only ever
+    added to it, never rewritten; reload_tasks() picks up what other workers
+    added or claimed.
+    """
+
+    def __init__(self, filename="short_term_memory.txt", task_store=None):
+        self.filename = filename
+        self.task_store = task_store
+        self.user_inputs = []
+        self.tasks = []
+        self.dirty = False
+        self.flushes = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """
+        Reads the file, creating it if missing. Unflushed changes are discarded.
+        """
+        if not os.path.exists(self.filename):
+            with open(self.filename, "w", encoding="utf-8"):
+                pass
+        with open(self.filename, "r", encoding="utf-8") as f:
+            lines = [line.strip() for line in f if line.strip()]
+        stored_tasks = self.task_store.load_tasks() if self.task_store is not None else None
+        with self._lock:
+            self.user_inputs = [l for l in lines if l.startswith(USER_INPUT_PREFIX)]
+            if stored_tasks is not None:
+                self.tasks = stored_tasks
+            else:
+                self.tasks = [l for l in lines if not l.startswith(USER_INPUT_PREFIX)]
+            self.dirty = False
+
+    def read(self) -> str:
+        """
+        Returns the memory rendered exactly as it is written to the file.
+        """
+        with self._lock:
+            return self._render()
+
+    def _render(self) -> str:
+        return "".join(line + "\n" for line in self.user_inputs + self.tasks)
+
+    def get_tasks(self) -> list:
+        with self._lock:
+            return list(self.tasks)
+
+    def set_tasks(self, tasks_list):
+        """
+        Replaces the tasks while keeping the user inputs.
+        """
+        with self._lock:
+            self.tasks = [t.strip() for t in tasks_list if t.strip()]
+            self.dirty = True
+
+    def add_tasks(self, new_tasks):
+        new_tasks = [t.strip() for t in new_tasks if t.strip()]
+        if self.task_store is not None:
+            for task in new_tasks:
+                self.task_store.add_task(task)
+        with self._lock:
+            self.tasks.extend(new_tasks)
+            self.dirty = True
+
+    def reload_tasks(self):
+        """
+        Replaces the tasks with the task store's pending tasks, if there is a store.
+        """
+        if self.task_store is None:
+            return
+        stored_tasks = self.task_store.load_tasks()
+        with self._lock:
+            if stored_tasks != self.tasks:
+                self.tasks = stored_tasks
+                self.dirty = True
+
+    def pop_next_task(self):
+        with self._lock:
+            if not self.tasks:
+                return None
+            self.dirty = True
+            return self.tasks.pop(0)
+
+    def append_user_input(self, line: str):
+        with self._lock:
+            self.user_inputs.append(line.rstrip("\n"))
+            self.dirty = True
+
+    def clear(self):
+        with self._lock:
+            self.user_inputs = []
+            self.tasks = []
+            self.dirty = True
+
+    def flush(self) -> bool:
+        """
+        Writes the memory to disk if it changed since the last flush.
+        Returns True if a write happened.
+        """
+        with self._lock:
+            if not self.dirty:
+                return False
+            content = self._render()
+            self.dirty = False
+        tmp_filename = f"{self.filename}.tmp"
+        with open(tmp_filename, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_filename, self.filename)
+        self.flushes += 1
+        return True
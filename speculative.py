@@ -0,0 +1,201 @@
+import threading
+
+from model_engine import get_engine, DEFAULT_N_CTX
+
+PROMPT_LOOKUP = "prompt_lookup"
+DRAFT_MODEL = "draft"
+
+DEFAULT_NUM_PRED_TOKENS = 10
+DEFAULT_MAX_NGRAM_SIZE = 2
+DEFAULT_DRAFT_PRED_TOKENS = 4
+
+
+def last_logits(llm):
+    """
+    Returns the logits of the last token 'llm' evaluated. Llama.eval only copies
+    logits into 'scores' for instances built with logits_all, but the context
+    always holds the row of the last token of the last batch.
+    """
+    import numpy as np
+    ctx = getattr(llm, "_ctx", None)
+    if ctx is None:
+        return llm.scores[llm.n_tokens - 1]
+    return np.ctypeslib.as_array(ctx.get_logits(), shape=(llm.n_vocab(),))
+
+
+class DraftModelDecoding:
+    """
+    Draft model for llama_cpp speculative decoding backed by a small GGUF.
+
+    Called with the main model's tokens so far, it greedily proposes the next
+    'num_pred_tokens' tokens. The draft instance comes from the ModelEngine and
+    keeps its KV cache between calls, so only new tokens are evaluated. It is
+    a plain instance: proposals read the context's last logits row, so the
+    draft does not need logits_all.
+    """
+
+    def __init__(self, model_path: str, num_pred_tokens=DEFAULT_DRAFT_PRED_TOKENS, n_ctx=DEFAULT_N_CTX):
+        self.model_path = model_path
+        self.num_pred_tokens = num_pred_tokens
+        self.n_ctx = n_ctx
+
+    def __call__(self, input_ids, **kwargs):
+        # llama_cpp depends on NumPy anyway; importing it here keeps main.py's startup free of it
+        import numpy as np
+        input_ids = [int(token) for token in input_ids]
+        with get_engine().acquire(self.model_path, n_ctx=self.n_ctx) as draft:
+            # Reuse the longest prefix the draft context already holds; at least
+            # one token is evaluated so fresh logits are available.
+            common = 0
+            for a, b in zip(draft.input_ids[:draft.n_tokens], input_ids):
+                if a != b:
+                    break
+                common += 1
+            common = min(common, len(input_ids) - 1)
+            draft.n_tokens = common
+            draft.eval(input_ids[common:])
+
+            proposed = []
+            for _ in range(self.num_pred_tokens):
+                if draft.n_tokens >= self.n_ctx:
+                    break
+                token = int(np.argmax(last_logits(draft)))
+                proposed.append(token)
+                draft.eval([token])
+        return np.array(proposed, dtype=np.intc)
+
+
+class SpeculativeConfig:
+    """
+    Speculative decoding settings for one agent type: 'prompt_lookup' uses
+    llama_cpp's LlamaPromptLookupDecoding, 'draft' a small GGUF given by
+    'draft_model_path'.
+    """
+
+    def __init__(self, kind=PROMPT_LOOKUP, num_pred_tokens=None, max_ngram_size=DEFAULT_MAX_NGRAM_SIZE,
+                 draft_model_path=None):
+        if kind not in (PROMPT_LOOKUP, DRAFT_MODEL):
+            raise ValueError(f"Unknown speculative decoding kind: {kind}")
+        if kind == DRAFT_MODEL and not draft_model_path:
+            raise ValueError("Draft-model speculative decoding needs a draft model path")
+        self.kind = kind
+        self.num_pred_tokens = num_pred_tokens or (
+            DEFAULT_NUM_PRED_TOKENS if kind == PROMPT_LOOKUP else DEFAULT_DRAFT_PRED_TOKENS
+        )
+        self.max_ngram_size = max_ngram_size
+        self.draft_model_path = draft_model_path
+        self._drafter = None
+        self._lock = threading.Lock()
+
+    def drafter(self):
+        """
+        Returns the draft model object llama_cpp calls for proposals, built once.
+        """
+        with self._lock:
+            if self._drafter is None:
+                if self.kind == PROMPT_LOOKUP:
+                    from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+                    self._drafter = LlamaPromptLookupDecoding(
+                        max_ngram_size=self.max_ngram_size, num_pred_tokens=self.num_pred_tokens
+                    )
+                else:
+                    self._drafter = DraftModelDecoding(self.draft_model_path, self.num_pred_tokens)
+            return self._drafter
+
+    def describe(self) -> str:
+        if self.kind == PROMPT_LOOKUP:
+            return f"prompt lookup ({self.num_pred_tokens} tokens)"
+        return f"draft model {self.draft_model_path} ({self.num_pred_tokens} tokens)"
+
+
+class CountingDrafter:
+    """
+    Wraps a drafter for one completion and counts its proposals.
+
+    llama_cpp asks for a draft once per evaluation round, and each round yields
+    the accepted draft tokens plus one sampled token. The accepted count is
+    therefore about (tokens generated - rounds), which is what the
+    acceptance rate reported by record() is based on.
+    """
+
+    def __init__(self, drafter):
+        self.drafter = drafter
+        self.rounds = 0
+        self.drafted = 0
+
+    def __call__(self, input_ids, **kwargs):
+        proposed = self.drafter(input_ids, **kwargs)
+        self.rounds += 1
+        self.drafted += len(proposed)
+        return proposed
+
+
+_configs = {}
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def parse_speculative_spec(spec: str) -> dict:
+    """
+    Parses 'Agent=prompt_lookup[:N],Agent=draft:path.gguf[:N]' into
+    {agent_type: SpeculativeConfig}.
+    """
+    configs = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        agent_type, _, setting = item.partition("=")
+        kind, _, rest = setting.partition(":")
+        kind = kind.strip()
+        if kind == PROMPT_LOOKUP:
+            configs[agent_type.strip()] = SpeculativeConfig(PROMPT_LOOKUP, int(rest) if rest else None)
+        elif kind == DRAFT_MODEL:
+            path, sep, num = rest.rpartition(":")
+            if not sep or not num.isdigit():
+                path, num = rest, ""
+            configs[agent_type.strip()] = SpeculativeConfig(DRAFT_MODEL, int(num) if num else None, draft_model_path=path)
+        else:
+            raise ValueError(f"Unknown speculative decoding setting '{setting}' for {agent_type}")
+    return configs
+
+
+def configure_speculative(configs: dict):
+    """
+    Sets the speculative decoding configuration per agent type.
+    """
+    _configs.clear()
+    _configs.update(configs)
+
+
+def get_speculative_config(agent_type):
+    return _configs.get(agent_type)
+
+
+def record(agent_type, counter: CountingDrafter, tokens: int, seconds: float):
+    """
+    Adds one speculative completion to the per-agent totals.
+    """
+    with _stats_lock:
+        stats = _stats.setdefault(agent_type or "Unknown", {
+            "calls": 0, "tokens": 0, "seconds": 0.0, "rounds": 0, "drafted": 0,
+        })
+        stats["calls"] += 1
+        stats["tokens"] += tokens or 0
+        stats["seconds"] += seconds
+        stats["rounds"] += counter.rounds
+        stats["drafted"] += counter.drafted
+
+
+def speculative_stats() -> dict:
+    """
+    Returns per-agent tokens/s and the approximate draft acceptance rate.
+    """
+    with _stats_lock:
+        out = {}
+        for agent, s in _stats.items():
+            accepted = max(0, s["tokens"] - s["rounds"])
+            out[agent] = {
+                "calls": s["calls"],
+                "tokens_per_second": s["tokens"] / s["seconds"] if s["seconds"] else 0.0,
+                "drafted": s["drafted"],
+                "acceptance_rate": min(1.0, accepted / s["drafted"]) if s["drafted"] else 0.0,
+            }
+        return out
@@ -0,0 +1,243 @@
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_TASK_DB = "tasks.db"
+
+STATE_PENDING = "pending"
+STATE_RUNNING = "running"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'pending',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claimed_by TEXT,
+    created_by TEXT,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_state_priority ON tasks (state, priority DESC, id);
+CREATE INDEX IF NOT EXISTS idx_tasks_task ON tasks (task);
+"""
+
+
+class _Transaction:
+    """
+    Runs a block in one transaction. Writers use BEGIN IMMEDIATE so they take the
+    database write lock before reading, which is what makes claiming atomic.
+    """
+
+    def __init__(self, conn, write=False):
+        self.conn = conn
+        self.write = write
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE" if self.write else "BEGIN")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+class SQLiteTaskQueue:
+    """
+    TaskQueue backend on SQLite in WAL mode, safe to share between processes.
+
+    Besides the TaskQueue methods it records each task's priority, state,
+    timestamps, attempt count and result. claim_next_task() moves the highest
+    priority pending task to 'running' inside a write transaction, so two workers
+    never receive the same task; the worker then reports it with
+    complete_task() or fail_task(). pop_next_task() is the TaskQueue drop-in: it
+    takes the task off the queue by marking it done straight away.
+    """
+
+    def __init__(self, filename=DEFAULT_TASK_DB, worker_id=None, timeout=30.0):
+        self.filename = filename
+        self.worker_id = worker_id or f"{os.getpid()}"
+        self.timeout = timeout
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+        if "created_by" not in columns:
+            # Databases from before save_tasks() was scoped to its own worker
+            conn.execute("ALTER TABLE tasks ADD COLUMN created_by TEXT")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads, so each thread gets its own.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.filename, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, write=False):
+        return _Transaction(self._connection(), write)
+
+    def load_tasks(self) -> list:
+        """
+        Returns pending tasks in the order they will be claimed.
+        """
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT task FROM tasks WHERE state = ? ORDER BY priority DESC, id",
+                (STATE_PENDING,),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def save_tasks(self, tasks: list):
+        """
+        Replaces the pending tasks this worker added with 'tasks', earlier entries
+        getting higher priority. Pending tasks of other workers are left alone.
+        """
+        now = time.time()
+        count = len(tasks)
+        with self._transaction(write=True) as conn:
+            conn.execute("DELETE FROM tasks WHERE state = ? AND created_by = ?", (STATE_PENDING, self.worker_id))
+            conn.executemany(
+                "INSERT INTO tasks (task, priority, state, created_at, updated_at, created_by) VALUES (?, ?, ?, ?, ?, ?)",
+                [(task, count - i, STATE_PENDING, now, now, self.worker_id) for i, task in enumerate(tasks)],
+            )
+
+    def add_task(self, task: str, priority=0):
+        """
+        Adds a new task unless the same task is already pending or running.
+        """
+        now = time.time()
+        with self._transaction(write=True) as conn:
+            exists = conn.execute(
+                "SELECT 1 FROM tasks WHERE task = ? AND state IN (?, ?) LIMIT 1",
+                (task, STATE_PENDING, STATE_RUNNING),
+            ).fetchone()
+            if not exists:
+                conn.execute(
+                    "INSERT INTO tasks (task, priority, state, created_at, updated_at, created_by) VALUES (?, ?, ?, ?, ?, ?)",
+                    (task, priority, STATE_PENDING, now, now, self.worker_id),
+                )
+
+    def set_priorities(self, tasks: list):
+        """
+        Orders the pending tasks named in 'tasks' by their position, earlier
+        entries getting higher priority. Other pending tasks keep theirs.
+        """
+        count = len(tasks)
+        with self._transaction(write=True) as conn:
+            conn.executemany(
+                "UPDATE tasks SET priority = ? WHERE task = ? AND state = ?",
+                [(count - i, task, STATE_PENDING) for i, task in enumerate(tasks)],
+            )
+
+    def _take_next(self, state: str):
+        # Moves the next pending task to 'state' for this worker; returns (task_id, task) or None
+        now = time.time()
+        with self._transaction(write=True) as conn:
+            row = conn.execute(
+                "SELECT id, task FROM tasks WHERE state = ? ORDER BY priority DESC, id LIMIT 1",
+                (STATE_PENDING,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE tasks SET state = ?, attempts = attempts + 1, claimed_by = ?, updated_at = ? WHERE id = ?",
+                (state, self.worker_id, now, row[0]),
+            )
+        return row[0], row[1]
+
+    def claim_next_task(self):
+        """
+        Atomically marks the next pending task as running for this worker.
+        Returns (task_id, task), or None if nothing is pending.
+        """
+        return self._take_next(STATE_RUNNING)
+
+    def claim_task(self, task: str):
+        """
+        Marks the pending task with this text as running for this worker and
+        returns its id for complete_task()/fail_task(). Returns None if no such
+        task is pending, e.g. because another worker claimed it first.
+        """
+        now = time.time()
+        with self._transaction(write=True) as conn:
+            row = conn.execute(
+                "SELECT id FROM tasks WHERE task = ? AND state = ? ORDER BY priority DESC, id LIMIT 1",
+                (task, STATE_PENDING),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE tasks SET state = ?, attempts = attempts + 1, claimed_by = ?, updated_at = ? WHERE id = ?",
+                (STATE_RUNNING, self.worker_id, now, row[0]),
+            )
+        return row[0]
+
+    def pop_next_task(self) -> str:
+        """
+        Removes and returns the next task, or None if the queue is empty. As with
+        TaskQueue nobody reports back on a popped task, so it is marked done at
+        once; use claim_next_task() to track its outcome instead.
+        """
+        taken = self._take_next(STATE_DONE)
+        return taken[1] if taken else None
+
+    def complete_task(self, task_id: int, result: str):
+        self._finish(task_id, STATE_DONE, result)
+
+    def fail_task(self, task_id: int, error: str, retry=False):
+        """
+        Records a failure. With 'retry' the task goes back to pending.
+        """
+        self._finish(task_id, STATE_PENDING if retry else STATE_FAILED, error)
+
+    def _finish(self, task_id, state, result):
+        with self._transaction(write=True) as conn:
+            conn.execute(
+                "UPDATE tasks SET state = ?, result = ?, updated_at = ? WHERE id = ?",
+                (state, result, time.time(), task_id),
+            )
+
+    def requeue_stale(self, max_age_seconds: float) -> int:
+        """
+        Returns tasks stuck in 'running' longer than 'max_age_seconds' (e.g. from a
+        crashed worker) to pending. Returns how many were requeued.
+        """
+        cutoff = time.time() - max_age_seconds
+        with self._transaction(write=True) as conn:
+            cur = conn.execute(
+                "UPDATE tasks SET state = ?, updated_at = ? WHERE state = ? AND updated_at < ?",
+                (STATE_PENDING, time.time(), STATE_RUNNING, cutoff),
+            )
+            return cur.rowcount
+
+    def clear_tasks(self):
+        """
+        Removes all pending tasks.
+        """
+        with self._transaction(write=True) as conn:
+            conn.execute("DELETE FROM tasks WHERE state = ?", (STATE_PENDING,))
+
+    def get_all_tasks(self) -> list:
+        """
+        Returns all pending tasks as a list.
+        """
+        return self.load_tasks()
+
+    def count_by_state(self) -> dict:
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall()
+        return dict(rows)
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
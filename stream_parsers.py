@@ -0,0 +1,81 @@
+class StreamParser:
+    """
+    Incremental parser for streamed completions.
+
+    run_model_inference feeds it each generated piece of text; feed() returns
+    True once the answer is decided, which stops generation. 'has_output' is
+    set when the parser has produced its first useful result, which is what
+    time-to-first-useful-output measures.
+    """
+
+    def __init__(self):
+        self.has_output = False
+        self.stopped = False
+
+    def feed(self, text: str) -> bool:
+        raise NotImplementedError
+
+    def finish(self):
+        """
+        Called once generation has ended, whether or not feed() stopped it.
+        """
+
+
+class YesNoParser(StreamParser):
+    """
+    Decides a YES/NO answer from the first characters of the completion.
+    Anything that does not start with YES counts as NO.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.answer = None
+        self._buffer = ""
+
+    def feed(self, text: str) -> bool:
+        self._buffer += text
+        head = self._buffer.lstrip().upper()
+        if len(head) < 3 and "YES".startswith(head):
+            return False  # still a prefix of YES (or nothing yet)
+        self.answer = head.startswith("YES")
+        self.has_output = True
+        self.stopped = True
+        return True
+
+    def finish(self):
+        if self.answer is None:
+            self.answer = self._buffer.strip().upper().startswith("YES")
+            self.has_output = True
+
+
+class LineParser(StreamParser):
+    """
+    Hands each completed, non-empty line (stripped) to 'on_line' as soon as its
+    newline is generated. 'on_line' returns True to stop generation. A final
+    line without a newline is delivered by finish().
+    """
+
+    def __init__(self, on_line):
+        super().__init__()
+        self.on_line = on_line
+        self._buffer = ""
+
+    def feed(self, text: str) -> bool:
+        self._buffer += text
+        while "\n" in self._buffer and not self.stopped:
+            line, self._buffer = self._buffer.split("\n", 1)
+            self._emit(line)
+        return self.stopped
+
+    def finish(self):
+        if not self.stopped:
+            self._emit(self._buffer)
+        self._buffer = ""
+
+    def _emit(self, line: str):
+        line = line.strip()
+        if not line:
+            return
+        self.has_output = True
+        if self.on_line(line):
+            self.stopped = True
@@ -1,40 +1,65 @@
+from grammars import TASK_CREATION_GRAMMAR
+from prompt_builder import get_prompt_builder, PromptSection, TRIM_LINES
 from run_model_inference import run_model_inference
+from stream_parsers import LineParser
 
 class TaskCreationAgent:
+    MAX_TASKS = 3
+
+    # The fixed instructions come before the objective so their KV state can be reused.
+    PROMPT_PREFIX = (
+        "You are TaskCreationAgent. Provide up to 3 concise tasks required to achieve this objective. "
+        "Tasks should be independent and executable. Avoid unnecessary explanations.\n"
+        "Example:\n"
+        "- Create a file 'hello.txt' and write 'hello world!' to it.\n\n"
+    )
+
     def __init__(self, model_path: str, debug_mode=False):
         self.model_path = model_path
         self.debug_mode = debug_mode
+        self.prompt_builder = get_prompt_builder(model_path, debug_mode=debug_mode)
 
-    def create_tasks(self, objective: str, recent_tasks: str) -> list:
+    def create_tasks(self, objective: str, recent_tasks: str, memory: str = "", on_task=None) -> list:
         """
         Generates up to 1-3 tasks relevant to 'objective', avoiding duplication from 'recent_tasks'.
+        'memory' holds relevant long-term memory entries, if any.
+        If given, 'on_task' is called with each task as soon as its line is generated.
         Returns a list of tasks.
         """
-        prompt = (
-                    f"Objective: {objective}\n\n"
-                     "You are TaskCreationAgent. Provide up to 3 concise tasks required to achieve this objective. "
-                        "Tasks should be independent and executable. Avoid unnecessary explanations.\n"
-                            "Example:\n"
-                                "- Create a file 'hello.txt' and write 'hello world!' to it."
-                )
+        max_tokens = 128
+        memory_section = f"Relevant memory:\n{memory}\n\n" if memory else ""
+        prompt = self.prompt_builder.build([
+            PromptSection(self.PROMPT_PREFIX, fixed=True),
+            PromptSection(memory_section, priority=1, trim=TRIM_LINES),
+            PromptSection(f"Objective: {objective}\n"),
+        ], max_tokens, agent_type="TaskCreationAgent")
 
+        tasks = []
+        no_tasks = False
 
-        response = run_model_inference(
+        def on_line(line):
+            nonlocal no_tasks
+            if line.upper() == "NO TASKS REQUIRED":
+                no_tasks = True
+                return True
+            tasks.append(line)
+            if on_task is not None:
+                on_task(line)
+            return len(tasks) >= self.MAX_TASKS
+
+        run_model_inference(
             model_path=self.model_path,
             prompt=prompt,
-            max_tokens=128,
+            max_tokens=max_tokens,
             agent_type="TaskCreationAgent",
-            verbose=self.debug_mode
+            verbose=self.debug_mode,
+            prompt_prefix=self.PROMPT_PREFIX,
+            stream_parser=LineParser(on_line),
+            grammar=TASK_CREATION_GRAMMAR
         )
 
-        tasks = []
-        for line in response.split("\n"):
-            line_clean = line.strip()
-            if not line_clean:
-                continue
-            if line_clean.upper() == "NO TASKS REQUIRED":
-                return []
-            tasks.append(line_clean)
+        if no_tasks:
+            return []
 
         if self.debug_mode:
             print(f"[DEBUG] Created tasks: {tasks}")
@@ -0,0 +1,190 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from ltm_dedup import NearDuplicateIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TASK_DEDUP_THRESHOLD = 0.95
+# Estimated Jaccard similarity of word shingles when no embeddings are used
+DEFAULT_LEXICAL_THRESHOLD = 0.8
+DEFAULT_RECENT_TASKS = 32
+DEFAULT_EMBEDDING_CACHE_SIZE = 1024
+
+ROUTED_PREFIXES = ("FILE#", "WEB#")
+
+# Model calls a task costs after it is queued: ExecutionAgent (text tasks
+# only), LongTermMemoryAgent and GoalEvaluationAgent
+TEXT_TASK_CALLS = 3
+ROUTED_TASK_CALLS = 2
+
+_NUMBERING = re.compile(r"^(?:[-*•]\s*)?(?:(?:task|step)\s*#?\s*\d+\s*[:.)\-]?\s*|\d+\s*[.)]\s*)", re.IGNORECASE)
+
+
+def normalize_task(task: str) -> str:
+    """
+    Strips list markers and 'Task N:' numbering. Free-text tasks are also
+    lowercased with whitespace and trailing punctuation collapsed; FILE# and
+    WEB# tasks keep their exact names and content.
+    """
+    text = task.strip()
+    if text.startswith(ROUTED_PREFIXES):
+        return text
+    text = _NUMBERING.sub("", text)
+    return " ".join(text.lower().split()).rstrip(".!;: ")
+
+
+class EmbeddingCache:
+    """
+    LRU cache of unit-length embedding vectors keyed by normalized task text,
+    so a task is embedded once however often it is compared. NumPy is
+    imported on first use, so main.py can start without it.
+    """
+
+    def __init__(self, embed, max_entries=DEFAULT_EMBEDDING_CACHE_SIZE):
+        self.embed = embed
+        self.max_entries = max_entries
+        self._vectors = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text: str):
+        import numpy as np
+        with self._lock:
+            vector = self._vectors.get(text)
+            if vector is not None:
+                self._vectors.move_to_end(text)
+                self.hits += 1
+                return vector
+        vector = np.asarray(self.embed(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+        with self._lock:
+            self.misses += 1
+            self._vectors[text] = vector
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+        return vector
+
+
+class TaskDeduplicator:
+    """
+    Drops tasks that repeat a pending or recently completed task before they
+    are queued.
+
+    Tasks are compared by normalized text first. Free-text tasks are then
+    compared against all pending and the last 'recent_size' completed tasks:
+    with an 'embed' function by cosine similarity of their embeddings in one
+    matrix product ('threshold'), otherwise by MinHash estimates of word
+    shingle similarity ('lexical_threshold'), which needs no model. FILE# and
+    WEB# tasks only match exactly, since two file names can embed almost
+    identically. If embedding fails, the lexical comparison is used for the
+    rest of the run.
+    """
+
+    def __init__(self, embed=None, threshold=DEFAULT_TASK_DEDUP_THRESHOLD, recent_size=DEFAULT_RECENT_TASKS,
+                 cache_size=DEFAULT_EMBEDDING_CACHE_SIZE, lexical_threshold=DEFAULT_LEXICAL_THRESHOLD):
+        self.threshold = threshold
+        self.cache = EmbeddingCache(embed, cache_size)
+        self.lexical = NearDuplicateIndex(threshold=lexical_threshold)
+        self.cache_size = cache_size
+        self._signatures = OrderedDict()
+        self.recent_size = recent_size
+        self._recent = OrderedDict()
+        self._embeddings_enabled = embed is not None
+        self.checks = 0
+        self.duplicates = 0
+        self.calls_avoided = 0
+        self.check_time = 0.0
+
+    def _vector(self, normalized: str):
+        if not self._embeddings_enabled:
+            return None
+        try:
+            return self.cache.get(normalized)
+        except Exception as e:
+            logger.warning("Task embeddings unavailable, deduplicating by word overlap: %s", e)
+            self._embeddings_enabled = False
+            return None
+
+    def _signature(self, normalized: str):
+        signature = self._signatures.get(normalized)
+        if signature is None:
+            signature = self.lexical.signature(normalized)
+            self._signatures[normalized] = signature
+            while len(self._signatures) > self.cache_size:
+                self._signatures.popitem(last=False)
+        else:
+            self._signatures.move_to_end(normalized)
+        return signature
+
+    def _lexical_match(self, normalized: str, texts: list):
+        signature = self._signature(normalized)
+        if signature is None:
+            return None
+        for text in texts:
+            other = self._signature(text)
+            if other is not None and float((other == signature).mean()) >= self.lexical.threshold:
+                return text
+        return None
+
+    def find_duplicate(self, task: str, pending: list):
+        """
+        Returns the pending or recently completed task that 'task' duplicates,
+        or None. A duplicate is counted with the model calls it avoids.
+        """
+        start_time = time.perf_counter()
+        normalized = normalize_task(task)
+        candidates = {}
+        for other in pending:
+            candidates.setdefault(normalize_task(other), other)
+        for other_normalized, other in self._recent.items():
+            candidates.setdefault(other_normalized, other)
+
+        match = candidates.get(normalized)
+        if match is None and normalized and not task.strip().startswith(ROUTED_PREFIXES):
+            texts = [text for text in candidates if text and not text.startswith(ROUTED_PREFIXES)]
+            vector = self._vector(normalized) if texts else None
+            vectors = [self._vector(text) for text in texts] if vector is not None else None
+            if vectors is not None and all(v is not None and v.shape == vector.shape for v in vectors):
+                import numpy as np
+                similarities = np.stack(vectors) @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    match = candidates[texts[best]]
+            elif texts:
+                similar = self._lexical_match(normalized, texts)
+                if similar is not None:
+                    match = candidates[similar]
+
+        self.checks += 1
+        self.check_time += time.perf_counter() - start_time
+        if match is not None:
+            self.duplicates += 1
+            self.calls_avoided += ROUTED_TASK_CALLS if task.strip().startswith(ROUTED_PREFIXES) else TEXT_TASK_CALLS
+        return match
+
+    def mark_completed(self, task: str):
+        """
+        Remembers 'task' so later repeats of it are dropped too.
+        """
+        normalized = normalize_task(task)
+        self._recent[normalized] = task
+        self._recent.move_to_end(normalized)
+        while len(self._recent) > self.recent_size:
+            self._recent.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "checks": self.checks,
+            "duplicates": self.duplicates,
+            "calls_avoided": self.calls_avoided,
+            "embeddings": self.cache.misses,
+            "embedding_cache_hits": self.cache.hits,
+            "avg_check_ms": self.check_time / self.checks * 1e3 if self.checks else 0.0,
+        }
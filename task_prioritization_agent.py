@@ -1,46 +1,87 @@
+import re
+
+from grammars import task_list_grammar
+from prompt_builder import get_prompt_builder, PromptSection, TRIM_LINES
 from run_model_inference import run_model_inference
+from stream_parsers import LineParser
+
+# Numbering or bullets the model tends to put in front of the tasks it echoes back
+LIST_MARKER = re.compile(r"^\s*(?:[-*]|\d+[.)])\s*")
 
 class TaskPrioritizationAgent:
+    PROMPT_PREFIX = "You are TaskPrioritizationAgent. Given these tasks:\n"
+
     def __init__(self, model_path: str, debug_mode=False):
         self.model_path = model_path
         self.debug_mode = debug_mode
+        self.prompt_builder = get_prompt_builder(model_path, debug_mode=debug_mode)
 
     def prioritize_tasks(self, tasks_raw: str) -> list:
         """
         Sorts tasks by urgency/impact, removes duplicates, and returns a list of unique tasks.
+        Only lines that match one of the given tasks are kept, so chatter such as
+        "The final answer is:" never becomes a task. Tasks the model left out are
+        appended in their original order, which also covers tasks trimmed from
+        the prompt when the list does not fit the context.
         """
         if not tasks_raw.strip():
             if self.debug_mode:
                 print("[DEBUG] No tasks for prioritization.")
             return []
 
-        prompt = (
-            "You are TaskPrioritizationAgent. Given these tasks:\n"
-            f"{tasks_raw}\n\n"
-            "1) Sort them by urgency and impact.\n"
-            "2) Eliminate duplicates.\n"
-            "3) Return the final tasks, one per line, no extra text."
-        )
+        max_tokens = 128
+        prompt = self.prompt_builder.build([
+            PromptSection(self.PROMPT_PREFIX, fixed=True),
+            PromptSection(tasks_raw.rstrip("\n") + "\n", priority=1, trim=TRIM_LINES),
+            PromptSection(
+                "\n"
+                "1) Sort them by urgency and impact.\n"
+                "2) Eliminate duplicates.\n"
+                "3) Return the final tasks, one per line, no extra text.",
+                fixed=True
+            ),
+        ], max_tokens, agent_type="TaskPrioritizationAgent")
 
-        response = run_model_inference(
+        original_tasks = [l.strip() for l in tasks_raw.splitlines() if l.strip()]
+        known = {}
+        for task in original_tasks:
+            known.setdefault(self._normalize(task), task)
+
+        seen = set()
+        prioritized_tasks = []
+
+        def on_line(line):
+            task = known.get(self._normalize(line))
+            if task is None:
+                if self.debug_mode:
+                    print(f"[DEBUG] Dropping unknown task from prioritization output: {line}")
+                return False
+            if task not in seen:
+                seen.add(task)
+                prioritized_tasks.append(task)
+            # Every task has been placed; anything after this is chatter
+            return len(seen) == len(known)
+
+        run_model_inference(
             model_path=self.model_path,
             prompt=prompt,
-            max_tokens=128,
+            max_tokens=max_tokens,
             agent_type="TaskPrioritizationAgent",
-            verbose=self.debug_mode
+            verbose=self.debug_mode,
+            prompt_prefix=self.PROMPT_PREFIX,
+            stream_parser=LineParser(on_line),
+            grammar=task_list_grammar(original_tasks)
         )
 
-        lines = [l.strip() for l in response.split("\n") if l.strip()]
-        seen = set()
-        prioritized_tasks = []
-        for line in lines:
-            if line not in seen:
-                seen.add(line)
-                prioritized_tasks.append(line)
-
-        if not prioritized_tasks:
-            prioritized_tasks = tasks_raw.splitlines()
+        for task in original_tasks:
+            if task not in seen:
+                seen.add(task)
+                prioritized_tasks.append(task)
 
         if self.debug_mode:
             print(f"[DEBUG] Prioritized tasks: {prioritized_tasks}")
         return prioritized_tasks
+
+    @staticmethod
+    def _normalize(line: str) -> str:
+        return LIST_MARKER.sub("", line).strip().lower()
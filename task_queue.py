@@ -1,61 +1,227 @@
+import logging
 import os
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMPACT_THRESHOLD = 1000
+
+ADD_RECORD = "+"
+POP_RECORD = "-"
+CLEAR_RECORD = "C"
+
 
 class TaskQueue:
-    def __init__(self, filename="tasks.txt"):
+    def __init__(self, filename="tasks.txt", compact_threshold=DEFAULT_COMPACT_THRESHOLD):
         """
         Initializes the TaskQueue with the given file.
         If the file doesn't exist, it creates an empty one.
+
+        Tasks are kept in memory (a deque plus a count per task for O(1) membership).
+        Every change is appended to '<filename>.journal' and the journal is replayed
+        on start, so a crash loses nothing. Once the journal holds
+        'compact_threshold' records, a background thread folds it back into
+        'filename', which keeps the plain one-task-per-line format.
         """
         self.filename = filename
+        self.journal_filename = filename + ".journal"
+        self.compacting_filename = self.journal_filename + ".compacting"
+        self.compact_threshold = compact_threshold
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._compact_thread = None
+        self._tasks = deque()
+        self._counts = {}
+        self._journal_records = 0
+
         if not os.path.exists(self.filename):
             with open(self.filename, "w", encoding="utf-8") as f:
                 pass  # Create an empty file
 
+        self._recover()
+        self._journal = open(self.journal_filename, "a", encoding="utf-8")
+
+    def _recover(self):
+        """
+        Loads the last snapshot and replays any journal left by a previous run.
+        """
+        with open(self.filename, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    self._push(line.strip())
+
+        for path in (self.compacting_filename, self.journal_filename):
+            if not os.path.exists(path):
+                continue
+            for record in self._read_records(path):
+                self._replay(record)
+                self._journal_records += 1
+
+        # A leftover '.compacting' file means a compaction was interrupted; finish it
+        # now so the next compaction cannot overwrite records not yet in a snapshot.
+        if os.path.exists(self.compacting_filename):
+            self._write_snapshot(list(self._tasks))
+            if os.path.exists(self.journal_filename):
+                os.remove(self.journal_filename)
+            os.remove(self.compacting_filename)
+            self._journal_records = 0
+
+    def _read_records(self, path: str) -> list:
+        """
+        Returns the complete records in a journal. A record without its newline
+        was cut off by a crash mid-write; it is dropped and truncated away so the
+        next record is not appended onto it.
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            logger.warning("Dropping a partial record at the end of %s.", path)
+            os.truncate(path, end)
+        return [line.rstrip("\r") for line in data[:end].decode("utf-8").split("\n")[:-1]]
+
+    def _replay(self, record: str):
+        # Replay is tolerant of records already contained in the snapshot, which
+        # happens if a crash hits between writing a snapshot and dropping the
+        # journal it was built from.
+        kind, _, task = record.partition("\t")
+        if kind == ADD_RECORD and task and not self._counts.get(task):
+            self._push(task)
+        elif kind == POP_RECORD and self._counts.get(task):
+            if self._tasks and self._tasks[0] == task:
+                self._tasks.popleft()
+            else:
+                self._tasks.remove(task)
+            self._discard(task)
+        elif kind == CLEAR_RECORD:
+            self._tasks.clear()
+            self._counts.clear()
+
+    def _push(self, task: str):
+        self._tasks.append(task)
+        self._counts[task] = self._counts.get(task, 0) + 1
+
+    def _discard(self, task: str):
+        count = self._counts.get(task, 0) - 1
+        if count > 0:
+            self._counts[task] = count
+        else:
+            self._counts.pop(task, None)
+
+    def _append_journal(self, kind: str, task: str = ""):
+        self._journal.write(f"{kind}\t{task}\n")
+        self._journal.flush()
+        self._journal_records += 1
+        if self._journal_records >= self.compact_threshold:
+            self._start_compaction()
+
+    def _start_compaction(self):
+        if self._compact_thread is not None and self._compact_thread.is_alive():
+            return
+        self._compact_thread = threading.Thread(target=self.compact, name="task-queue-compaction", daemon=True)
+        self._compact_thread.start()
+
+    def _write_snapshot(self, tasks: list):
+        tmp_filename = self.filename + ".tmp"
+        with open(tmp_filename, "w", encoding="utf-8") as f:
+            f.writelines(task + "\n" for task in tasks)
+        os.replace(tmp_filename, self.filename)
+
+    def compact(self):
+        """
+        Rewrites the task file from memory and drops the journal records it covers.
+        Only the journal swap happens under the queue lock; the snapshot is written
+        while other threads keep adding and popping tasks.
+        """
+        with self._compact_lock:
+            with self._lock:
+                tasks = list(self._tasks)
+                self._journal.close()
+                os.replace(self.journal_filename, self.compacting_filename)
+                self._journal = open(self.journal_filename, "a", encoding="utf-8")
+                self._journal_records = 0
+            self._write_snapshot(tasks)
+            os.remove(self.compacting_filename)
+
     def load_tasks(self) -> list:
         """
         Loads tasks from the file and returns them as a list.
         """
-        if not os.path.exists(self.filename):
-            return []
-        with open(self.filename, "r", encoding="utf-8") as f:
-            return [line.strip() for line in f if line.strip()]
+        with self._lock:
+            return list(self._tasks)
 
     def save_tasks(self, tasks: list):
         """
         Saves the given list of tasks to the file.
         """
-        with open(self.filename, "w", encoding="utf-8") as f:
-            f.writelines(task + "\n" for task in tasks)
+        with self._compact_lock:
+            with self._lock:
+                self._tasks = deque()
+                self._counts = {}
+                for task in tasks:
+                    self._push(task)
+                self._write_snapshot(tasks)
+                self._journal.close()
+                self._journal = open(self.journal_filename, "w", encoding="utf-8")
+                self._journal_records = 0
 
     def add_task(self, task: str):
         """
         Adds a new task to the file if it doesn't already exist.
         """
-        tasks = self.load_tasks()
-        if task not in tasks:
-            tasks.append(task)
-            self.save_tasks(tasks)
+        with self._lock:
+            if not self._counts.get(task):
+                self._push(task)
+                self._append_journal(ADD_RECORD, task)
 
     def pop_next_task(self) -> str:
         """
         Removes and returns the first task from the file.
         Returns None if the task list is empty.
         """
-        tasks = self.load_tasks()
-        if not tasks:
-            return None
-        next_task = tasks.pop(0)
-        self.save_tasks(tasks)
-        return next_task
+        with self._lock:
+            if not self._tasks:
+                return None
+            next_task = self._tasks.popleft()
+            self._discard(next_task)
+            self._append_journal(POP_RECORD, next_task)
+            return next_task
 
     def clear_tasks(self):
         """
         Clears all tasks from the file.
         """
-        self.save_tasks([])
+        with self._lock:
+            self._tasks.clear()
+            self._counts.clear()
+            self._append_journal(CLEAR_RECORD)
 
     def get_all_tasks(self) -> list:
         """
         Returns all tasks as a list.
         """
         return self.load_tasks()
+
+    def close(self):
+        """
+        Waits for a running compaction, folds the journal into the task file and closes it.
+        """
+        if self._compact_thread is not None:
+            self._compact_thread.join()
+        self.compact()
+        with self._lock:
+            self._journal.close()
+
+
+def create_task_queue(filename: str, backend="file"):
+    """
+    Builds the configured TaskQueue backend. 'file' is the journaled TaskQueue;
+    'sqlite' is SQLiteTaskQueue, stored next to 'filename' with a .db extension.
+    """
+    if backend == "file":
+        return TaskQueue(filename)
+    if backend == "sqlite":
+        from sqlite_task_queue import SQLiteTaskQueue
+        return SQLiteTaskQueue(os.path.splitext(filename)[0] + ".db")
+    raise ValueError(f"Unknown task queue backend: {backend}")
@@ -0,0 +1,189 @@
+import heapq
+import itertools
+import time
+
+SOURCE_CREATION = "creation"
+SOURCE_USER = "user"
+
+DEFAULT_RERANK_THRESHOLD = 0.5
+
+
+class ScheduledTask:
+    __slots__ = ("task", "source", "created_at", "batch", "seq", "llm_rank", "score")
+
+    def __init__(self, task, source, created_at, batch, seq):
+        self.task = task
+        self.source = source
+        self.created_at = created_at
+        self.batch = batch
+        self.seq = seq
+        self.llm_rank = None
+        self.score = 0.0
+
+
+class LocalTaskScorer:
+    """
+    Cheap priority score for a task, higher runs first.
+
+    Combines the task type (FILE# and WEB# tasks are concrete and fast), a boost
+    for tasks that came from user input, recency (tasks from the latest creation
+    batch reflect the newest plan) and age (long-waiting tasks slowly rise so
+    nothing starves). A rank from the last LLM re-sort, if any, is added on top.
+    """
+
+    def __init__(self, file_weight=2.0, web_weight=1.0, user_boost=3.0, recency_weight=1.0,
+                 age_weight=0.01, llm_weight=5.0):
+        self.file_weight = file_weight
+        self.web_weight = web_weight
+        self.user_boost = user_boost
+        self.recency_weight = recency_weight
+        self.age_weight = age_weight
+        self.llm_weight = llm_weight
+
+    def score(self, entry: ScheduledTask, current_batch: int, ranked_count: int, now: float) -> float:
+        score = 0.0
+        if entry.task.startswith("FILE#"):
+            score += self.file_weight
+        elif entry.task.startswith("WEB#"):
+            score += self.web_weight
+        if entry.source == SOURCE_USER:
+            score += self.user_boost
+        score += self.recency_weight / (1 + current_batch - entry.batch)
+        score += self.age_weight * (now - entry.created_at)
+        if entry.llm_rank is not None and ranked_count:
+            score += self.llm_weight * (1 - entry.llm_rank / ranked_count)
+        return score
+
+
+class PriorityTaskScheduler:
+    """
+    Heap-based task ordering that only asks TaskPrioritizationAgent for a
+    re-sort when the task set has changed by more than 'rerank_threshold'
+    (a fraction of its size at the previous re-sort). In between, tasks are
+    ordered by LocalTaskScorer. Every sync() rescores the scheduled tasks, so
+    the age and recency terms move between re-sorts as well.
+    """
+
+    def __init__(self, prioritization_agent=None, rerank_threshold=DEFAULT_RERANK_THRESHOLD, scorer=None,
+                 debug_mode=False):
+        self.prioritization_agent = prioritization_agent
+        self.rerank_threshold = rerank_threshold
+        self.scorer = scorer or LocalTaskScorer()
+        self.debug_mode = debug_mode
+        self._heap = []
+        self._entries = {}
+        self._seq = itertools.count()
+        self._batch = 0
+        self._ranked_count = 0
+        self.changes_since_rerank = 0
+        self.size_at_rerank = 0
+        self.llm_calls = 0
+        self.local_orderings = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, task):
+        return task in self._entries
+
+    def add(self, task: str, source=SOURCE_CREATION) -> bool:
+        """
+        Schedules 'task' unless it is already scheduled. Returns True if added.
+        """
+        if task in self._entries:
+            return False
+        entry = ScheduledTask(task, source, time.time(), self._batch, next(self._seq))
+        entry.score = self.scorer.score(entry, self._batch, self._ranked_count, entry.created_at)
+        self._entries[task] = entry
+        heapq.heappush(self._heap, (-entry.score, entry.seq, task))
+        self.changes_since_rerank += 1
+        return True
+
+    def remove(self, task: str) -> bool:
+        """
+        Unschedules 'task'. Its heap slot is skipped lazily on the next pop.
+        """
+        if self._entries.pop(task, None) is None:
+            return False
+        self.changes_since_rerank += 1
+        return True
+
+    def take(self, task: str) -> bool:
+        """
+        Unschedules 'task' the way pop() does, e.g. once it was claimed from a
+        shared queue. Unlike remove() this does not count as a change.
+        """
+        return self._entries.pop(task, None) is not None
+
+    def sync(self, tasks: list, source=SOURCE_CREATION):
+        """
+        Makes the scheduled set equal to 'tasks', adding new ones as a new batch,
+        and rescores it for the current time. Each call counts as one local ordering.
+        """
+        self.local_orderings += 1
+        wanted = set(tasks)
+        for task in [t for t in self._entries if t not in wanted]:
+            self.remove(task)
+        new_tasks = [t for t in tasks if t not in self._entries]
+        if new_tasks:
+            self._batch += 1
+            for task in new_tasks:
+                self.add(task, source)
+        self.rescore()
+
+    def pop(self):
+        """
+        Removes and returns the highest-priority task, or None if empty.
+        """
+        while self._heap:
+            _, seq, task = heapq.heappop(self._heap)
+            entry = self._entries.get(task)
+            if entry is None or entry.seq != seq:
+                continue  # removed or rescored since it was pushed
+            del self._entries[task]
+            return task
+        return None
+
+    def tasks(self) -> list:
+        """
+        Returns the scheduled tasks in priority order without removing them.
+        """
+        ordered = sorted(self._entries.values(), key=lambda e: (-e.score, e.seq))
+        return [entry.task for entry in ordered]
+
+    def needs_rerank(self) -> bool:
+        if self.prioritization_agent is None or len(self._entries) < 2:
+            return False
+        return self.changes_since_rerank > self.rerank_threshold * self.size_at_rerank
+
+    def rerank(self):
+        """
+        Asks TaskPrioritizationAgent to sort the current tasks and folds its
+        (validated) order into the scores.
+        """
+        current = self.tasks()
+        ordered = self.prioritization_agent.prioritize_tasks("\n".join(current))
+        self.llm_calls += 1
+
+        ranked = [task for task in ordered if task in self._entries]
+        for entry in self._entries.values():
+            entry.llm_rank = None
+        for rank, task in enumerate(ranked):
+            self._entries[task].llm_rank = rank
+        self._ranked_count = len(ranked)
+        self.rescore()
+
+        self.changes_since_rerank = 0
+        self.size_at_rerank = len(self._entries)
+        if self.debug_mode:
+            print(f"[DEBUG] Scheduler re-ranked {len(ranked)} task(s) with TaskPrioritizationAgent.")
+
+    def rescore(self):
+        """
+        Recomputes every score for the current time and batch and rebuilds the heap.
+        """
+        now = time.time()
+        for entry in self._entries.values():
+            entry.score = self.scorer.score(entry, self._batch, self._ranked_count, now)
+        self._heap = [(-e.score, e.seq, e.task) for e in self._entries.values()]
+        heapq.heapify(self._heap)
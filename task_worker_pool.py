@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TaskWorkerPool:
+    """
+    Runs independent tasks on a fixed number of worker threads.
+
+    llama_cpp releases the GIL while it evaluates, so with one model replica per
+    worker (see ModelEngine.set_replicas) ExecutionAgent calls, file operations
+    and web searches from different tasks genuinely overlap.
+    """
+
+    def __init__(self, concurrency=1, debug_mode=False):
+        self.concurrency = max(1, concurrency)
+        self.debug_mode = debug_mode
+        self._executor = None
+        if self.concurrency > 1:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="task-worker")
+
+    def run_batch(self, tasks: list, handler) -> list:
+        """
+        Calls handler(task) for every task and returns (task, result, error)
+        tuples in the same order as 'tasks', regardless of completion order.
+        """
+        if self._executor is None:
+            return [self._run_one(task, handler) for task in tasks]
+
+        futures = [self._executor.submit(self._run_one, task, handler) for task in tasks]
+        results = [future.result() for future in futures]
+        if self.debug_mode:
+            print(f"[DEBUG] Worker pool finished {len(results)} task(s) with concurrency {self.concurrency}.")
+        return results
+
+    @staticmethod
+    def _run_one(task, handler):
+        try:
+            return task, handler(task), None
+        except Exception as e:
+            return task, None, e
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
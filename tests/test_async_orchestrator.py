@@ -0,0 +1,42 @@
+import threading
+import time
+
+from async_orchestrator import AsyncOrchestrator, StageLatency
+
+
+def test_failing_goal_check_is_counted_not_met():
+    def evaluate(objective):
+        raise RuntimeError("model crashed")
+
+    orchestrator = AsyncOrchestrator(lambda task, result: "", evaluate)
+    orchestrator.start()
+    try:
+        orchestrator.submit_goal_check("objective")
+    finally:
+        orchestrator.shutdown()
+    assert orchestrator.goal_check_failures == 1
+    assert not orchestrator.objective_met.is_set()
+
+
+def test_cancelled_speculative_work_is_timed():
+    release = threading.Event()
+    latency = StageLatency()
+    orchestrator = AsyncOrchestrator(lambda task, result: "", lambda objective: True, latency=latency)
+    orchestrator.start()
+    try:
+        outcome = []
+        runner = threading.Thread(target=lambda: outcome.append(orchestrator.run_speculative(release.wait)))
+        runner.start()
+        time.sleep(0.05)
+        orchestrator.submit_goal_check("objective")
+        runner.join(timeout=5)
+        assert outcome == [None]
+        assert orchestrator.speculative_cancelled() == 1
+        release.set()
+        deadline = time.time() + 5
+        while "speculative_abandoned" not in latency.samples and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        release.set()
+        orchestrator.shutdown()
+    assert latency.summary()["speculative_abandoned"]["count"] == 1
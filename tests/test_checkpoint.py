@@ -0,0 +1,91 @@
+import os
+
+import checkpoint
+from checkpoint import RunCheckpointer, load_checkpoint
+from fake_llm import FakeLlama
+from prefix_cache import PromptPrefixCache
+
+PREFIX = "You are ExecutionAgent. Answer in one line.\n"
+OTHER_PREFIX = "You are LongTermMemoryAgent. Summarize the result.\n"
+
+
+def _use_cache(monkeypatch, cache):
+    monkeypatch.setattr(checkpoint, "get_prefix_cache", lambda: cache)
+    return cache
+
+
+def test_checkpoint_round_trip(tmp_path):
+    filename = str(tmp_path / "checkpoint.json")
+    checkpointer = RunCheckpointer(filename)
+    checkpointer.record_result("FILE#create#hello.txt#hello world!", "created")
+    assert checkpointer.save("objective", 3, ["next task"], ["USERINPUT#t#=hi"], 1,
+                             files={"hello.txt": "hello world!"})
+    assert not checkpointer.save("objective", 3, ["next task"], ["USERINPUT#t#=hi"], 1,
+                                 files={"hello.txt": "hello world!"})
+
+    state = load_checkpoint(filename)
+    assert state["iteration"] == 3 and state["tasks"] == ["next task"]
+    assert state["files"] == {"hello.txt": "hello world!"}
+    resumed = RunCheckpointer(filename)
+    resumed.restore(state)
+    assert resumed.results == [{"task": "FILE#create#hello.txt#hello world!", "result": "created"}]
+
+
+def test_kv_states_round_trip_without_scores(tmp_path, monkeypatch):
+    cache = _use_cache(monkeypatch, PromptPrefixCache())
+    llm = FakeLlama()
+    cache.prepare(llm, ("model", 512, False), "ExecutionAgent", PREFIX + "Task: a", PREFIX)
+    filename = str(tmp_path / "checkpoint.json")
+    checkpointer = RunCheckpointer(filename, save_kv=True)
+    checkpointer.save("objective", 1, [], [], 0)
+
+    (key, saved), = cache.export_states()
+    restored_cache = _use_cache(monkeypatch, PromptPrefixCache())
+    resumed = RunCheckpointer(filename, save_kv=True)
+    resumed.restore(load_checkpoint(filename))
+    assert resumed.load_kv() == 1
+    (restored_key, restored), = restored_cache.export_states()
+    assert restored_key == key
+    assert restored.llama_state == saved.llama_state
+    assert list(restored.input_ids[:restored.n_tokens]) == list(saved.input_ids[:saved.n_tokens])
+
+    llm = FakeLlama()
+    assert restored_cache.prepare(llm, ("model", 512, False), "ExecutionAgent", PREFIX + "Task: b", PREFIX) > 0
+
+
+def test_kv_records_are_written_once_per_prefix(tmp_path, monkeypatch):
+    cache = _use_cache(monkeypatch, PromptPrefixCache())
+    llm = FakeLlama()
+    filename = str(tmp_path / "checkpoint.json")
+    checkpointer = RunCheckpointer(filename, save_kv=True)
+    cache.prepare(llm, ("model", 512, False), "ExecutionAgent", PREFIX + "Task: a", PREFIX)
+    checkpointer.save("objective", 1, ["a"], [], 0)
+    size = os.path.getsize(checkpointer.kv_filename)
+    cache.prepare(llm, ("model", 512, False), "ExecutionAgent", PREFIX + "Task: b", PREFIX)
+    checkpointer.save("objective", 2, ["b"], [], 1)
+    assert os.path.getsize(checkpointer.kv_filename) == size
+
+    cache.prepare(llm, ("model", 512, False), "LongTermMemoryAgent", OTHER_PREFIX + "Task: a", OTHER_PREFIX)
+    checkpointer.save("objective", 3, ["c"], [], 2)
+    assert os.path.getsize(checkpointer.kv_filename) > size
+
+    # A new run starts the KV file over
+    _use_cache(monkeypatch, PromptPrefixCache())
+    RunCheckpointer(filename, save_kv=True).save("objective", 1, [], [], 0)
+    assert os.path.getsize(checkpointer.kv_filename) == 0
+
+
+def test_partial_kv_record_is_dropped(tmp_path, monkeypatch):
+    cache = _use_cache(monkeypatch, PromptPrefixCache())
+    llm = FakeLlama()
+    cache.prepare(llm, ("model", 512, False), "ExecutionAgent", PREFIX + "Task: a", PREFIX)
+    filename = str(tmp_path / "checkpoint.json")
+    checkpointer = RunCheckpointer(filename, save_kv=True)
+    checkpointer.save("objective", 1, [], [], 0)
+    size = os.path.getsize(checkpointer.kv_filename)
+    with open(checkpointer.kv_filename, "ab") as f:
+        f.write(b"\x10\x00\x00\x00\x00")
+
+    _use_cache(monkeypatch, PromptPrefixCache())
+    assert RunCheckpointer(filename, save_kv=True).load_kv() == 1
+    assert os.path.getsize(checkpointer.kv_filename) == size
@@ -0,0 +1,52 @@
+import threading
+import time
+
+from fair_scheduler import FairScheduler
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.001)
+
+
+def _waiting(scheduler):
+    with scheduler._cond:
+        return sum(len(tickets) for tickets in scheduler._waiting.values())
+
+
+def test_free_slots_are_granted_immediately():
+    scheduler = FairScheduler(slots=2)
+    scheduler.acquire("a")
+    scheduler.acquire("b")
+    scheduler.release("a")
+    scheduler.release("b")
+    assert scheduler.stats()["a"]["calls"] == 1
+
+
+def test_waiting_sessions_are_served_round_robin():
+    scheduler = FairScheduler(slots=1)
+    scheduler.acquire("holder")
+    order = []
+    order_lock = threading.Lock()
+
+    def call(session_id):
+        with scheduler.slot(session_id):
+            with order_lock:
+                order.append(session_id)
+
+    # Session 'a' queues three calls before 'b' and 'c' queue one each
+    threads = []
+    for session_id in ("a", "a", "a", "b", "c"):
+        waiting = _waiting(scheduler)
+        thread = threading.Thread(target=call, args=(session_id,), daemon=True)
+        thread.start()
+        threads.append(thread)
+        _wait_for(lambda: _waiting(scheduler) == waiting + 1)
+
+    scheduler.release("holder")
+    for thread in threads:
+        thread.join(timeout=5)
+    assert order == ["a", "b", "c", "a", "a"]
+    assert scheduler.stats()["a"]["calls"] == 3
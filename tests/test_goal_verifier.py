@@ -0,0 +1,87 @@
+from goal_verifier import GoalVerifier
+
+
+class Evaluator:
+    def __init__(self, answer=False):
+        self.answer = answer
+        self.calls = []
+
+    def __call__(self, objective, evidence):
+        self.calls.append(evidence)
+        return self.answer
+
+
+def test_missing_file_answers_no_without_model(tmp_path):
+    evaluate = Evaluator(answer=True)
+    verifier = GoalVerifier(evaluate, lambda: [], base_dir=str(tmp_path))
+    verifier.record_outcome("FILE#create#hello.txt#hello world!", "created")
+    assert verifier.check("write hello world! to a file") is False
+    assert evaluate.calls == []
+    assert verifier.stats()["decided_by_files"] == 1
+
+
+def test_wrong_content_answers_no_without_model(tmp_path):
+    (tmp_path / "hello.txt").write_text("goodbye", encoding="utf-8")
+    evaluate = Evaluator(answer=True)
+    verifier = GoalVerifier(evaluate, lambda: [], base_dir=str(tmp_path))
+    verifier.record_outcome("FILE#create#hello.txt#hello world!", "created")
+    assert verifier.check("write hello world! to a file") is False
+    assert evaluate.calls == []
+
+
+def test_verified_file_is_passed_to_model_as_evidence(tmp_path):
+    (tmp_path / "hello.txt").write_text("hello world!", encoding="utf-8")
+    evaluate = Evaluator(answer=True)
+    verifier = GoalVerifier(evaluate, lambda: [], base_dir=str(tmp_path))
+    verifier.record_outcome("FILE#create#hello.txt#hello world!", "created")
+    assert verifier.check("write hello world! to a file") is True
+    assert len(evaluate.calls) == 1
+    assert "File 'hello.txt' exists with the expected content." in evaluate.calls[0]
+
+
+def test_unchanged_state_is_not_asked_again(tmp_path):
+    evaluate = Evaluator(answer=False)
+    verifier = GoalVerifier(evaluate, lambda: [], base_dir=str(tmp_path))
+    verifier.record_outcome("Summarize the findings", "done")
+    assert verifier.check("objective") is False
+    assert verifier.check("objective") is False
+    assert len(evaluate.calls) == 1
+    assert verifier.stats()["decided_unchanged"] == 1
+
+
+def test_completed_task_is_a_change(tmp_path):
+    evaluate = Evaluator(answer=False)
+    verifier = GoalVerifier(evaluate, lambda: ["next task"], base_dir=str(tmp_path), max_interval=1)
+    verifier.record_outcome("Summarize the findings", "done")
+    assert verifier.check("objective") is False
+    evaluate.answer = True
+    # A plain-text outcome changes no file and no LTM, but the model must see it
+    verifier.record_outcome("Write the conclusion", "done")
+    assert verifier.check("objective") is True
+    assert len(evaluate.calls) == 2
+    assert "Write the conclusion" in evaluate.calls[1]
+
+
+def test_backs_off_while_tasks_are_pending(tmp_path):
+    evaluate = Evaluator(answer=False)
+    pending = ["next task"]
+    verifier = GoalVerifier(evaluate, lambda: pending, base_dir=str(tmp_path), max_interval=4)
+    for i in range(7):
+        verifier.record_outcome(f"task {i}", "done")
+        # A new file each time so the state always changes
+        verifier.record_outcome(f"FILE#create#f{i}.txt#x", "created")
+        (tmp_path / f"f{i}.txt").write_text("x", encoding="utf-8")
+        verifier.check("objective")
+    # Asked at checks 1, 3 and 7 (interval 1, 2, 4)
+    assert len(evaluate.calls) == 3
+    assert verifier.stats()["decided_by_schedule"] == 4
+
+
+def test_restored_files_are_checked_after_resume(tmp_path):
+    verifier = GoalVerifier(Evaluator(), lambda: [], base_dir=str(tmp_path))
+    verifier.record_outcome("FILE#create#hello.txt#hello world!", "created")
+    evaluate = Evaluator(answer=True)
+    resumed = GoalVerifier(evaluate, lambda: [], base_dir=str(tmp_path))
+    resumed.restore_files(verifier.expected_files())
+    assert resumed.check("write hello world! to a file") is False
+    assert evaluate.calls == []
@@ -0,0 +1,42 @@
+from ltm_dedup import NearDuplicateIndex, compact_file
+
+INSIGHT = "The hello world file was created in the working directory and contains the text hello world"
+
+
+def test_identical_insight_is_duplicate():
+    index = NearDuplicateIndex()
+    assert not index.check_and_add(INSIGHT)
+    assert index.check_and_add(INSIGHT)
+    assert index.check_and_add(INSIGHT.upper() + ".")
+    assert len(index) == 1
+
+
+def test_unrelated_insight_is_not_duplicate():
+    index = NearDuplicateIndex()
+    index.add(INSIGHT)
+    assert index.find_duplicate("Web searches for python tutorials returned three useful results") is None
+
+
+def test_threshold_decides_near_duplicates():
+    near = INSIGHT + " as requested"
+    lenient = NearDuplicateIndex(threshold=0.5)
+    strict = NearDuplicateIndex(threshold=0.99)
+    lenient.add(INSIGHT)
+    strict.add(INSIGHT)
+    assert lenient.find_duplicate(near) == 0
+    assert strict.find_duplicate(near) is None
+
+
+def test_empty_text_never_matches():
+    index = NearDuplicateIndex()
+    index.add("")
+    assert index.find_duplicate("") is None
+
+
+def test_compact_file_keeps_longest_of_each_group(tmp_path):
+    filename = tmp_path / "long_term_memory.txt"
+    filename.write_text(f"{INSIGHT}\n\nSomething else entirely\n\n{INSIGHT} today\n\n", encoding="utf-8")
+    result = compact_file(str(filename), threshold=0.7)
+    assert result["entries_before"] == 3
+    assert result["entries_after"] == 2
+    assert filename.read_text(encoding="utf-8") == f"{INSIGHT} today\n\nSomething else entirely\n\n"
@@ -0,0 +1,44 @@
+import os
+
+from ltm_index import LongTermMemoryIndex
+
+ENTRIES = ["The hello world file was created", "A web search found the llama_cpp docs"]
+
+
+class CountingEmbed:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        return [float(len(text)), 1.0, float(text.count("o"))]
+
+
+def test_vectors_are_reused_across_restarts(tmp_path):
+    vector_file = str(tmp_path / "long_term_memory.txt.vectors")
+    embed = CountingEmbed()
+    index = LongTermMemoryIndex(embed=embed, vector_file=vector_file)
+    index.add_many(ENTRIES)
+    assert embed.calls == 2
+
+    embed = CountingEmbed()
+    restarted = LongTermMemoryIndex(embed=embed, vector_file=vector_file)
+    restarted.add_many(ENTRIES + ["A new insight"])
+    assert embed.calls == 1
+    assert restarted.vectors_reused == 2
+    assert restarted.search("hello world", k=1)[0][1] == ENTRIES[0]
+
+
+def test_partial_vector_record_is_dropped(tmp_path):
+    vector_file = str(tmp_path / "long_term_memory.txt.vectors")
+    index = LongTermMemoryIndex(embed=CountingEmbed(), vector_file=vector_file)
+    index.add_many(ENTRIES)
+    size = os.path.getsize(vector_file)
+    with open(vector_file, "ab") as f:
+        f.write(b"\x00" * 10)
+
+    embed = CountingEmbed()
+    restarted = LongTermMemoryIndex(embed=embed, vector_file=vector_file)
+    restarted.add_many(ENTRIES)
+    assert embed.calls == 0
+    assert os.path.getsize(vector_file) == size
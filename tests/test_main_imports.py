@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# sys.modules['numpy'] = None makes 'import numpy' fail, as on a machine without it
+HELP_WITHOUT_NUMPY = (
+    "import runpy, sys; sys.modules['numpy'] = None; sys.argv = ['main.py', '--help']; "
+    "runpy.run_path('main.py', run_name='__main__')"
+)
+
+
+def test_help_works_without_numpy():
+    result = subprocess.run([sys.executable, "-c", HELP_WITHOUT_NUMPY], cwd=REPO_ROOT,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert "--model_path" in result.stdout
@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+from fake_llm import FakeLlama
+from model_engine import ModelEngine, DEFAULT_N_GPU_LAYERS
+
+
+class RecordingLlama(FakeLlama):
+    def __init__(self, n_gpu_layers=0, **kwargs):
+        super().__init__(**kwargs)
+        self.n_gpu_layers = n_gpu_layers
+
+
+def test_extra_replicas_do_not_offload_by_default():
+    engine = ModelEngine(replicas=2, loader=RecordingLlama)
+    with engine.acquire("main.gguf") as first, engine.acquire("main.gguf") as second:
+        assert first.n_gpu_layers == DEFAULT_N_GPU_LAYERS
+        assert second.n_gpu_layers == 0
+
+    engine.set_load_options(replica_gpu_layers=DEFAULT_N_GPU_LAYERS)
+    engine.release_all()
+    with engine.acquire("main.gguf") as first, engine.acquire("main.gguf") as second:
+        assert second.n_gpu_layers == DEFAULT_N_GPU_LAYERS
+
+
+def test_failed_load_wakes_waiting_caller():
+    started = threading.Event()
+    fail = threading.Event()
+    calls = []
+
+    def loader(**kwargs):
+        calls.append(kwargs["model_path"])
+        if len(calls) == 1:
+            started.set()
+            fail.wait(5)
+            raise RuntimeError("load failed")
+        return FakeLlama(**kwargs)
+
+    engine = ModelEngine(replicas=1, loader=loader)
+
+    def failing_caller():
+        with pytest.raises(RuntimeError):
+            with engine.acquire("main.gguf"):
+                pass
+
+    acquired = []
+
+    def waiting_caller():
+        with engine.acquire("main.gguf") as llm:
+            acquired.append(llm)
+
+    first = threading.Thread(target=failing_caller, daemon=True)
+    first.start()
+    assert started.wait(5)
+    second = threading.Thread(target=waiting_caller, daemon=True)
+    second.start()
+    time.sleep(0.05)  # let the second caller block on the replica limit
+    fail.set()
+    first.join(5)
+    second.join(5)
+    assert not second.is_alive()
+    assert len(acquired) == 1 and len(calls) == 2
@@ -0,0 +1,42 @@
+from fake_llm import FakeLlama
+from prefix_cache import PromptPrefixCache, SavedState
+
+PREFIX = "You are ExecutionAgent. Answer in one line.\n"
+
+
+def test_second_call_reuses_prefix():
+    cache = PromptPrefixCache()
+    llm = FakeLlama()
+    assert cache.prepare(llm, ("model", 512), "ExecutionAgent", PREFIX + "Task: a", PREFIX) == 0
+    skipped = cache.prepare(llm, ("model", 512), "ExecutionAgent", PREFIX + "Task: b", PREFIX)
+    assert skipped > 0
+    assert cache.stats()["hits"] == 1
+
+
+def test_saved_state_keeps_no_scores_copy():
+    cache = PromptPrefixCache()
+    llm = FakeLlama()
+    cache.prepare(llm, ("model", 512), "ExecutionAgent", PREFIX + "Task: a", PREFIX)
+    (_, state), = cache.export_states()
+    assert isinstance(state, SavedState)
+    assert state.scores.shape == (state.n_tokens, llm.n_vocab())
+    # One shared zero row backs every token
+    assert state.scores.strides[0] == 0
+    assert state.nbytes == state.llama_state_size + state.input_ids.nbytes
+
+    llm.reset()
+    llm.load_state(state)
+    assert llm.n_tokens == state.n_tokens
+
+
+def test_evicts_least_recently_used_over_byte_budget():
+    llm = FakeLlama()
+    llm.eval([5, 6, 7])
+    state = SavedState.from_state(llm.save_state(), llm.n_vocab())
+    cache = PromptPrefixCache(max_bytes=state.nbytes * 2)
+    cache.import_states([(("model", "a"), state), (("model", "b"), state), (("model", "c"), state)])
+    stats = cache.stats()
+    assert stats["cached_states"] == 2
+    assert stats["cached_bytes"] == state.nbytes * 2
+    assert stats["evictions"] == 1
+    assert [key for key, _ in cache.export_states()] == [("model", "b"), ("model", "c")]
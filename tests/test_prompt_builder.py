@@ -0,0 +1,17 @@
+from prompt_builder import PromptBuilder, PromptSection, TRIM_LINES
+
+
+def test_lowest_priority_section_is_trimmed_first():
+    builder = PromptBuilder("missing.gguf", n_ctx=1000, safety_margin=0)
+    low = "".join(f"low priority line {i}\n" for i in range(20))
+    high = "".join(f"high priority line {i}\n" for i in range(20))
+    sections = [
+        PromptSection("Instructions.\n", fixed=True),
+        PromptSection(high, priority=5, trim=TRIM_LINES),
+        PromptSection(low, priority=1, trim=TRIM_LINES),
+    ]
+    total = sum(builder.count(section.text) for section in sections)
+    prompt = builder.build(sections, max_tokens=builder.n_ctx - total + 10)
+    assert high in prompt
+    assert "low priority line 0" in prompt
+    assert "low priority line 19" not in prompt
@@ -0,0 +1,56 @@
+import json
+import random
+
+from run_log_query import RunLogIndex
+
+
+def _write_log(path, count, seed=0):
+    rng = random.Random(seed)
+    records = []
+    with open(path, "a", encoding="utf-8") as f:
+        for i in range(count):
+            record = {
+                "ts": 1000.0 + i + rng.random() * 5,  # concurrent runs append slightly out of order
+                "run_id": f"run-{rng.randrange(3)}",
+                "event": rng.choice(["inference", "task_result"]),
+                "agent": rng.choice(["ExecutionAgent", "TaskCreationAgent", None]),
+                "latency": rng.random(),
+            }
+            f.write(json.dumps(record) + "\n")
+            records.append(record)
+    return records
+
+
+def _expected(records, run_id=None, event=None, since=None, until=None):
+    return [r for r in records
+            if (run_id is None or r["run_id"] == run_id) and (event is None or r["event"] == event)
+            and (since is None or r["ts"] >= since) and (until is None or r["ts"] <= until)]
+
+
+def test_query_matches_linear_scan(tmp_path):
+    log = str(tmp_path / "run_log.jsonl")
+    records = _write_log(log, 300)
+    index = RunLogIndex(log)
+    assert index.update() == 300
+
+    for filters in ({}, {"run_id": "run-1"}, {"since": 1100.0, "until": 1200.0},
+                    {"run_id": "run-2", "event": "inference", "since": 1050.5}, {"until": 999.0}):
+        got = [json.loads(line) for line in index.query(**filters)]
+        assert got == _expected(records, **filters)
+
+    runs = {run_id: count for run_id, count, _, _ in index.runs()}
+    assert runs == {f"run-{i}": sum(r["run_id"] == f"run-{i}" for r in records) for i in range(3)}
+
+
+def test_order_is_rebuilt_after_update(tmp_path):
+    log = str(tmp_path / "run_log.jsonl")
+    records = _write_log(log, 50)
+    index = RunLogIndex(log)
+    index.update()
+    assert len(list(index.query(run_id="run-0"))) == len(_expected(records, "run-0"))
+
+    records += _write_log(log, 50, seed=1)
+    reopened = RunLogIndex(log)
+    reopened.update()
+    got = [json.loads(line) for line in reopened.query(run_id="run-0", since=1020.0)]
+    assert got == _expected(records, "run-0", since=1020.0)
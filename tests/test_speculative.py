@@ -0,0 +1,61 @@
+import numpy as np
+
+from fake_llm import FakeLlama
+from inference_backend import LlamaCppBackend
+from model_engine import ModelEngine
+from speculative import CountingDrafter, DraftModelDecoding, last_logits
+import inference_backend
+import speculative
+
+
+def _generate(target, prompt_ids, n_tokens, drafter=None):
+    """
+    Greedy decoding as llama_cpp verifies drafts: each drafted token is kept
+    while it matches the target's argmax, then one target token is added.
+    """
+    target.reset()
+    target.eval(prompt_ids)
+    out = []
+    while len(out) < n_tokens:
+        for token in (drafter(target.input_ids) if drafter is not None else []):
+            if token != int(np.argmax(last_logits(target))):
+                break
+            target.eval([int(token)])
+            out.append(int(token))
+        token = int(np.argmax(last_logits(target)))
+        target.eval([token])
+        out.append(token)
+    return out[:n_tokens]
+
+
+def test_drafted_output_matches_greedy(monkeypatch):
+    engine = ModelEngine(loader=FakeLlama)
+    monkeypatch.setattr(speculative, "get_engine", lambda: engine)
+    prompt_ids = [1, 42, 7, 99]
+
+    plain = _generate(FakeLlama(), prompt_ids, 20)
+    drafter = CountingDrafter(DraftModelDecoding("draft.gguf", num_pred_tokens=4))
+    drafted = _generate(FakeLlama(), prompt_ids, 20, drafter)
+
+    assert drafted == plain
+    # The draft shares the target's logits here, so every proposal is accepted
+    assert drafter.drafted >= 16 and drafter.rounds <= 5
+    assert engine.stats()["loads"] == 1
+
+
+def test_speculative_calls_use_an_instance_built_with_the_draft_model(monkeypatch):
+    engine = ModelEngine(loader=FakeLlama)
+    monkeypatch.setattr(inference_backend, "get_engine", lambda: engine)
+    base = DraftModelDecoding("draft.gguf")
+    backend = LlamaCppBackend()
+
+    backend.complete("main.gguf", "You are ExecutionAgent. Task: x\n", {"max_tokens": 4})
+    backend.complete("main.gguf", "You are ExecutionAgent. Task: x\n", {"max_tokens": 4},
+                     drafter=CountingDrafter(base))
+
+    plain = engine.get_model("main.gguf")
+    speculative_llm = engine.get_model("main.gguf", draft_model=base)
+    assert plain is not speculative_llm
+    assert plain.draft_model is None and not plain.logits_all
+    assert speculative_llm.draft_model is base and speculative_llm.logits_all
+    assert engine.stats()["loads"] == 2
@@ -0,0 +1,150 @@
+import threading
+import time
+
+from short_term_memory import ShortTermMemory
+from sqlite_task_queue import SQLiteTaskQueue, STATE_DONE, STATE_FAILED, STATE_PENDING, STATE_RUNNING
+
+
+def _queue(tmp_path, worker_id="worker-1"):
+    return SQLiteTaskQueue(str(tmp_path / "tasks.db"), worker_id=worker_id)
+
+
+def test_claims_by_priority_then_insertion_order(tmp_path):
+    queue = _queue(tmp_path)
+    queue.add_task("low")
+    queue.add_task("high", priority=5)
+    queue.add_task("low too")
+    assert queue.claim_next_task()[1] == "high"
+    assert queue.claim_next_task()[1] == "low"
+    assert queue.get_all_tasks() == ["low too"]
+
+
+def test_two_workers_never_claim_the_same_task(tmp_path):
+    first = _queue(tmp_path, "a")
+    second = _queue(tmp_path, "b")
+    first.save_tasks(["one", "two"])
+    claimed = {first.claim_next_task()[1], second.claim_next_task()[1]}
+    assert claimed == {"one", "two"}
+    assert first.claim_next_task() is None
+
+
+def test_complete_and_fail_record_outcome(tmp_path):
+    queue = _queue(tmp_path)
+    queue.save_tasks(["ok", "broken", "flaky"])
+    ok_id, _ = queue.claim_next_task()
+    broken_id, _ = queue.claim_next_task()
+    flaky_id, _ = queue.claim_next_task()
+    queue.complete_task(ok_id, "done")
+    queue.fail_task(broken_id, "boom")
+    queue.fail_task(flaky_id, "timeout", retry=True)
+    assert queue.count_by_state() == {STATE_DONE: 1, STATE_FAILED: 1, STATE_PENDING: 1}
+    assert queue.get_all_tasks() == ["flaky"]
+
+
+def test_finished_task_can_be_added_again(tmp_path):
+    queue = _queue(tmp_path)
+    queue.add_task("repeat")
+    task_id, _ = queue.claim_next_task()
+    queue.add_task("repeat")
+    assert queue.get_all_tasks() == []
+    queue.complete_task(task_id, "done")
+    queue.add_task("repeat")
+    assert queue.get_all_tasks() == ["repeat"]
+
+
+def test_pop_marks_task_done(tmp_path):
+    queue = _queue(tmp_path)
+    queue.save_tasks(["first", "second"])
+    assert queue.pop_next_task() == "first"
+    assert queue.count_by_state() == {STATE_DONE: 1, STATE_PENDING: 1}
+    # Nothing popped is ever requeued as stale
+    assert queue.requeue_stale(0) == 0
+    queue.add_task("first")
+    assert queue.get_all_tasks() == ["second", "first"]
+
+
+def test_requeue_stale_returns_only_running_tasks(tmp_path):
+    queue = _queue(tmp_path)
+    queue.save_tasks(["crashed", "finished"])
+    queue.claim_next_task()
+    finished_id, _ = queue.claim_next_task()
+    queue.complete_task(finished_id, "done")
+    time.sleep(0.01)
+    assert queue.requeue_stale(0.005) == 1
+    assert queue.get_all_tasks() == ["crashed"]
+    assert queue.count_by_state() == {STATE_DONE: 1, STATE_PENDING: 1}
+
+
+def test_claim_task_by_text(tmp_path):
+    queue = _queue(tmp_path)
+    queue.save_tasks(["a", "b"])
+    b_id = queue.claim_task("b")
+    assert queue.claim_task("never stored") is None
+    assert queue.claim_task("b") is None
+    assert queue.get_all_tasks() == ["a"]
+    assert queue.count_by_state() == {STATE_PENDING: 1, STATE_RUNNING: 1}
+    queue.complete_task(b_id, "ok")
+    assert queue.count_by_state() == {STATE_DONE: 1, STATE_PENDING: 1}
+
+
+def test_save_tasks_keeps_other_workers_pending_tasks(tmp_path):
+    first = _queue(tmp_path, "a")
+    second = _queue(tmp_path, "b")
+    first.save_tasks(["a1", "a2"])
+    second.add_task("b1")
+    first.save_tasks(["a2"])
+    assert sorted(second.get_all_tasks()) == ["a2", "b1"]
+
+
+def test_concurrent_workers_execute_each_task_once(tmp_path):
+    tasks = [f"task {i}" for i in range(50)]
+    _queue(tmp_path, "producer").save_tasks(tasks)
+    executed = []
+    lock = threading.Lock()
+
+    def work(worker_id):
+        queue = _queue(tmp_path, worker_id)
+        while True:
+            claimed = queue.claim_next_task()
+            if claimed is None:
+                break
+            task_id, task = claimed
+            with lock:
+                executed.append(task)
+            queue.complete_task(task_id, worker_id)
+        queue.close()
+
+    workers = [threading.Thread(target=work, args=(f"worker-{i}",)) for i in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert sorted(executed) == sorted(tasks)
+    assert _queue(tmp_path).count_by_state() == {STATE_DONE: len(tasks)}
+
+
+def test_short_term_memory_mirrors_tasks_into_store(tmp_path):
+    store = _queue(tmp_path)
+    memory = ShortTermMemory(str(tmp_path / "short_term_memory.txt"), task_store=store)
+    memory.add_tasks(["one", "two"])
+    memory.append_user_input("USERINPUT#now#=hello")
+    memory.flush()
+    assert store.get_all_tasks() == ["one", "two"]
+
+    reloaded = ShortTermMemory(str(tmp_path / "short_term_memory.txt"), task_store=store)
+    assert reloaded.get_tasks() == ["one", "two"]
+    assert reloaded.user_inputs == ["USERINPUT#now#=hello"]
+
+
+def test_short_term_memory_flush_does_not_drop_other_workers_tasks(tmp_path):
+    store = _queue(tmp_path, "a")
+    other = _queue(tmp_path, "b")
+    memory = ShortTermMemory(str(tmp_path / "short_term_memory.txt"), task_store=store)
+    memory.add_tasks(["mine"])
+    other.add_task("theirs")
+    memory.set_tasks([])
+    memory.flush()
+    assert other.get_all_tasks() == ["mine", "theirs"]
+    other.claim_next_task()
+    memory.reload_tasks()
+    assert memory.get_tasks() == ["theirs"]
@@ -0,0 +1,56 @@
+from fake_llm import FakeLlama, configure_fake_backend
+from inference_backend import stream_into_parser
+from stream_parsers import LineParser, YesNoParser
+
+
+def test_yes_no_parser_stops_on_first_word():
+    parser = YesNoParser()
+    assert not parser.feed(" Y")
+    assert not parser.feed("E")
+    assert parser.feed("S, because")
+    assert parser.answer is True
+    assert parser.stopped
+
+    parser = YesNoParser()
+    assert parser.feed("No")
+    assert parser.answer is False
+
+
+def test_yes_no_parser_decides_on_finish():
+    parser = YesNoParser()
+    parser.feed("YE")
+    parser.finish()
+    assert parser.answer is False
+    assert not parser.stopped
+
+
+def test_line_parser_stops_when_callback_says_so():
+    lines = []
+    parser = LineParser(lambda line: lines.append(line) or len(lines) == 2)
+    assert not parser.feed("one\n\n tw")
+    assert parser.feed("o \nthree\n")
+    parser.finish()
+    assert lines == ["one", "two"]
+
+
+def test_line_parser_delivers_last_line_on_finish():
+    lines = []
+    parser = LineParser(lambda line: lines.append(line) and False)
+    parser.feed("one\ntwo")
+    parser.finish()
+    assert lines == ["one", "two"]
+
+
+def test_stream_stops_generation_once_parser_decides():
+    configure_fake_backend(token_latency=0, prompt_latency=0,
+                           responses={"GoalEvaluationAgent": lambda prompt: "YES the file exists and is complete"})
+    try:
+        chunks = FakeLlama()("You are GoalEvaluationAgent.", max_tokens=32, stream=True)
+        completion = stream_into_parser(chunks, YesNoParser())
+    finally:
+        configure_fake_backend()
+    assert completion.text == "YES"
+    assert completion.completion_tokens == 1
+    assert completion.stopped_early
+    # The generator was closed, so nothing more is generated
+    assert chunks.gi_frame is None
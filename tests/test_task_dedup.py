@@ -0,0 +1,32 @@
+from task_dedup import TaskDeduplicator
+
+TASK = "Task 4: collect the details needed for the hello world file in the working directory"
+
+
+def test_word_overlap_dedup_needs_no_embeddings():
+    dedup = TaskDeduplicator()
+    pending = ["- Task 1: collect the details needed for the hello world file in the working directory."]
+    assert dedup.find_duplicate(TASK, pending) == pending[0]
+    assert dedup.find_duplicate("Task 5: summarize what was learned about llama_cpp", pending) is None
+    assert dedup.stats()["embeddings"] == 0
+
+
+def test_routed_tasks_only_match_exactly():
+    dedup = TaskDeduplicator()
+    assert dedup.find_duplicate("FILE#create#a.txt#hello", ["FILE#create#b.txt#hello"]) is None
+    assert dedup.find_duplicate("FILE#create#a.txt#hello", ["FILE#create#a.txt#hello"]) == "FILE#create#a.txt#hello"
+
+
+def test_embedding_failure_falls_back_to_word_overlap():
+    def embed(text):
+        raise RuntimeError("no embedding model")
+
+    dedup = TaskDeduplicator(embed)
+    pending = ["Task 1: collect the details needed for the hello world file in the working directory"]
+    assert dedup.find_duplicate(TASK, pending) == pending[0]
+
+
+def test_completed_tasks_are_remembered():
+    dedup = TaskDeduplicator()
+    dedup.mark_completed("Task 1: write the report")
+    assert dedup.find_duplicate("task 7: Write the report.", []) == "Task 1: write the report"
@@ -0,0 +1,55 @@
+from task_queue import TaskQueue
+
+
+def test_pops_in_insertion_order_and_skips_duplicates(tmp_path):
+    queue = TaskQueue(str(tmp_path / "tasks.txt"))
+    for task in ("first", "second", "first", "third"):
+        queue.add_task(task)
+    assert queue.get_all_tasks() == ["first", "second", "third"]
+    assert queue.pop_next_task() == "first"
+    queue.close()
+
+
+def test_journal_replays_after_restart(tmp_path):
+    filename = str(tmp_path / "tasks.txt")
+    queue = TaskQueue(filename)
+    queue.add_task("a")
+    queue.add_task("b")
+    queue.add_task("c")
+    queue.pop_next_task()
+    # No close(): the state is only in the journal, as after a crash
+    queue._journal.close()
+
+    assert TaskQueue(filename).get_all_tasks() == ["b", "c"]
+
+
+def test_truncated_journal_record_is_dropped(tmp_path):
+    filename = str(tmp_path / "tasks.txt")
+    queue = TaskQueue(filename)
+    queue.add_task("a")
+    queue.add_task("b")
+    queue._journal.close()
+    # A crash in the middle of writing the next record
+    with open(filename + ".journal", "a", encoding="utf-8") as f:
+        f.write("+\tpartial ta")
+
+    recovered = TaskQueue(filename)
+    assert recovered.get_all_tasks() == ["a", "b"]
+    recovered.add_task("c")
+    recovered._journal.close()
+
+    # The next record was not glued onto the partial one
+    assert TaskQueue(filename).get_all_tasks() == ["a", "b", "c"]
+
+
+def test_compaction_folds_journal_into_task_file(tmp_path):
+    filename = str(tmp_path / "tasks.txt")
+    queue = TaskQueue(filename, compact_threshold=1000)
+    for i in range(5):
+        queue.add_task(f"task {i}")
+    queue.pop_next_task()
+    queue.close()
+
+    with open(filename, "r", encoding="utf-8") as f:
+        assert f.read().splitlines() == [f"task {i}" for i in range(1, 5)]
+    assert TaskQueue(filename).get_all_tasks() == [f"task {i}" for i in range(1, 5)]
@@ -0,0 +1,37 @@
+from task_scheduler import PriorityTaskScheduler, LocalTaskScorer, SOURCE_USER
+import task_scheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def test_age_counts_after_sync(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(task_scheduler, "time", clock)
+    scheduler = PriorityTaskScheduler(scorer=LocalTaskScorer(recency_weight=0.0))
+    scheduler.sync(["old task"])
+    clock.now += 100
+    scheduler.sync(["old task", "new task"])
+    assert scheduler.tasks() == ["old task", "new task"]
+    assert scheduler.pop() == "old task"
+
+
+def test_user_tasks_run_first():
+    scheduler = PriorityTaskScheduler()
+    scheduler.sync(["WEB#weather", "write a summary"])
+    scheduler.add("check the logs", SOURCE_USER)
+    scheduler.sync(["WEB#weather", "write a summary", "check the logs"])
+    assert scheduler.pop() == "check the logs"
+
+
+def test_reading_the_order_is_not_a_local_ordering():
+    scheduler = PriorityTaskScheduler()
+    scheduler.sync(["a", "b"])
+    scheduler.tasks()
+    scheduler.tasks()
+    assert scheduler.local_orderings == 1